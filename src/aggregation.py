@@ -0,0 +1,150 @@
+# aggregation.py
+"""
+
+- columnar view (GoodsFrame) of the goods lines of all imported goods, in the order prepare_data processes them
+- group-bys of create_procedures (imported good x procedure x inward processing key) and
+  create_goods_emissions (imported good x installation/ operator) as group id arrays
+- masses are integers in fixed point (see fixed_point), group sums are exact and independent of the line order
+
+"""
+
+import numpy as np
+import pandas as pd
+from .log import Log
+from .records import Procedure
+
+
+class GoodsFrame:
+    def __init__(self, imported_goods):
+        self.imported_goods = list(imported_goods.values())
+        self.lines = [line for imported_good in self.imported_goods for line in imported_good.lines]
+
+        num_lines_ls = [len(imported_good.lines) for imported_good in self.imported_goods]
+        lines = self.lines
+
+        self.frame = pd.DataFrame(
+            {
+                "good": np.repeat(np.arange(len(self.imported_goods), dtype=np.int64), num_lines_ls),
+                "requested_procedure": [line.requested_procedure for line in lines],
+                "previous_procedure": [line.previous_procedure for line in lines],
+                "inward_processing": [line.inward_processing for line in lines],
+                "io_key": [line.io_key for line in lines],
+                "production_method": [line.production_method for line in lines],
+            }
+        )
+
+        self.net_mass = np.array([line.net_mass for line in lines], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def group_ids(self, columns):
+        # group ids numbered in order of first appearance, None is a key of its own
+        if not len(self.lines):
+            return np.zeros(0, dtype=np.int64)
+        return self.frame.groupby(columns, sort=False, dropna=False).ngroup().to_numpy(dtype=np.int64)
+
+    def aggregate_procedures(self):
+        """
+        Sets procedures and total_net_mass of the imported goods
+        """
+        frame = self.frame
+        lines = self.lines
+
+        cond_a = (frame["inward_processing"] == "1").to_numpy()
+        cond_b = frame["previous_procedure"].isin(["51", "54"]).to_numpy()
+
+        for i in np.flatnonzero(cond_a ^ cond_b):
+            Log.error(f"[prepare data] Contradicting entries w.r. to inward processing in {lines[i]} : {cond_a[i]} ^ {cond_b[i]}")
+
+        for imported_good in self.imported_goods:
+            imported_good.procedures = {}
+
+        good_ids = frame["good"].to_numpy()
+        total_net_mass = group_sum(good_ids, self.net_mass, len(self.imported_goods))
+
+        # * procedures: imported good x requested procedure x previous procedure
+
+        procedure_ids = self.group_ids(["good", "requested_procedure", "previous_procedure"])
+        procedure_first = first_indices(procedure_ids)
+
+        procedure_net_mass = group_sum(procedure_ids, self.net_mass, len(procedure_first))
+
+        procedures = []
+        for procedure_id, i in enumerate(procedure_first):
+            line = lines[i]
+            procedure = Procedure(line.requested_procedure, line.previous_procedure, int(procedure_net_mass[procedure_id]), line.inward_processing)
+            procedures.append(procedure)
+            self.imported_goods[good_ids[i]].procedures[(line.requested_procedure, line.previous_procedure)] = procedure
+
+        # * inward processing: procedure x inward processing key, masses of equal entries are added
+
+        active = np.flatnonzero(cond_a & cond_b)
+
+        if len(active):
+            ip_infos = []
+            for i in active:
+                inward_processing_info = lines[i].inward_processing_info.copy()
+                if inward_processing_info.bill_of_discharge_waiver is None:
+                    inward_processing_info.bill_of_discharge_waiver = "0"
+                ip_infos.append(inward_processing_info)
+
+            ip_keys = np.empty(len(ip_infos), dtype=object)
+            ip_keys[:] = [inward_processing_info.key() for inward_processing_info in ip_infos]
+            ip_key_ids, _ = pd.factorize(ip_keys)
+
+            ip_frame = pd.DataFrame({"procedure": procedure_ids[active], "ip_key": ip_key_ids})
+            ip_ids = ip_frame.groupby(["procedure", "ip_key"], sort=False).ngroup().to_numpy(dtype=np.int64)
+            ip_first = first_indices(ip_ids)
+
+            already_processed = group_sum(ip_ids, np.array([info.already_processed for info in ip_infos], dtype=np.int64), len(ip_first))
+            not_processed = group_sum(ip_ids, np.array([info.not_processed for info in ip_infos], dtype=np.int64), len(ip_first))
+
+            for ip_id, j in enumerate(ip_first):
+                inward_processing_info = ip_infos[j]
+                inward_processing_info.already_processed = int(already_processed[ip_id])
+                inward_processing_info.not_processed = int(not_processed[ip_id])
+
+                procedure = procedures[procedure_ids[active[j]]]
+                if procedure.inward_processing_infos is None:
+                    procedure.inward_processing_infos = {}
+                procedure.inward_processing_infos[ip_keys[j]] = inward_processing_info
+
+        for imported_good, net_mass in zip(self.imported_goods, total_net_mass):
+            imported_good.total_net_mass = int(net_mass)
+
+    def goods_emission_groups(self):
+        """
+        Returns per imported good a list of (first line, net mass, production methods) per installation/ operator,
+        production methods is a dict of the method ids in order of appearance
+        """
+        frame = self.frame
+        lines = self.lines
+
+        group_ids = self.group_ids(["good", "io_key"])
+        group_first = first_indices(group_ids)
+
+        net_mass = group_sum(group_ids, self.net_mass, len(group_first))
+
+        production_methods = [{} for _ in group_first]
+        methods = pd.DataFrame({"group": group_ids, "production_method": frame["production_method"]}).drop_duplicates()
+        for group_id, production_method in zip(methods["group"], methods["production_method"]):
+            production_methods[group_id][production_method] = None
+
+        groups = [[] for _ in self.imported_goods]
+        good_ids = frame["good"].to_numpy()
+        for group_id, i in enumerate(group_first):
+            groups[good_ids[i]].append((lines[i], int(net_mass[group_id]), production_methods[group_id]))
+
+        return groups
+
+
+def group_sum(group_ids, values, num_groups):
+    sums = np.zeros(num_groups, dtype=np.int64)
+    np.add.at(sums, group_ids, values)
+    return sums
+
+
+def first_indices(group_ids):
+    # index of the first row per group id (ids numbered in order of first appearance)
+    return np.unique(group_ids, return_index=True)[1]
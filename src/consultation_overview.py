@@ -0,0 +1,211 @@
+# consultation_overview.py
+"""
+
+- the consultation overview workbook (config["supplier_workflow"]["consultation_overview_file"]) is read once,
+  read-only, and kept in process until the file changes (modification time, size)
+- all sheets are held as value rows (OverviewSheet, a ValueSheet, read past stale stored dimensions), the workbook is closed after reading;
+  keyword_index and load_table_to_dict work on these sheets, their lookups are header index hits
+- indexes: importer sheets by exact and cleaned name, aliases of "1 - Customer List" by cleaned real name,
+  installation tables of the importer sheets per report quarter
+
+"""
+
+import os
+import openpyxl
+from openpyxl.utils import column_index_from_string
+from .log import Log
+from .helper import clean_supplier_str
+from .xlsx_access import ValueSheet, keyword_index, load_table_to_dict, column_letter_from_string, row_index_from_string
+
+
+CUSTOMER_LIST_SHEET = "1 - Customer List"
+
+# number of the "date of attempt x"/ "remarks dropdown x"/ "remarks x" columns
+NUMBER_OF_COMM_ATTEMPTS = 8
+
+# absolute path -> ConsultationOverview
+_overviews = {}
+
+
+class OverviewSheet(ValueSheet):
+    """
+    Values of a worksheet of the consultation overview (see xlsx_access.ValueSheet) and its installation tables
+    """
+
+    def __init__(self, title, rows):
+        super().__init__(title, rows)
+
+        # (year, quarter) -> installation table, see installation_table
+        self.installation_tables = {}
+
+    def installation_table(self, year, quarter):
+        """
+        Returns the installation rows of an importer sheet with the communication status of the quarter
+        as "communication status" (see installation_data.get_overview_data), None if the installation column is missing.
+        The rows are copies, callers complete them.
+        """
+        key = (str(year), str(quarter))
+        if key not in self.installation_tables:
+            self.installation_tables[key] = self.load_installation_table(*key)
+
+        table = self.installation_tables[key]
+        if table is None:
+            return None
+        return [dict(row) for row in table]
+
+    def load_installation_table(self, year, quarter):
+        # * determine column indices
+        head_index = keyword_index(self, "installation")
+        if head_index is None:
+            Log.error(f"Could not find 'installation' column in {self.title}", title="supplier_workflow | installation column not found")
+            return None
+
+        head_index_row = row_index_from_string(head_index)
+
+        # * build column list
+        columns = ["installation", "date of last update", "operator"]
+        for base in ("date of attempt ", "remarks dropdown ", "remarks "):
+            columns += [f"{base}{idx_}" for idx_ in range(1, NUMBER_OF_COMM_ATTEMPTS + 1)]
+
+        normalized_map = {normalize_header(value): str(value).strip() for value in self.row_values(head_index_row) if value}
+
+        quarter_tag = f"Q{quarter} - {year}"
+        comm_status_quarter_col = normalize_header(f"communication status - {quarter_tag}")
+
+        if comm_status_quarter_col in normalized_map:
+            comm_status_col_used = normalized_map[comm_status_quarter_col]
+            columns.insert(1, comm_status_col_used)
+        elif normalize_header("communication status") in normalized_map:
+            comm_status_col_used = normalized_map[normalize_header("communication status")]
+            columns.insert(1, comm_status_col_used)
+        else:
+            Log.warning(
+                f"Neither '{comm_status_quarter_col}' nor 'communication status' found in sheet {self.title}",
+                title="supplier_workflow | communication status column not found",
+            )
+            comm_status_col_used = None
+
+        data = load_table_to_dict(self, "installation", columns)
+
+        if comm_status_col_used and comm_status_col_used != "communication status":
+            for row in data:
+                row["communication status"] = row.pop(comm_status_col_used)
+
+        return data
+
+
+class ConsultationOverview:
+    """
+    sheets: sheet name -> OverviewSheet
+    sheet_names: lowercased sheet name -> first sheet name, clean_sheet_names: cleaned name -> first sheet name
+    alias_fields: cells of the "Alias" and "Real Name" headers of the customer list (None if missing)
+    alias_rows: cleaned real name -> [(row, alias, real name), ...] of the customer list with an alias, in row order
+    """
+
+    def __init__(self, path, stat_key):
+        self.path = path
+        self.stat_key = stat_key
+
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            self.sheets = {ws.title: OverviewSheet.of(ws) for ws in wb.worksheets}
+        finally:
+            wb.close()
+
+        self.sheet_names = {}
+        self.clean_sheet_names = {}
+        for sheet_name in self.sheets:
+            self.sheet_names.setdefault(sheet_name.lower(), sheet_name)
+            self.clean_sheet_names.setdefault(clean_supplier_str(sheet_name.lower()), sheet_name)
+
+        self.alias_fields = (None, None)
+        self.alias_rows = {}
+        if CUSTOMER_LIST_SHEET in self.sheets:
+            self.index_aliases(self.sheets[CUSTOMER_LIST_SHEET])
+
+    def index_aliases(self, sheet):
+        alias_head_field = keyword_index(sheet, "Alias", fixed_row=3)
+        real_name_field = keyword_index(sheet, "Real Name", fixed_row=3)
+        self.alias_fields = (alias_head_field, real_name_field)
+
+        if alias_head_field is None or real_name_field is None:
+            return
+
+        alias_col = column_index_from_string(column_letter_from_string(alias_head_field))
+        real_name_col = column_index_from_string(column_letter_from_string(real_name_field))
+
+        for row_idx, row in enumerate(sheet.iter_rows(min_row=4, values_only=True), start=4):
+            alias, real_name = row[alias_col - 1], row[real_name_col - 1]
+            # rows without alias do not change the importer name
+            if not isinstance(alias, str) or not isinstance(real_name, str) or alias.strip() == "":
+                continue
+            self.alias_rows.setdefault(clean_supplier_str(real_name.lower()), []).append((row_idx, alias, real_name))
+
+    def resolve_alias(self, importer_name):
+        """
+        Returns the alias of the importer in the customer list (the name of its sheet), the importer name if it has none.
+        The rows are matched in order, a row below a match is matched against the alias found (as the former row scan did).
+        """
+        last_row = 0
+        while True:
+            rows = self.alias_rows.get(clean_supplier_str(importer_name.lower()), [])
+            match = next((row for row in rows if row[0] > last_row), None)
+            if match is None:
+                return importer_name
+
+            last_row, alias, real_name = match
+            importer_name = alias
+            Log.info(f"Found alias '{alias}' for importer '{real_name}' in consultation overview file")
+
+    def importer_sheet(self, importer_name, non_exact=False):
+        """
+        Returns (OverviewSheet, exact match) of the importer sheet (name compared lowercased, cleaned if non_exact), None if not found
+        """
+        sheet_name = self.sheet_names.get(importer_name.lower())
+        if sheet_name is not None:
+            return self.sheets[sheet_name], True
+
+        if non_exact:
+            sheet_name = self.clean_sheet_names.get(clean_supplier_str(importer_name.lower()))
+            if sheet_name is not None:
+                return self.sheets[sheet_name], False
+
+        return None
+
+    def __repr__(self):
+        return f"ConsultationOverview({self.path!r}, sheets={len(self.sheets)})"
+
+
+def get_consultation_overview(path):
+    """
+    Returns the ConsultationOverview of the file, read again only if the file changed.
+    Logs an error and returns None if the file does not exist.
+    """
+    abs_path = os.path.abspath(path)
+
+    try:
+        stat = os.stat(abs_path)
+    except FileNotFoundError:
+        _overviews.pop(abs_path, None)
+        Log.error(
+            f"Error: Consultation overview file not found at {path}",
+            title="ConsultationOverview file not found",
+        )
+        return None
+
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+
+    overview = _overviews.get(abs_path)
+    if overview is None or overview.stat_key != stat_key:
+        overview = _overviews[abs_path] = ConsultationOverview(abs_path, stat_key)
+        Log.debug(f"Loaded {overview}", key="installation_data")
+
+    return overview
+
+
+def clear_consultation_overviews():
+    _overviews.clear()
+
+
+def normalize_header(val):
+    return "".join(str(val).strip().lower().replace("-", "").split())
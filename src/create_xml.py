@@ -14,7 +14,6 @@ import pprint
 import xml.etree.ElementTree as ET
 import os
 import xml.etree.ElementTree as ET
-import base64
 import re
 
 
@@ -23,7 +22,19 @@ from .default_data import DefaultData
 from .log import Log
 from xml.dom.minidom import parseString
 from .shared import shared_data
-from .helper import r_float
+from .document_store import document_store
+from .fixed_point import (
+    format_fixed,
+    from_fixed,
+    rescale,
+    mul_fixed,
+    div_fixed,
+    MASS_DIGITS,
+    EMISSION_DIGITS,
+    SEE_DIGITS,
+    ELECTRICITY_DIGITS,
+    REPORT_DIGITS,
+)
 
 
 def create_report(prepared_data, test_report=False):
@@ -75,10 +86,8 @@ def add_elements(parent, input_dict):
             filename = val[len("binary_") :]  # Extrahiere den Pfad x aus "binary_x"
             filename = os.path.join(shared_data["current"]["output_dir"], "temp", filename)
             try:
-                with open(filename, "rb") as f:
-                    binary_data = f.read()
-                # Kodieren der Binärdaten in Base64
-                encoded_data = base64.b64encode(binary_data).decode("utf-8")
+                # base64 payload, read and encoded once per distinct document
+                encoded_data = document_store().base64(filename)
                 # Erstelle ein neues Element und setze den kodierten Inhalt
                 child = ET.SubElement(parent, key)
                 child.text = encoded_data
@@ -102,10 +111,7 @@ def create_report_structure(prepared_data, test_report):
 
     root_dict["ls_ImportedGood"] = []
 
-    for index, (key, imported_good) in enumerate(prepared_data["imported_goods"].items()):
-        imported_good["cn_code"] = key.split(";")[0]
-        imported_good["country"] = key.split(";")[1]
-
+    for index, imported_good in enumerate(prepared_data["imported_goods"].values()):
         imported_good_dict = {}
         entry_imported_good(imported_good_dict, index, imported_good)
         root_dict["ls_ImportedGood"].append(imported_good_dict)
@@ -116,13 +122,12 @@ def create_report_structure(prepared_data, test_report):
 def entry_imported_good(root, idx, imported_good):
     root["ItemNumber"] = str(idx + 1)
 
-    cn_code = imported_good["cn_code"]
-    cn_default_data = DefaultData.get("cn_code_default_values")[cn_code]
-    good_description = cn_default_data["description_of_goods"]
+    cn_code = imported_good.cn_code
+    good_description = DefaultData.get("cn_code_default_values").value(cn_code, "description_of_goods")
 
     shared_current = shared_data["current"]
     if shared_current.get("report_type", None) == "indirect_representative":
-        importer = imported_good["importer"]
+        importer = imported_good.importer
 
         root["Importer"] = {
             "Name": importer["name"],
@@ -135,7 +140,7 @@ def entry_imported_good(root, idx, imported_good):
         "CnCode": cn_code,
         "CommodityDetails": {"Description": good_description},
     }
-    root["OriginCountry"] = {"Country": imported_good["country_of_origin"]}
+    root["OriginCountry"] = {"Country": imported_good.country_of_origin}
 
     root["ls_ImportedQuantity"] = []
 
@@ -144,8 +149,8 @@ def entry_imported_good(root, idx, imported_good):
     overall_net_mass = 0
     overall_emissions = 0
 
-    for idx_, (_, imported_quantity) in enumerate(imported_good["procedures"].items()):
-        inward_processing_info = imported_quantity["inward_processing_information"]
+    for idx_, imported_quantity in enumerate(imported_good.procedures.values()):
+        inward_processing_info = imported_quantity.inward_processing_info
         inward_processing = inward_processing_info is not None
 
         xd_imported_quantity = {}
@@ -153,24 +158,24 @@ def entry_imported_good(root, idx, imported_good):
 
         xd_imported_quantity["SequenceNumber"] = str(idx_ + 1)
         xd_imported_quantity["Procedure"] = {
-            "RequestedProc": imported_quantity["requested_procedure"],
-            "PreviousProc": imported_quantity["previous_procedure"],
+            "RequestedProc": imported_quantity.requested_procedure,
+            "PreviousProc": imported_quantity.previous_procedure,
         }
 
         if inward_processing:
-            discharge_bill_waiver = inward_processing_info["bill_of_discharge_waiver"]
+            discharge_bill_waiver = inward_processing_info.bill_of_discharge_waiver
 
             # standard value discharge waiver is 0
             if discharge_bill_waiver is None or discharge_bill_waiver == "":
                 discharge_bill_waiver = "0"
 
             xd_imported_quantity["Procedure"]["InwardProcessingInfo"] = {
-                "MemberStateAuth": inward_processing_info["member_state_of_authorization"],
+                "MemberStateAuth": inward_processing_info.member_state_of_authorization,
                 "DischargeBillWaiver": discharge_bill_waiver,
-                "Authorisation": inward_processing_info["authorization"],
-                "StartTime": inward_processing_info["start_date"],
-                "EndTime": inward_processing_info["end_date"],
-                "Deadline": inward_processing_info["deadline"],
+                "Authorisation": inward_processing_info.authorization,
+                "StartTime": inward_processing_info.start_date,
+                "EndTime": inward_processing_info.end_date,
+                "Deadline": inward_processing_info.deadline,
             }
 
         xd_imported_quantity["ImportArea"] = {"ImportArea": "EU"}
@@ -180,32 +185,30 @@ def entry_imported_good(root, idx, imported_good):
         xd_imported_quantity["ls_MeasureProcedureImported"] = []
 
         if inward_processing_info is None:
-            net_mass_not_processed = imported_quantity["net_mass"]
+            net_mass_not_processed = imported_quantity.net_mass
             net_mass_processed = 0
 
         else:
-            net_mass_not_processed = r_float(inward_processing_info["not_processed"])
-            net_mass_processed = r_float(inward_processing_info["already_processed"])
-
-            total_net_mass = r_float(imported_quantity["net_mass"])
+            net_mass_not_processed = inward_processing_info.not_processed
+            net_mass_processed = inward_processing_info.already_processed
 
-            tolerance = 1e-8    # necessary because of float precision
-            if abs(net_mass_not_processed + net_mass_processed - total_net_mass) > tolerance:
-                Log.error(f"[entry_reported_good] Net masses not matching: {net_mass_not_processed} + {net_mass_processed} != {imported_quantity['net_mass']}")
+            # masses in fixed point, the sum is exact
+            if net_mass_not_processed + net_mass_processed != imported_quantity.net_mass:
+                Log.error(f"[entry_reported_good] Net masses not matching: {format_fixed(net_mass_not_processed, MASS_DIGITS)} + {format_fixed(net_mass_processed, MASS_DIGITS)} != {format_fixed(imported_quantity.net_mass, MASS_DIGITS)}")
 
         # TODO : Check if this is on correct level!
 
         if net_mass_not_processed != 0:
             mpi = {}
             mpi["Indicator"] = "0"
-            mpi["NetMass"] = r_float(net_mass_not_processed, return_string=True)
+            mpi["NetMass"] = format_fixed(net_mass_not_processed, MASS_DIGITS, REPORT_DIGITS)
             mpi["MeasurementUnit"] = "01"
             xd_imported_quantity["ls_MeasureProcedureImported"].append(mpi)
 
         if net_mass_processed != 0:
             mpi = {}
             mpi["Indicator"] = "1"
-            mpi["NetMass"] = r_float(net_mass_processed, return_string=True)
+            mpi["NetMass"] = format_fixed(net_mass_processed, MASS_DIGITS, REPORT_DIGITS)
             mpi["MeasurementUnit"] = "01"
             xd_imported_quantity["ls_MeasureProcedureImported"].append(mpi)
 
@@ -216,13 +219,15 @@ def entry_imported_good(root, idx, imported_good):
     # ende : ImportedQuantity
 
     root["MeasureImported"] = {
-        "NetMass": r_float(imported_good["total_net_mass"], return_string=True),
+        "NetMass": format_fixed(imported_good.total_net_mass, MASS_DIGITS, REPORT_DIGITS),
         "MeasurementUnit": "01",
     }
 
     shared_summary = shared_data["current"].setdefault("summary", {})
     if not shared_summary["test_report"]:
-        shared_summary["total_net_mass"] = shared_summary.get("total_net_mass", 0) + imported_good["total_net_mass"]
+        # summed in fixed point, the float is for display
+        shared_summary["total_net_mass_fixed"] = shared_summary.get("total_net_mass_fixed", 0) + imported_good.total_net_mass
+        shared_summary["total_net_mass"] = from_fixed(shared_summary["total_net_mass_fixed"], MASS_DIGITS)
 
     cn_code_default_data = DefaultData.get("cn_code_default_values")[cn_code]
     # see_direct = cn_code_default_data["see_direct"]
@@ -250,17 +255,16 @@ def entry_imported_good(root, idx, imported_good):
     total_direct = 0
     total_indirect = 0
 
-    for idx_, (key, goods_emission) in enumerate(imported_good["goods_emissions"].items()):
+    for idx_, goods_emission in enumerate(imported_good.goods_emissions.values()):
         xd_goods_emissions = {}
         root["ls_GoodsEmissions"].append(xd_goods_emissions)
 
         xd_goods_emissions["SequenceNumber"] = str(idx_ + 1)
         
-        xd_goods_emissions["ProductionCountry"] = goods_emission["country_of_production"]
-        xd_goods_emissions["ProductionCountry"] = goods_emission["country_of_production"]
+        xd_goods_emissions["ProductionCountry"] = goods_emission.country_of_production
 
-        operator = goods_emission["operator"]
-        installation = goods_emission["installation"]
+        operator = goods_emission.operator
+        installation = goods_emission.installation
 
         def strip_index_suffix(name):
             # Entfernt "_i_<Zahl>" am Ende des Strings
@@ -343,51 +347,53 @@ def entry_imported_good(root, idx, imported_good):
                 },
             }
 
-        direct_emissions = goods_emission["direct_emissions"]
-        indirect_emissions = goods_emission["indirect_emissions"]
+        direct_emissions = goods_emission.direct_emissions
+        indirect_emissions = goods_emission.indirect_emissions
+
+        # fixed point: net mass and emissions with REPORT_DIGITS, see with SEE_DIGITS (see fixed_point)
 
-        inst_netmass = r_float(goods_emission["net_mass"])
+        inst_netmass = rescale(goods_emission.net_mass, MASS_DIGITS, REPORT_DIGITS)
 
-        see_direct = r_float(direct_emissions["SpecificEmbeddedEmissions"], round_to=7)
+        see_direct = direct_emissions["SpecificEmbeddedEmissions"]
 
-        emission_factor = r_float(indirect_emissions["EmissionFactor"], round_to=5)
-        electricity_consumed = r_float(indirect_emissions["ElectricityConsumed"], round_to=5)
+        emission_factor = indirect_emissions["EmissionFactor"]
+        electricity_consumed = indirect_emissions["ElectricityConsumed"]
 
         if emission_factor is not None:  # not with default values
-            see_indirect = r_float(emission_factor * electricity_consumed, round_to=7)
+            see_indirect = mul_fixed(emission_factor, ELECTRICITY_DIGITS, electricity_consumed, ELECTRICITY_DIGITS, SEE_DIGITS)
         else:
-            see_indirect = r_float(indirect_emissions["SpecificEmbeddedEmissions"], round_to=7)
+            see_indirect = indirect_emissions["SpecificEmbeddedEmissions"]
 
 
         ## PLAUSUILITY CHECK -> Move to somewhere else!
 
-        if see_direct > 35.0:
-            Log.error(f"[entry_imported_good] see_direct > 35: {see_direct}")
+        if see_direct > 35 * 10**SEE_DIGITS:
+            Log.error(f"[entry_imported_good] see_direct > 35: {format_fixed(see_direct, SEE_DIGITS, trim=True)}")
 
-        if see_indirect > 35.0:
-            Log.error(f"[entry_imported_good] see_indirect > 35: {see_indirect}")
+        if see_indirect > 35 * 10**SEE_DIGITS:
+            Log.error(f"[entry_imported_good] see_indirect > 35: {format_fixed(see_indirect, SEE_DIGITS, trim=True)}")
 
         ## ## ## ## ## ## ## ## ## ## ## ## ## ## ## ## 
 
-        emissions_per_unit = r_float(see_direct) + r_float(see_indirect)
+        emissions_per_unit = rescale(see_direct, SEE_DIGITS, REPORT_DIGITS) + rescale(see_indirect, SEE_DIGITS, REPORT_DIGITS)
 
-        inst_overall_emissions = r_float(inst_netmass * emissions_per_unit)
-        inst_total_direct = r_float(inst_netmass * see_direct)
-        inst_total_indirect = r_float(inst_netmass * see_indirect)
+        inst_overall_emissions = mul_fixed(inst_netmass, REPORT_DIGITS, emissions_per_unit, REPORT_DIGITS, EMISSION_DIGITS)
+        inst_total_direct = mul_fixed(inst_netmass, REPORT_DIGITS, see_direct, SEE_DIGITS, EMISSION_DIGITS)
+        inst_total_indirect = mul_fixed(inst_netmass, REPORT_DIGITS, see_indirect, SEE_DIGITS, EMISSION_DIGITS)
 
-        overall_emissions += r_float(inst_overall_emissions)
-        total_direct += r_float(inst_total_direct)
-        total_indirect += r_float(inst_total_indirect)
+        overall_emissions += inst_overall_emissions
+        total_direct += inst_total_direct
+        total_indirect += inst_total_indirect
 
         xd_goods_emissions["ProducedMeasure"] = {
-            "NetMass": r_float(inst_netmass, return_string=True),
+            "NetMass": format_fixed(inst_netmass, REPORT_DIGITS),
             "MeasurementUnit": "01",
         }
 
         xd_goods_emissions["InstallationEmissions"] = {
-            "OverallEmissions": r_float(inst_overall_emissions, return_string=True),
-            "TotalDirect": r_float(inst_total_direct, return_string=True),
-            "TotalIndirect": r_float(inst_total_indirect, return_string=True),
+            "OverallEmissions": format_fixed(inst_overall_emissions, EMISSION_DIGITS, REPORT_DIGITS),
+            "TotalDirect": format_fixed(inst_total_direct, EMISSION_DIGITS, REPORT_DIGITS),
+            "TotalIndirect": format_fixed(inst_total_indirect, EMISSION_DIGITS, REPORT_DIGITS),
             "MeasurementUnit": "EMU1",
         }
 
@@ -395,25 +401,25 @@ def entry_imported_good(root, idx, imported_good):
             "DeterminationType": direct_emissions["DeterminationType"],
             "ApplicableReportingTypeMethodology": direct_emissions["ApplicableReportingTypeMethodology"],  # Comission Rules / Other Methods / Default
             "ApplicableReportingMethodology": direct_emissions["ApplicableReportingMethodology"],
-            "SpecificEmbeddedEmissions": see_direct,
+            "SpecificEmbeddedEmissions": format_fixed(see_direct, SEE_DIGITS, trim=True),
             "MeasurementUnit": "EMU1",  # default value always EMU1 = tonnes
         }
 
         xd_goods_emissions["IndirectEmissions"] = {
             "DeterminationType": indirect_emissions["DeterminationType"],
-            "SpecificEmbeddedEmissions": see_indirect,
+            "SpecificEmbeddedEmissions": format_fixed(see_indirect, SEE_DIGITS, trim=True),
             "MeasurementUnit": "EMU1",  # default value always EMU1 = tonnes
             "ElectricitySource": indirect_emissions["ElectricitySource"],
             "OtherSourceIndication": indirect_emissions["OtherSourceIndication"],
             "EmissionFactorSource": indirect_emissions["EmissionFactorSource"],
-            "ElectricityConsumed": r_float(electricity_consumed, round_to=5, return_string=True),
-            "EmissionFactor": r_float(emission_factor, round_to=5, return_string=True),
+            "ElectricityConsumed": format_fixed(electricity_consumed, ELECTRICITY_DIGITS),
+            "EmissionFactor": format_fixed(emission_factor, ELECTRICITY_DIGITS),
             "EmissionFactorSourceValue": indirect_emissions["EmissionFactorSourceValue"],
         }
 
         # TODO: this has to be a list! Dict must be restructured ...
 
-        method_id = list(goods_emission["production_method"].keys())[0]
+        method_id = goods_emission.method_id
 
         if method_id is not None and len(method_id) > 0:
 
@@ -422,15 +428,15 @@ def entry_imported_good(root, idx, imported_good):
             xd_goods_emissions["ProdMethodQualifyingParams"] = {
                 "SequenceNumber": "1",
                 "MethodId": method_id,
-                "MethodName": goods_emission["production_method_name"],
+                "MethodName": goods_emission.production_method_name,
             }
         else:
             Log.warning(f"[entry_imported_good] NO PRODUCTION METHOD PROVIDED for goods emission {idx_ + 1} of imported good {idx + 1}")
 
         # * Supporting Documents
 
-        if goods_emission.get("supporting_documents", None) is not None:
-            xd_goods_emissions["ls_SupportingDocuments"] = goods_emission["supporting_documents"]
+        if goods_emission.supporting_documents is not None:
+            xd_goods_emissions["ls_SupportingDocuments"] = goods_emission.supporting_documents
 
     #     """ structure dump
     #     0..99	 ------Supporting Documents (for emissions definition)	Qreport\ImportedGood\GoodsEmissions\SupportingDocuments
@@ -450,15 +456,16 @@ def entry_imported_good(root, idx, imported_good):
     # 1..1	Included binary object	Qreport\ImportedGood\GoodsEmissions\SupportingDocuments\Attachment\Binary	binary
     #     """
 
-    netmass = imported_good["total_net_mass"]
-    emissions_per_unit = overall_emissions / netmass
-    root["TotalEmissions"]["EmissionsPerUnit"] = r_float(emissions_per_unit, return_string=True)
-    root["TotalEmissions"]["OverallEmissions"] = r_float(overall_emissions, return_string=True)
-    root["TotalEmissions"]["TotalDirect"] = r_float(total_direct, return_string=True)
-    root["TotalEmissions"]["TotalIndirect"] = r_float(total_indirect, return_string=True)
+    netmass = imported_good.total_net_mass
+    emissions_per_unit = div_fixed(overall_emissions, EMISSION_DIGITS, netmass, MASS_DIGITS, REPORT_DIGITS)
+    root["TotalEmissions"]["EmissionsPerUnit"] = format_fixed(emissions_per_unit, REPORT_DIGITS)
+    root["TotalEmissions"]["OverallEmissions"] = format_fixed(overall_emissions, EMISSION_DIGITS, REPORT_DIGITS)
+    root["TotalEmissions"]["TotalDirect"] = format_fixed(total_direct, EMISSION_DIGITS, REPORT_DIGITS)
+    root["TotalEmissions"]["TotalIndirect"] = format_fixed(total_indirect, EMISSION_DIGITS, REPORT_DIGITS)
 
     if not shared_summary["test_report"]:
-        shared_summary["total_emissions"] = shared_summary.get("total_emissions", 0) + overall_emissions
+        shared_summary["total_emissions_fixed"] = shared_summary.get("total_emissions_fixed", 0) + overall_emissions
+        shared_summary["total_emissions"] = from_fixed(shared_summary["total_emissions_fixed"], EMISSION_DIGITS)
 
 
 def report_intro(root, prepared_data, test_report):
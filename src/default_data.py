@@ -1,14 +1,37 @@
 import openpyxl
+import threading
+import unicodedata
+import numpy as np
 from . import xlsx_access as xlsx
 from . import validator as v
+from . import helper
 from .log import Log
 from openpyxl.utils import column_index_from_string, get_column_letter
 
 
+# bump if the loaded sections or their validation change, invalidates the snapshots
+DEFAULT_DATA_SNAPSHOT_FORMAT = 4
+
+DEFAULT_DATA_SNAPSHOT_CACHE = "default_data"
+
+
 class DefaultData:
+    """
+    Sections of the default data file (see section_loaders) are loaded on the first get of their key,
+    from a snapshot keyed by the sha256 of the file if possible. Loaded sections are kept for later reports
+    in the same process as long as the file does not change.
+    """
+
     data_dict = None
     is_initialized = False
 
+    default_data_file = None
+    # sha256 of the default data file the sections in data_dict were loaded from
+    loaded_hash = None
+
+    # sections are loaded once, also if requested by parallel threads
+    lock = threading.RLock()
+
     @staticmethod
     def initialize(config):
         DefaultData._load(config)
@@ -17,7 +40,22 @@ class DefaultData:
     @staticmethod
     def get(key):
         DefaultData.init_check()
-        return DefaultData.data_dict[key]
+
+        data_dict = DefaultData.data_dict
+        if key not in data_dict and key in DefaultData.section_loaders:
+            with DefaultData.lock:
+                if key not in DefaultData.data_dict:
+                    DefaultData.data_dict[key] = DefaultData._load_section(key)
+            data_dict = DefaultData.data_dict
+
+        return data_dict[key]
+
+    @staticmethod
+    def load_all():
+        # loads all sections, e.g. to fill the snapshots in advance
+        for key in DefaultData.section_loaders:
+            DefaultData.get(key)
+        return DefaultData.data_dict
 
     @staticmethod
     def init_check():
@@ -26,28 +64,74 @@ class DefaultData:
 
     @staticmethod
     def _load(config):
+        """
+        Only the options are set, sections are loaded on demand. Sections of the same file stay loaded
+        (e.g. one initialize per api request), all are dropped if the file changed.
+        """
         file = config["default_data_file"]
-        wb = openpyxl.load_workbook(file)
+        file_hash = helper.file_sha256(file)
+
+        with DefaultData.lock:
+            if file_hash == DefaultData.loaded_hash:
+                sections = {key: value for key, value in DefaultData.data_dict.items() if key != "options"}
+            else:
+                sections = {}
+
+            # * options from the config file
+
+            default_data = {"options": config["options"]}
+            default_data.update(sections)
+
+            DefaultData.data_dict = default_data
+            DefaultData.default_data_file = file
+            DefaultData.loaded_hash = file_hash
+
+    @staticmethod
+    def _load_section(key):
+        """
+        Returns the section from its snapshot (pickle in helper.CACHE_DIR) or reads it from the workbook
+        """
+        file, file_hash = DefaultData.default_data_file, DefaultData.loaded_hash
 
-        default_data = {}
+        cache_key = f"{key}_{file_hash}_{DEFAULT_DATA_SNAPSHOT_FORMAT}"
+        section = helper.load_pickle_cache(DEFAULT_DATA_SNAPSHOT_CACHE, cache_key)
 
-        # * options from the config file
+        if section is not None:
+            Log.debug(lambda: f"Loaded '{key}' of {file} ({file_hash[:12]}) from snapshot", key="load_default")
+            return section
 
-        options = config["options"]
-        default_data["options"] = options
+        wb = openpyxl.load_workbook(file, read_only=True)
+        try:
+            # stored dimensions can be stale, the sheets are read to their end
+            for ws in wb.worksheets:
+                ws.reset_dimensions()
 
-        # * Our custom default values for the report
+            section = DefaultData.section_loaders[key](wb)
+        finally:
+            # read-only workbooks keep the file open until closed
+            wb.close()
 
+        helper.save_pickle_cache(DEFAULT_DATA_SNAPSHOT_CACHE, cache_key, section)
+        Log.debug(lambda: f"Loaded '{key}' of {file} ({file_hash[:12]})", key="load_default")
+
+        return section
+
+    # * Our custom default values for the report
+
+    @staticmethod
+    def _load_report_default_values(wb):
         ws = wb["report_default_values"]
 
-        default_data["report_default_values"] = {
+        return {
             "Declarant.IdentificationNumber": xlsx.cell_adjacent_to_keyword(
                 ws, "Declarant.IdentificationNumber"
             )
         }
 
-        # * CN Code default values from the EC
+    # * CN Code default values from the EC
 
+    @staticmethod
+    def _load_cn_code_default_values(wb):
         ws = wb["cn_code_default_values"]
 
         columns = {
@@ -62,12 +146,12 @@ class DefaultData:
 
         cn_code_data = DefaultData._load_default_table(ws, columns, "CN Code")
 
-        cn_code_data = {entry["cn_code"]: entry for entry in cn_code_data}
-
-        default_data["cn_code_default_values"] = cn_code_data
+        return CnDefaultTable({entry["cn_code"]: entry for entry in cn_code_data})
 
-        # * Country default values
+    # * Country default values
 
+    @staticmethod
+    def _load_country_data(wb):
         ws = wb["country_default_values"]
 
         columns = {
@@ -90,67 +174,69 @@ class DefaultData:
                 entry["country_code"],
             )
 
-        default_data["country_data"] = country_db
-
-        DefaultData.data_dict = default_data
+        return country_db
 
     @staticmethod
     def _load_default_table(ws, columns, upper_left_str):
-        upper_left = xlsx.keyword_index(ws, upper_left_str)
+        """
+        Reads the table below the upper_left_str header: the band of len(columns) columns is read row by row
+        up to the first row without value in the first column, then validated column by column.
+        Rows with an invalid value are skipped.
+        """
+        upper_left = xlsx.keyword_index_scan(ws, upper_left_str)
 
         start_row = int("".join(filter(str.isdigit, upper_left))) + 1
         start_column = column_index_from_string(
             "".join(filter(str.isalpha, upper_left))
         )
 
-        data = []
-
-        table_end = False
-        faulty_entry_num = 0
+        if ws.max_column is None:
+            # read-only sheets (dimensions reset in _load_section): determined from the cells
+            ws.calculate_dimension(force=True)
 
-        for row in ws.iter_rows(min_row=start_row):
-            entry = {}
+        # columns beyond the sheet are not part of the entries
+        keys = list(columns.keys())[: ws.max_column - start_column + 1]
 
-            faulty_entry = False
+        rows = []
+        for row in ws.iter_rows(min_row=start_row, min_col=start_column, max_col=start_column + len(keys) - 1, values_only=True):
+            # table end
+            if row[0] is None:
+                break
+            rows.append(row)
 
-            for cell in row:
-                if cell.column < start_column:
-                    continue
+        # column index of the first invalid value per row, None if valid
+        first_invalid = [None] * len(rows)
+        column_values = []
 
-                i = cell.column - start_column
+        Log.mute()
+        try:
+            for i, key in enumerate(keys):
+                values, valid_ls = v.process_and_validate_column(
+                    columns[key], [row[i] for row in rows], raise_errors=False, mute=True
+                )
+                column_values.append(values)
 
-                # table nend
-                if i == 0 and cell.value is None:
-                    table_end = True
-                    break
+                for row_idx, valid in enumerate(valid_ls):
+                    if not valid and first_invalid[row_idx] is None:
+                        first_invalid[row_idx] = i
+        finally:
+            Log.unmute()
 
-                # row end
-                if i >= len(columns):
-                    break
+        data = []
+        faulty_entry_num = 0
 
-                key = list(columns.keys())[i]
+        for row_idx, row in enumerate(rows):
+            i = first_invalid[row_idx]
 
-                Log.mute()
-                val, valid = v.process_and_validate(
-                    columns[key], cell.value, raise_errors=False, mute=True
+            if i is not None:
+                Log.debug(
+                    lambda: f"[load_default]\nInvalid value '{row[i]}' in column '{keys[i]}' / index: {get_column_letter(start_column + i) + str(start_row + row_idx)} in sheet '{ws.title}'\n → Skipping row...",
+                    "load_default",
                 )
-                Log.unmute()
-
-                if not valid:
-                    Log.debug(
-                        f"[load_default]\nInvalid value '{cell.value}' in column '{key}' / index: {get_column_letter(cell.column) + str(cell.row)} in sheet '{ws.title}'\n → Skipping row...",
-                        "load_default",
-                    )
-                    faulty_entry = True
-                    faulty_entry_num += 1
-                    break
-
-                entry[key] = val
+                faulty_entry_num += 1
+                continue
 
-            if table_end:
-                break
-            if not faulty_entry:
-                data.append(entry)
+            data.append({key: values[row_idx] for key, values in zip(keys, column_values)})
 
         if faulty_entry_num > 0:
             Log.debug(
@@ -161,6 +247,14 @@ class DefaultData:
         return data
 
 
+# key -> loader(workbook) of the sections, in the order of the default data file
+DefaultData.section_loaders = {
+    "report_default_values": DefaultData._load_report_default_values,
+    "cn_code_default_values": DefaultData._load_cn_code_default_values,
+    "country_data": DefaultData._load_country_data,
+}
+
+
 class CountryDB:
     def __init__(self):
         self.english_name_dict = {}
@@ -168,6 +262,11 @@ class CountryDB:
         self.alias_dict = {}
         self.un_code_dict = {}
 
+        # folded name / alias / un code -> country_info, built on first use (see fold_country_key)
+        self._folded_dict = None
+        # query -> country_info or None, one entry per distinct query string
+        self._resolved = {}
+
     def add_country(self, english_name, german_name, aliases, un_code):
         # Die Struktur des Landes als dict speichern
 
@@ -191,16 +290,47 @@ class CountryDB:
                 continue
             self.alias_dict[alias.lower()] = country_info
 
+        self._folded_dict = None
+        self._resolved = {}
+
     def find_country(self, query):
+        """
+        Returns the country_info of an english / german name, alias or UN code, or None.
+        Exact (lowercased) matches first, then the folded lookup (accents, whitespace, case).
+        Results are memoized per query string.
+        """
+        if query in self._resolved:
+            return self._resolved[query]
+
         # Suche nach dem Land in allen Dictionaries
-        query = query.lower()
-        return (
-            self.english_name_dict.get(query)
-            or self.german_name_dict.get(query)
-            or self.alias_dict.get(query)
+        query_lower = query.lower()
+        country_info = (
+            self.english_name_dict.get(query_lower)
+            or self.german_name_dict.get(query_lower)
+            or self.alias_dict.get(query_lower)
             or self.un_code_dict.get(query)
+            or self.folded_dict().get(fold_country_key(query))
         )
 
+        self._resolved[query] = country_info
+        return country_info
+
+    def find_countries(self, queries):
+        # batch version of find_country, one lookup per distinct query
+        return [self.find_country(query) for query in queries]
+
+    def folded_dict(self):
+        if self._folded_dict is None:
+            folded_dict = {}
+            # lowest priority first, as in find_country: english name > german name > alias > un code
+            for lookup_dict in (self.un_code_dict, self.alias_dict, self.german_name_dict, self.english_name_dict):
+                for key, country_info in lookup_dict.items():
+                    if isinstance(key, str):
+                        folded_dict[fold_country_key(key)] = country_info
+            self._folded_dict = folded_dict
+
+        return self._folded_dict
+
     def __repr__(self):
         countries_list = []
         for info in self.english_name_dict.values():
@@ -213,3 +343,130 @@ class CountryDB:
             country_repr = "<cntry> "
             countries_list.append(country_repr)
         return ":".join(countries_list)
+
+
+class CnDefaultTable:
+    """
+    Columnar CN code default values: sorted cn code array with parallel see arrays,
+    descriptions and production methods as interned strings.
+
+    table[cn_code] returns the entry dict as loaded from the default data file (KeyError if missing),
+    single cn codes (table[cn_code], value, in) are dictionary hits on the row index,
+    lookup / see resolve many cn codes in one call, optionally falling back to the first code
+    of the same HS heading (6 digits, then 4 digits) for codes not in the table.
+    """
+
+    text_columns = ("description_of_goods", "PM1", "PM2", "PM3")
+
+    def __init__(self, cn_code_data):
+        cn_codes = sorted(cn_code_data)
+
+        # wide enough for the longest cn code, keys are never truncated to a code of the table
+        self.cn_codes = np.array(cn_codes, dtype=f"U{max(map(len, cn_codes), default=8)}")
+        # cn code -> row, for single lookups
+        self.rows = {cn_code: row for row, cn_code in enumerate(cn_codes)}
+        # row -> entry dict, built on first access
+        self.entry_cache = {}
+        self.see_direct = np.array([cn_code_data[cn_code]["see_direct"] for cn_code in cn_codes], dtype=np.float64)
+        self.see_indirect = np.array([cn_code_data[cn_code]["see_indirect"] for cn_code in cn_codes], dtype=np.float64)
+        self.texts = {
+            column: [helper.intern_str(cn_code_data[cn_code].get(column)) for cn_code in cn_codes] for column in self.text_columns
+        }
+
+    def lookup(self, cn_codes, hs_fallback=False):
+        """
+        Returns the row index per cn code (numpy int array, -1 if not found)
+        """
+        # natural width, longer keys do not match (see _search)
+        cn_codes = np.asarray(cn_codes, dtype=str)
+        indices = self._search(cn_codes)
+
+        if hs_fallback:
+            for prefix_len in (6, 4):
+                missing = indices < 0
+                if not missing.any():
+                    break
+                # astype to a shorter string dtype truncates, i.e. the HS heading of the cn code
+                indices[missing] = self._search(cn_codes[missing].astype(f"U{prefix_len}"), prefix=True)
+
+        return indices
+
+    def _search(self, keys, prefix=False):
+        # exact match, or first cn code starting with the key if prefix
+        num_codes = len(self.cn_codes)
+        positions = np.searchsorted(self.cn_codes, keys)
+        found_codes = self.cn_codes[np.minimum(positions, num_codes - 1)] if num_codes else np.array([], dtype=self.cn_codes.dtype)
+
+        if prefix:
+            found = (positions < num_codes) & np.char.startswith(found_codes, keys)
+        else:
+            found = (positions < num_codes) & (found_codes == keys)
+
+        return np.where(found, positions, -1)
+
+    def see(self, cn_codes, hs_fallback=False):
+        """
+        Returns (see_direct, see_indirect) arrays for the cn codes, nan if not found
+        """
+        indices = self.lookup(cn_codes, hs_fallback=hs_fallback)
+        found = indices >= 0
+
+        see_direct = np.where(found, self.see_direct[indices], np.nan)
+        see_indirect = np.where(found, self.see_indirect[indices], np.nan)
+
+        return see_direct, see_indirect
+
+    def entry(self, index):
+        # shared entry dict of the row, like the entries of the former dict
+        entry = self.entry_cache.get(index)
+        if entry is None:
+            entry = self.entry_cache[index] = self.build_entry(index)
+        return entry
+
+    def build_entry(self, index):
+        entry = {
+            "cn_code": str(self.cn_codes[index]),
+            "see_direct": float(self.see_direct[index]),
+            "see_indirect": float(self.see_indirect[index]),
+        }
+        for column in self.text_columns:
+            entry[column] = self.texts[column][index]
+
+        # order of the default data columns
+        return {key: entry[key] for key in ("cn_code", "see_direct", "see_indirect", "description_of_goods", "PM1", "PM2", "PM3")}
+
+    def value(self, cn_code, column):
+        # single column of an entry, KeyError if the cn code is missing
+        entry_index = self.rows[cn_code]
+        if column in self.texts:
+            return self.texts[column][entry_index]
+        return self.entry(entry_index)[column]
+
+    def entries(self, cn_codes, hs_fallback=False):
+        # entry dict per cn code, None if not found
+        return [self.entry(index) if index >= 0 else None for index in self.lookup(cn_codes, hs_fallback=hs_fallback)]
+
+    def as_dict(self):
+        return {cn_code: self.entry(index) for cn_code, index in self.rows.items()}
+
+    def __getitem__(self, cn_code):
+        return self.entry(self.rows[cn_code])
+
+    def __contains__(self, cn_code):
+        return cn_code in self.rows
+
+    def __len__(self):
+        return len(self.cn_codes)
+
+    def __repr__(self):
+        return f"CnDefaultTable({len(self)} cn codes)"
+
+
+def fold_country_key(name):
+    """
+    Folded form of a country name for comparison: NFKD without combining marks (accents),
+    whitespace collapsed (incl. non-breaking spaces), lowercased; e.g. " Türkei " -> "turkei"
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.split()).lower()
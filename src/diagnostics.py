@@ -0,0 +1,140 @@
+# diagnostics.py
+"""
+
+- collect mode of the customer file loader and validator (see load_customer.validate_input_file):
+  problems are gathered in a DiagnosticsReport instead of exiting at the first one
+- while a report is collecting, Log.error raises a CollectedError, which is caught and recorded
+  where sheet, table, field and cell of the problem are known
+- the report is printed as terminal table and saved as json
+
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from .log_sink import strip_tags
+
+
+# report of the current thread, set by collecting
+_collecting = threading.local()
+
+
+class CollectedError(Exception):
+    """
+    Raised by Log.error in collect mode instead of exiting
+    """
+
+    def __init__(self, message, title="Error", source=None):
+        super().__init__(strip_tags(message))
+        self.message = strip_tags(message)
+        self.title = title
+        self.source = source
+
+
+class Diagnostic:
+    __slots__ = ("severity", "sheet", "table", "field", "cell", "rule", "value", "message")
+
+    def __init__(self, severity, message, sheet=None, table=None, field=None, cell=None, rule=None, value=None):
+        self.severity = severity
+        self.message = strip_tags(message).strip()
+        self.sheet = sheet
+        self.table = table
+        self.field = field
+        self.cell = cell
+        self.rule = rule
+        self.value = value
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"Diagnostic({self.severity!r}, {self.sheet!r}, {self.table!r}, {self.field!r}, {self.cell!r}, rule={self.rule!r})"
+
+
+class DiagnosticsReport:
+    def __init__(self, input_file=None):
+        self.input_file = input_file
+        self.diagnostics = []
+
+    def add(self, message, sheet=None, table=None, field=None, cell=None, rule=None, value=None, severity="error"):
+        self.diagnostics.append(Diagnostic(severity, message, sheet, table, field, cell, rule, value))
+
+    @property
+    def errors(self):
+        return [d for d in self.diagnostics if d.severity == "error"]
+
+    @property
+    def has_errors(self):
+        return any(d.severity == "error" for d in self.diagnostics)
+
+    def as_dict(self):
+        return {
+            "input_file": str(self.input_file),
+            "num_errors": len(self.errors),
+            "num_warnings": len(self.diagnostics) - len(self.errors),
+            "diagnostics": [d.as_dict() for d in self.diagnostics],
+        }
+
+    def save_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2, ensure_ascii=False, default=str)
+
+    def table_str(self, max_message_len=60):
+        columns = ["severity", "sheet", "table", "field", "cell", "rule", "message"]
+
+        rows = []
+        for d in self.diagnostics:
+            # first line of the message is enough for the table, the json has the full message
+            message = d.message.split("\n")[0]
+            if len(message) > max_message_len:
+                message = message[: max_message_len - 3] + "..."
+            rows.append([d.severity, d.sheet, d.table, d.field, d.cell, d.rule, message])
+        rows = [["" if value is None else str(value) for value in row] for row in rows]
+
+        widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+
+        lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+        lines.append("  ".join("─" * width for width in widths))
+        lines += ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+
+        return "\n".join(lines)
+
+    def print_table(self):
+        from .log import Log
+
+        num_errors = len(self.errors)
+        summary = f"<b>Diagnostics</r>  -  {num_errors} error{'s' if num_errors != 1 else ''}, {len(self.diagnostics) - num_errors} warning{'s' if len(self.diagnostics) - num_errors != 1 else ''}  -  <gray>{self.input_file}</r>"
+
+        if not self.diagnostics:
+            Log.info(f"{summary}\n\nNo problems found.")
+            return
+
+        Log.fs(f"{summary}\n\n{self.table_str()}", "error" if num_errors else "warning")
+
+    def __len__(self):
+        return len(self.diagnostics)
+
+    def __repr__(self):
+        return f"DiagnosticsReport({self.input_file!r}, {len(self.errors)} errors, {len(self.diagnostics)} diagnostics)"
+
+
+@contextmanager
+def collecting(report):
+    """
+    Log.error calls in the current thread raise a CollectedError while the block runs
+    """
+    previous = getattr(_collecting, "report", None)
+    _collecting.report = report
+    try:
+        yield report
+    finally:
+        _collecting.report = previous
+
+
+def active_report():
+    return getattr(_collecting, "report", None)
+
+
+def error_message(e):
+    # message of a collected error, type and text of any other exception
+    return e.message if isinstance(e, CollectedError) else f"{type(e).__name__}: {e}"
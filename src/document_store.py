@@ -0,0 +1,90 @@
+# document_store.py
+"""
+
+- content addressed store of the supporting documents of a report, keyed by the sha-256 of the file content
+- every distinct file is read once, its content and base64 payload (report xml) are reused for every reference
+  and zip entry, also for copies of the same content under other names
+- paths are mapped to their digest as long as size and modification time of the file are unchanged
+- one store per report: document_store() returns the store of shared_data["current"]
+
+"""
+
+import base64
+import hashlib
+import os
+import zipfile
+from .shared import shared_data
+
+
+class StoredDocument:
+    __slots__ = ("digest", "data", "_base64")
+
+    def __init__(self, digest, data):
+        self.digest = digest
+        self.data = data
+        self._base64 = None
+
+    @property
+    def base64(self):
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("utf-8")
+        return self._base64
+
+    def __repr__(self):
+        return f"StoredDocument({self.digest[:12]!r}, size={len(self.data)})"
+
+
+class DocumentStore:
+    """
+    paths: absolute path -> (size, mtime, digest)
+    documents: digest -> StoredDocument
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.documents = {}
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        cached = self.paths.get(path)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return self.documents[cached[2]]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        document = self.documents.get(digest)
+        if document is None:
+            document = self.documents[digest] = StoredDocument(digest, data)
+
+        self.paths[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return document
+
+    def base64(self, path):
+        return self.get(path).base64
+
+    def write_to_zip(self, zipf, path, arcname):
+        """
+        Like zipf.write(path, arcname), the content is taken from the store instead of reading the file again
+        """
+        document = self.get(path)
+
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        zinfo.compress_type = zipf.compression
+        zipf.writestr(zinfo, document.data, compresslevel=zipf.compresslevel)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __repr__(self):
+        return f"DocumentStore(paths={len(self.paths)}, documents={len(self.documents)})"
+
+
+def document_store():
+    store = shared_data["current"].get("document_store")
+    if store is None:
+        store = shared_data["current"]["document_store"] = DocumentStore()
+    return store
@@ -0,0 +1,101 @@
+# fixed_point.py
+"""
+
+- masses and emissions of prepare_data and create_xml are integers in fixed point:
+  value 1.5 with 9 digits is 1_500_000_000
+- values of the customer/ supplier/ default data are converted once (to_fixed), sums are exact,
+  products are rounded to the digits of the result (mul_fixed)
+- decimal strings of the report are created at serialization (format_fixed)
+
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+
+
+# net masses in nano tonnes (masses were aggregated with 9 digits before)
+MASS_DIGITS = 9
+# emissions in micro tCO2e, the digits of the report
+EMISSION_DIGITS = 6
+# specific embedded emissions (tCO2e/t)
+SEE_DIGITS = 7
+# electricity consumed and emission factor
+ELECTRICITY_DIGITS = 5
+# digits of masses and emissions in the report
+REPORT_DIGITS = 6
+
+
+def to_fixed(value, digits):
+    """
+    Returns the value rounded to digits as integer (half even, like round(value, digits)), None for None
+    """
+    if value is None:
+        return None
+
+    value = float(value)
+    scaled = round(value, digits) * 10**digits
+
+    # exact as long as the scaled value is far below 2**53, the product is then within an ulp of the integer
+    if abs(scaled) < 1e15:
+        return round(scaled)
+    return int(Decimal(value).scaleb(digits).to_integral_value(ROUND_HALF_EVEN))
+
+
+def round_div(numerator, denominator):
+    # integer division, rounded half even
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+def rescale(value, digits, to_digits):
+    if value is None:
+        return None
+    if to_digits >= digits:
+        return value * 10 ** (to_digits - digits)
+    return round_div(value, 10 ** (digits - to_digits))
+
+
+def mul_fixed(a, a_digits, b, b_digits, to_digits):
+    # product of two fixed point values with to_digits digits
+    return rescale(a * b, a_digits + b_digits, to_digits)
+
+
+def div_fixed(a, a_digits, b, b_digits, to_digits):
+    # quotient of two fixed point values with to_digits digits
+    exponent = to_digits - a_digits + b_digits
+    if exponent >= 0:
+        return round_div(a * 10**exponent, b)
+    return round_div(a, b * 10**-exponent)
+
+
+def from_fixed(value, digits):
+    # float for display (summaries), not for further arithmetic
+    if value is None:
+        return None
+    return value / 10**digits
+
+
+def format_fixed(value, digits, to_digits=None, trim=False):
+    """
+    Decimal string of the value with to_digits digits (default: digits), None for None.
+    trim: trailing zeros are removed, one digit after the point is kept ("2.951", "0.0")
+    """
+    if value is None:
+        return None
+
+    if to_digits is None:
+        to_digits = digits
+    value = rescale(value, digits, to_digits)
+
+    sign = "-" if value < 0 else ""
+    integer_part, fraction_part = divmod(abs(value), 10**to_digits)
+
+    if to_digits == 0:
+        return f"{sign}{integer_part}"
+
+    fraction_str = f"{fraction_part:0{to_digits}d}"
+    if trim:
+        fraction_str = fraction_str.rstrip("0") or "0"
+
+    return f"{sign}{integer_part}.{fraction_str}"
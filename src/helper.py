@@ -8,8 +8,17 @@ import plistlib
 from string import Template
 from pathlib import Path
 import difflib
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# directory for persistent caches (compiled layouts, parsed workbooks, ...), relative to the working directory
+CACHE_DIR = Path(".cache")
+
 
 # def get_macos_tags(file_path):
 #     try:
@@ -138,3 +147,75 @@ def clean_supplier_str(supplier_str):
         supplier_str = supplier_str.replace(word, "")
 
     return supplier_str
+
+
+def intern_str(value):
+    # equal strings share one object (cn codes, country codes, names repeat across entries)
+    return sys.intern(value) if type(value) is str else value
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    # sha256 hex digest of the file content
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def cache_file_path(cache_name, key, suffix=".pickle"):
+    # path of a cache entry: CACHE_DIR/<cache_name>/<key><suffix>
+    return CACHE_DIR / cache_name / f"{key}{suffix}"
+
+
+def load_pickle_cache(cache_name, key):
+    """
+    Returns the cached object or None if there is no (readable) cache entry
+    """
+    path = cache_file_path(cache_name, key)
+
+    if not path.is_file():
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        Log.debug(f"Ignoring unreadable cache file {path}: {e}", key="cache")
+        return None
+
+
+def save_pickle_cache(cache_name, key, obj):
+    """
+    Writes the cache entry atomically (temp file + rename), failures only skip the caching
+    """
+    path = cache_file_path(cache_name, key)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        Log.debug(f"Could not write cache file {path}: {e}", key="cache")
+
+
+def process_map(function, items, max_workers=None, min_parallel=2, chunks_per_worker=None):
+    """
+    Returns [function(item) for item in items], in parallel processes for batches of min_parallel items or more
+    (smaller batches run in process, starting the workers takes longer).
+    Items are sent one per task, or in contiguous chunks (chunks_per_worker per worker) to balance the load; results are in order of the items.
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(items))
+
+    if max_workers <= 1 or len(items) < min_parallel:
+        return [function(item) for item in items]
+
+    chunksize = -(-len(items) // (max_workers * chunks_per_worker)) if chunks_per_worker else 1
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, items, chunksize=chunksize))
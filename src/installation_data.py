@@ -6,7 +6,6 @@
 #
 # list of relevant installations is obtained from prepared data dict - only these are considered
 
-import openpyxl
 import pprint
 import os
 import shutil
@@ -18,13 +17,13 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
-from openpyxl.utils import column_index_from_string
 
 from src.log import Log
-from src.xlsx_access import load_table_to_dict, keyword_index, column_letter_from_string, row_index_from_string
-from src.load_supplier_tool import load_supplier_tool, get_installation_folder_path
+from src.load_supplier_tool import load_supplier_tool, read_supplier_tools, is_supplier_tool_cached, get_installation_folder_path, get_supplier_tool_path
 from src.helper import clean_supplier_str
 from src.shared import shared_data
+from src.consultation_overview import get_consultation_overview
+from src.diagnostics import DiagnosticsReport, collecting, error_message
 
 
 def get_installation_data(config, prepared_data, customer_dict):
@@ -127,7 +126,17 @@ def real_data_approach(installation_overview, relevant_installation_operators, c
     # constists of all installation entries
     installation_data = {}
 
-    for installation_operator in relevant_installation_operators:
+    # overview rows by exact and cleaned installation name, in row order
+    exact_overview_index = {}
+    clean_overview_index = {}
+    for co_installation_entry in installation_overview:
+        exact_overview_index.setdefault(co_installation_entry["installation"].strip().lower(), []).append(co_installation_entry)
+        clean_overview_index.setdefault(clean_supplier_str(co_installation_entry["installation"].lower()), []).append(co_installation_entry)
+
+    # * resolve the overview entry and action of every installation/ operator first, in a fixed order
+    resolved_installations = []
+
+    for installation_operator in sorted(relevant_installation_operators):
         installation_entry = None
 
         ## * Matching the installation data from the customer data with the overview file data
@@ -136,35 +145,31 @@ def real_data_approach(installation_overview, relevant_installation_operators, c
             # search two times, second time in case installation_operator is an installation of form: "installation (operator)"
 
             # exact search
-            for co_installation_entry in installation_overview:
-                if co_installation_entry["installation"].strip().lower() == installation_operator.strip().lower():
-                    if installation_entry is not None:
-                        Log.warning(
-                            f"\nFound installation {installation_operator} multiple times in overview file. Using the first one.",
-                        )
-                        continue
-                    Log.debug(
-                        f"Found exact match for installation {installation_operator} in overview file data",
-                        key="installation_data",
+            for co_installation_entry in exact_overview_index.get(installation_operator.strip().lower(), []):
+                if installation_entry is not None:
+                    Log.warning(
+                        f"\nFound installation {installation_operator} multiple times in overview file. Using the first one.",
                     )
-                    installation_entry = co_installation_entry
-
-                # installation not found in overview file
+                    continue
+                Log.debug(
+                    f"Found exact match for installation {installation_operator} in overview file data",
+                    key="installation_data",
+                )
+                installation_entry = co_installation_entry
 
             # non-exact search
             if installation_entry is None:
-                for co_installation_entry in installation_overview:
-                    if clean_supplier_str(co_installation_entry["installation"].lower()) == clean_supplier_str(installation_operator.lower()):
-                        if installation_entry is not None:
-                            Log.warning(
-                                f"Found multiple (non-exact) matches for installation {installation_operator}  in overview file. Using the first one.",
-                                title="supplier_workflow | multiple installations",
-                            )
+                for co_installation_entry in clean_overview_index.get(clean_supplier_str(installation_operator.lower()), []):
+                    if installation_entry is not None:
                         Log.warning(
-                            f"Found non-exact match for installation {installation_operator} in overview file data. Matched:\n'{installation_operator}'\n'{co_installation_entry['installation']}'",
-                            title="supplier_workflow | non-exact match on installation",
+                            f"Found multiple (non-exact) matches for installation {installation_operator}  in overview file. Using the first one.",
+                            title="supplier_workflow | multiple installations",
                         )
-                        installation_entry = co_installation_entry
+                    Log.warning(
+                        f"Found non-exact match for installation {installation_operator} in overview file data. Matched:\n'{installation_operator}'\n'{co_installation_entry['installation']}'",
+                        title="supplier_workflow | non-exact match on installation",
+                    )
+                    installation_entry = co_installation_entry
 
             if installation_entry is not None:
                 break
@@ -200,7 +205,27 @@ def real_data_approach(installation_overview, relevant_installation_operators, c
                 title="supplier_workflow | action: abort",
             )
 
-        elif action.startswith("zero_report"):
+        elif action == "ignore":
+            Log.warning(
+                f"Installation/ operator {installation_operator} has (unknown?) status '<orange>{installation_entry['communication status']}</r>' in overview file data\n -> action: ignore",
+                title="supplier_workflow | action: ignore",
+            )
+            continue
+
+        resolved_installations.append((installation_operator, installation_entry, action))
+
+    # * read the supplier tools of all installations at once (process pool for larger batches)
+    supplier_tool_report = DiagnosticsReport("supplier tools")
+    supplier_tools = read_installation_supplier_tools(
+        [(installation_operator, installation_entry) for installation_operator, installation_entry, action in resolved_installations if action == "use_supplier_tool_data"],
+        prepared_data,
+        config,
+        supplier_tool_report,
+    )
+
+    # * complete the installation entries in the order resolved
+    for installation_operator, installation_entry, action in resolved_installations:
+        if action.startswith("zero_report"):
             # corresponds to "zero_report_create_docs", "zero_report_without_docs" and "zero_report_sup_docs"
             try:
                 zero_report(installation_entry, prepared_data, config, action)
@@ -222,17 +247,18 @@ def real_data_approach(installation_overview, relevant_installation_operators, c
 
             installation_entry["type_of_determination"] = "01"
 
-            try:
-                load_supplier_tool(installation_entry, prepared_data, config)
+            if installation_operator not in supplier_tools:
+                # supplier tool not found or not readable, see read_installation_supplier_tools
+                continue
 
-            except Exception as e:
-                Log.error(
-                    f"Error loading supplier tool data for installation '{installation_entry['installation']}':\n{e}",
-                    title="supplier_workflow | supplier tool data error",
-                    delay_exit=True,
-                )
-                raise e
-            
+            supplier_tool_path, output_sheet = supplier_tools[installation_operator]
+
+            with collecting(supplier_tool_report):
+                try:
+                    load_supplier_tool(installation_entry, prepared_data, config, supplier_tool_path=supplier_tool_path, output_sheet=output_sheet)
+                except Exception as e:
+                    supplier_tool_report.add(error_message(e), table=installation_operator, rule="supplier tool data")
+                    continue
 
             # < supporting_docs_adjustment 17/04 >
             custom_additional_information, supporting_documents_list = get_supportings_documents_list(installation_entry, prepared_data, config)
@@ -243,18 +269,60 @@ def real_data_approach(installation_overview, relevant_installation_operators, c
                     f"[Real Data Approach] Found {'<yellow> default </r>' if use_of_default_docs else ''} supporting documents for installation '{installation_entry['installation']}':\n{supporting_documents_list}, besides the supplier tool data given",
                 )
 
-        elif action == "ignore":
-            Log.warning(
-                f"Installation/ operator {installation_operator} has (unknown?) status '<orange>{installation_entry['communication status']}</r>' in overview file data\n -> action: ignore",
-                title="supplier_workflow | action: ignore",
-            )
-            continue
-
         installation_data[installation_operator] = installation_entry
 
+    # errors of all installations are reported before exiting
+    if supplier_tool_report.has_errors:
+        for diagnostic in supplier_tool_report.errors:
+            Log.error(
+                f"Error loading supplier tool data for installation '{diagnostic.table}':\n{diagnostic.message}",
+                title="supplier_workflow | supplier tool data error",
+                delay_exit=True,
+            )
+        Log.exit_if_delayed()
+
     return installation_data
 
 
+def read_installation_supplier_tools(installations, prepared_data, config, report):
+    """
+    Looks up the supplier tools of the (installation/ operator name, installation entry) pairs and reads those not in the
+    supplier tool cache (read_supplier_tools, option "supplier_tool_workers" processes).
+    Returns installation/ operator name -> (supplier tool path, "Output" sheet values or None if cached); installations whose
+    supplier tool can not be found or read are added to the report (DiagnosticsReport) instead.
+    """
+    use_cache = config.get("options", {}).get("supplier_tool_cache", True)
+
+    supplier_tool_paths = {}
+    uncached_paths = []
+
+    with collecting(report):
+        for installation_operator, installation_entry in installations:
+            try:
+                installation_folder_path = get_installation_folder_path(installation_entry, prepared_data, config)
+                supplier_tool_path = get_supplier_tool_path(installation_folder_path, installation_entry, prepared_data, config)
+                if not (use_cache and is_supplier_tool_cached(supplier_tool_path)):
+                    uncached_paths.append(supplier_tool_path)
+            except Exception as e:
+                report.add(error_message(e), table=installation_operator, rule="supplier tool file")
+                continue
+
+            supplier_tool_paths[installation_operator] = supplier_tool_path
+
+    Log.debug(f"Reading {len(uncached_paths)} of {len(supplier_tool_paths)} supplier tools, the others are cached", key="installation_data")
+    read_results = read_supplier_tools(uncached_paths, config.get("options", {}).get("supplier_tool_workers"))
+
+    supplier_tools = {}
+    for installation_operator, supplier_tool_path in supplier_tool_paths.items():
+        output_sheet, error = read_results.get(supplier_tool_path, (None, None))
+        if error is not None:
+            report.add(f"Could not read supplier tool '{supplier_tool_path}': {error}", table=installation_operator, rule="supplier tool file")
+        else:
+            supplier_tools[installation_operator] = (supplier_tool_path, output_sheet)
+
+    return supplier_tools
+
+
 def zero_report(installation_entry, prepared_data, config, action, zero_report_without_docs=False, default_supporting_docs=False):
     supporting_documents_list = None
     custom_additional_information = None
@@ -566,20 +634,15 @@ def get_overview_data(config, prepared_data):
     general_info = prepared_data["general_info"]
     importer_name = general_info["importer_name"]
 
-    # * load the consultation overview file
+    # * load the consultation overview file (read once, see consultation_overview.py)
 
-    try:
-        wb = openpyxl.load_workbook(overview_file_path, data_only=True)
-    except FileNotFoundError:
-        Log.error(
-            f"Error: Consultation overview file not found at {overview_file_path}",
-            title="ConsultationOverview file not found",
-        )
+    overview = get_consultation_overview(overview_file_path)
+    if overview is None:
         return
 
     # * Load the alias names if given
 
-    alias_head_field = keyword_index(wb["1 - Customer List"], "Alias", fixed_row=3)
+    alias_head_field, real_name_field = overview.alias_fields
 
     if alias_head_field is None:
         Log.error(
@@ -588,8 +651,6 @@ def get_overview_data(config, prepared_data):
         )
         return
 
-    real_name_field = keyword_index(wb["1 - Customer List"], "Real Name", fixed_row=3)
-
     if real_name_field is None:
         Log.error(
             "Error: Real Name field not found in consultation overview file",
@@ -597,113 +658,41 @@ def get_overview_data(config, prepared_data):
         )
         return
 
-    alias_col = column_index_from_string(column_letter_from_string(alias_head_field))
-    real_name_col = column_index_from_string(column_letter_from_string(real_name_field))
-
-    for row in wb["1 - Customer List"].iter_rows(min_row=4, max_row=wb["1 - Customer List"].max_row, min_col=alias_col, max_col=real_name_col):
-        alias = row[0].value
-        real_name = row[1].value
-
-        if alias is None or real_name is None:
-            continue
-
-        if clean_supplier_str(real_name.lower()) == clean_supplier_str(importer_name.lower()):
-            if alias is not None and alias.strip() != "":
-                importer_name = alias
-
-                Log.info(f"Found alias '{alias}' for importer '{real_name}' in consultation overview file")
+    importer_name = overview.resolve_alias(importer_name)
 
     # * find the importer sheet within the excel file
 
-    importer_sheet = None
-
-    for sheet in wb.sheetnames:
-        if sheet.lower() == importer_name.lower():
-            importer_sheet = wb[sheet]
-            break
-
-    if importer_sheet is None:
-        # No sheet found -> try to determine sheet with non exact approach
-        for sheet in wb.sheetnames:
-            if clean_supplier_str(sheet.lower()) == clean_supplier_str(importer_name.lower()):
-                importer_sheet = wb[sheet]
-                Log.warning(
-                    f"Non-exact match on importer {importer_name} in sheet {sheet}, Matched: \n\n'{importer_name}'\n\n'{sheet}'",
-                    title="supplier_workflow | non exact match on importer sheet",
-                )
-                break
+    found = overview.importer_sheet(importer_name, non_exact=True)
 
-    if importer_sheet is None:
-        # Still no sheet found -> error
+    if found is None:
+        # No sheet found, also not with the non exact approach
         Log.warning(
             f"Error: No importer sheet found for importer {importer_name}",
             title="supplier_workflow | importer sheet not found",
         )
         return None
 
-    # * load table
+    importer_sheet, exact = found
 
-    # * determine column indices
-    head_index = keyword_index(importer_sheet, "installation")
-    if head_index is None:
-        Log.error(f"Could not find 'installation' column in {importer_sheet.title}",
-                  title="supplier_workflow | installation column not found")
-        return None
-
-    head_index_row = row_index_from_string(head_index)
-
-    # * build column list
-    columns = [
-        "installation",
-        "date of last update",
-        "operator",
-        "date of attempt $x",
-        "remarks dropdown $x",
-        "remarks $x",
-    ]
-    number_of_comm_attempts = 8
-    for col in columns[:]:
-        if col.endswith("$x"):
-            base = col[:-2]
-            for idx_ in range(1, number_of_comm_attempts + 1):
-                columns.append(f"{base}{idx_}")
-            columns.remove(col)
-
-    def _normalize_header(val: str) -> str:
-        return "".join(str(val).strip().lower().replace("-", "").split())
-
-    normalized_map = {
-        _normalize_header(cell.value): str(cell.value).strip()
-        for cell in importer_sheet[head_index_row] if cell.value
-    }
-
-    year = str(general_info.get("year"))
-    quarter = str(general_info.get("quarter"))
-    quarter_tag = f"Q{quarter} - {year}"
-    comm_status_quarter_col = _normalize_header(f"communication status - {quarter_tag}")
-
-    if comm_status_quarter_col in normalized_map:
-        comm_status_col_used = normalized_map[comm_status_quarter_col]
-        columns.insert(1, comm_status_col_used)
-    elif _normalize_header("communication status") in normalized_map:
-        comm_status_col_used = normalized_map[_normalize_header("communication status")]
-        columns.insert(1, comm_status_col_used)
-    else:
+    if not exact:
         Log.warning(
-            f"Neither '{comm_status_quarter_col}' nor 'communication status' found in sheet {importer_sheet.title}",
-            title="supplier_workflow | communication status column not found"
+            f"Non-exact match on importer {importer_name} in sheet {importer_sheet.title}, Matched: \n\n'{importer_name}'\n\n'{importer_sheet.title}'",
+            title="supplier_workflow | non exact match on importer sheet",
         )
-        comm_status_col_used = None
-
-    data = load_table_to_dict(importer_sheet, "installation", columns)
 
-    if comm_status_col_used and comm_status_col_used != "communication status":
-        for row in data:
-            row["communication status"] = row.pop(comm_status_col_used)
+    # * load table (installation rows with the communication status of the report quarter)
 
+    data = importer_sheet.installation_table(general_info.get("year"), general_info.get("quarter"))
+    if data is None:
+        return None
 
-    for i, row in enumerate(data[:10], start=1):
-        print(f"Row {i} | installation: {row.get('installation')} | communication status: {row.get('communication status')}")
+    Log.debug(
+        lambda: "\n".join(
+            f"Row {i} | installation: {row.get('installation')} | communication status: {row.get('communication status')}"
+            for i, row in enumerate(data[:10], start=1)
+        ),
+        key="installation_data",
+    )
 
 
     return data
@@ -0,0 +1,199 @@
+# layout_plan.py
+"""
+
+- compile every version of the version layouts .yml file into an immutable LayoutPlan
+  (merged with base via inheret_version, lowercased via load_version_layouts)
+- plans are cached in process and on disk, keyed by the sha256 of the .yml file
+- header positions found in a customer file are kept in a per-file ResolvedLayout, plans are never changed
+
+"""
+
+from types import MappingProxyType
+from openpyxl.utils import column_index_from_string
+from .log import Log
+from . import helper
+
+
+# bump if the compiled structure changes, invalidates the disk cache
+LAYOUT_PLAN_FORMAT = 1
+
+LAYOUT_PLAN_CACHE = "layout_plans"
+
+# yml sha256 -> {version: LayoutPlan}
+_layout_plans = {}
+
+
+class LayoutPlan:
+    """
+    Compiled, read-only layout of one version.
+    layout is a read-only mapping (lists are tuples) in the format of load_version_layouts + inheret_version,
+    it can be shared between files and threads.
+    """
+
+    __slots__ = ("version", "layout", "sheets")
+
+    def __init__(self, version, layout_dict):
+        self.version = version
+        self.layout = freeze({"sheets": layout_dict.get("sheets") or []})
+        self.sheets = self.layout["sheets"]
+
+    def as_dict(self):
+        """
+        Returns a mutable copy in the format of inheret_version
+        """
+        return {"sheets": thaw(self.sheets)}
+
+    def __repr__(self):
+        return f"LayoutPlan({self.version!r}, sheets={[sheet['code_sheet_name'] for sheet in self.sheets]})"
+
+
+def load_layout_plans(version_layouts_file):
+    """
+    Returns a read-only mapping version -> LayoutPlan for all versions of the file (including 'base').
+    The .yml file is only parsed if its content is neither cached in process nor on disk.
+    """
+    yml_hash = helper.file_sha256(version_layouts_file)
+
+    if yml_hash in _layout_plans:
+        return _layout_plans[yml_hash]
+
+    cache_key = f"{yml_hash}_{LAYOUT_PLAN_FORMAT}"
+    compiled = helper.load_pickle_cache(LAYOUT_PLAN_CACHE, cache_key)
+
+    if compiled is None:
+        compiled = compile_version_layouts(version_layouts_file)
+        helper.save_pickle_cache(LAYOUT_PLAN_CACHE, cache_key, compiled)
+        Log.debug(f"Compiled version layouts {version_layouts_file} ({yml_hash[:12]})", key="layout_plan")
+    else:
+        Log.debug(f"Loaded compiled version layouts {version_layouts_file} ({yml_hash[:12]}) from cache", key="layout_plan")
+
+    plans = MappingProxyType({version: LayoutPlan(version, layout_dict) for version, layout_dict in compiled.items()})
+    _layout_plans[yml_hash] = plans
+
+    return plans
+
+
+def compile_version_layouts(version_layouts_file):
+    """
+    Returns {version: merged and lowercased layout dict} (plain dicts, picklable)
+    """
+    # deferred import, load_customer imports this module
+    from .load_customer import load_version_layouts, inheret_version
+
+    layout_dict = load_version_layouts(version_layouts_file)
+
+    return {version: inheret_version(layout_dict, version) for version in layout_dict}
+
+
+class ResolvedTable:
+    """
+    Header positions of one table layout in one customer file (see load_customer.resolve_table).
+    fields are the table's field layouts found in the file, head_indices their column letters (vertical)
+    or row numbers (horizontal), dropped_fields the code_field_names of missing optional fields.
+    """
+
+    __slots__ = (
+        "sheet_name",
+        "table_name",
+        "orientation",
+        "head_row",
+        "head_col",
+        "primary_key",
+        "primary_key_pos",
+        "fields",
+        "head_indices",
+        "field_positions",
+        "dropped_fields",
+        "offset",
+        "max_entries",
+        "is_capped",
+        "max_empty_entries",
+    )
+
+    def __init__(
+        self,
+        sheet_name,
+        table_name,
+        orientation,
+        head_row,
+        head_col,
+        primary_key,
+        fields,
+        head_indices,
+        dropped_fields,
+        offset,
+        max_entries,
+        is_capped,
+        max_empty_entries,
+    ):
+        self.sheet_name = sheet_name
+        self.table_name = table_name
+        self.orientation = orientation
+        self.head_row = head_row
+        self.head_col = head_col
+        self.primary_key = primary_key
+        self.fields = tuple(fields)
+        self.head_indices = tuple(head_indices)
+        self.dropped_fields = tuple(dropped_fields)
+        self.offset = offset
+        self.max_entries = max_entries
+        self.is_capped = is_capped
+        self.max_empty_entries = max_empty_entries
+
+        # column indices (vertical) or row numbers (horizontal)
+        if orientation == "vertical":
+            self.primary_key_pos = column_index_from_string(primary_key)
+            self.field_positions = tuple(column_index_from_string(head_index) for head_index in self.head_indices)
+        else:
+            self.primary_key_pos = int(primary_key)
+            self.field_positions = tuple(int(head_index) for head_index in self.head_indices)
+
+    def head_index(self, code_field_name):
+        for field, head_index in zip(self.fields, self.head_indices):
+            if field["code_field_name"] == code_field_name:
+                return head_index
+        return None
+
+    def __repr__(self):
+        return f"ResolvedTable({self.sheet_name!r}, {self.table_name!r}, head={self.head_col}{self.head_row}, primary_key={self.primary_key!r}, dropped_fields={self.dropped_fields})"
+
+
+class ResolvedLayout:
+    """
+    Per-file header positions of all tables: code_sheet_name -> table_name -> ResolvedTable
+    """
+
+    __slots__ = ("sheets",)
+
+    def __init__(self):
+        self.sheets = {}
+
+    def add_table(self, code_sheet_name, resolved_table):
+        self.sheets.setdefault(code_sheet_name, {})[resolved_table.table_name] = resolved_table
+
+    def table(self, code_sheet_name, table_name):
+        return self.sheets.get(code_sheet_name, {}).get(table_name)
+
+    def __repr__(self):
+        return f"ResolvedLayout({ {sheet: list(tables) for sheet, tables in self.sheets.items()} })"
+
+
+def clear_layout_plans():
+    # drops the in-process plans, the disk cache is keyed by content and needs no invalidation
+    _layout_plans.clear()
+
+
+def freeze(data):
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    elif isinstance(data, (list, tuple)):
+        return tuple(freeze(element) for element in data)
+    return data
+
+
+def thaw(data):
+    if isinstance(data, MappingProxyType):
+        return {key: thaw(value) for key, value in data.items()}
+    elif isinstance(data, tuple):
+        return [thaw(element) for element in data]
+    return data
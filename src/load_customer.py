@@ -15,6 +15,9 @@ from .log import Log
 from . import xlsx_access as xls
 from . import validator as val
 from . import helper
+from .layout_plan import load_layout_plans, ResolvedLayout, ResolvedTable
+from .table_extractor import get_table_extractor
+from .diagnostics import DiagnosticsReport, CollectedError, collecting, active_report, error_message
 
 
 import warnings
@@ -23,46 +26,101 @@ warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 import openpyxl  # noqa
 from openpyxl.utils import column_index_from_string, get_column_letter  # noqa
 
+# a table ends after this many consecutive entries without primary key (layout key 'max_empty_entries')
+DEFAULT_MAX_EMPTY_ENTRIES = 50
 
-def process_input_file(input_file, version_layouts_file):
-    file_layout_dict = load_version_layouts(version_layouts_file)
+# number of columns read per iter_rows pass for horizontal tables
+HORIZONTAL_CHUNK_SIZE = 64
 
-    version = determine_version(input_file, file_layout_dict)
+
+def process_input_file(input_file, version_layouts_file, streaming=False):
+    """
+    streaming=True opens the customer file read-only and reads each table as one row band,
+    so memory and parse time scale with the tables instead of the sheet dimensions
+    """
+    # compiled once per .yml content, see layout_plan.py
+    layout_plans = load_layout_plans(version_layouts_file)
+
+    # the workbook is opened once and shared by version detection and sheet extraction
+    wb = load_customer_workbook(input_file, read_only=streaming)
+
+    version = determine_version(wb, layout_plans)
     Log.info(f"Detected version: {version}")
 
-    version_layout_dict = inheret_version(file_layout_dict, version)
+    # the plan is shared, header positions of this file are resolved separately (ResolvedLayout)
+    raw_data_dict = load_customer_sheet(wb, layout_plans[version].layout)
+
+    if streaming:
+        # read-only workbooks keep the file open until closed
+        wb.close()
+
+    return raw_data_dict
+
+
+def validate_input_file(input_file, version_layouts_file, streaming=False):
+    """
+    Collect mode of process_input_file: the whole file is checked in one pass, every invalid or missing value
+    and table is recorded in a DiagnosticsReport instead of exiting at the first one (see diagnostics.py).
+
+    Returns (raw_data_dict or None, DiagnosticsReport), raw_data_dict should only be used if not report.has_errors
+    """
+    report = DiagnosticsReport(input_file)
+
+    with collecting(report):
+        try:
+            raw_data_dict = process_input_file(input_file, version_layouts_file, streaming=streaming)
+        except (CollectedError, ValueError) as e:
+            # file level problems (version, layout file), an invalid version raises a ValueError
+            report.add(error_message(e), rule="file")
+            raw_data_dict = None
+
+    return raw_data_dict, report
+
+
+def load_customer_workbook(input_file, read_only=False):
+    """
+    Returns a loaded workbook handle for the customer file.
+
+    The workbook is opened in the mode the sheet extraction needs (cached values instead of formulas),
+    an already loaded workbook is passed through unchanged.
+    Read-only worksheets ignore the dimensions stored in the file (they can be stale) and are read to their end.
+    """
+    if isinstance(input_file, openpyxl.Workbook):
+        return input_file
+
+    wb = openpyxl.load_workbook(input_file, data_only=True, read_only=read_only)
 
-    return load_customer_sheet(input_file, version_layout_dict)
+    if read_only:
+        for ws in wb.worksheets:
+            ws.reset_dimensions()
+
+    return wb
 
 
 def load_customer_sheet(input_file, file_layout):
     """
+    input_file can be a file path or a workbook handle from load_customer_workbook
+
+    file_layout (e.g. LayoutPlan.layout) is only read, the header positions found in the file
+    are kept in a ResolvedLayout, so one layout can be shared between files and threads
+
     TODO : Full Support for legacy structure, not only with sheets
     """
     raw_data_dict = {}
 
-    wb = openpyxl.load_workbook(input_file, data_only=True)
+    wb = load_customer_workbook(input_file)
+
+    resolved_layout = ResolvedLayout()
 
     for sheet in file_layout["sheets"]:
         # iterate through sheets
 
-        if "code_sheet_name" in sheet:
-            sheet_name_ls = sheet["alias_sheet_name"]
-            code_sheet_name = sheet["code_sheet_name"]
-        else:
-            Log.error(f"[load_customer_sheet] Missing 'code_sheet_name' in sheet '{sheet}'")
-
-        if type(sheet_name_ls) is not list:
-            sheet_name_ls = [sheet_name_ls]
+        ws, code_sheet_name, sheet_name = find_layout_sheet(wb, sheet)
 
-        ws = None
-        for sheet_name in sheet_name_ls:
-            if sheet_name in wb.sheetnames:
-                # sheet name can also be a list
-                ws = wb[sheet_name]
-                break
         if ws is None:
             Log.warning(f"! Sheet '{sheet_name}' not found in input file")
+            if (report := active_report()) is not None:
+                report.add("Sheet not found in input file", sheet=sheet_name, rule="sheet", severity="warning")
             continue
 
         raw_data_sheet = {}
@@ -79,194 +137,302 @@ def load_customer_sheet(input_file, file_layout):
             raw_data_table = []
             raw_data_sheet[table_name] = raw_data_table
 
-            num_entries = table["num_entries"]
-            num_entries = int(num_entries.replace(".", ""))
+            try:
+                resolved_table = resolve_table(ws, sheet_name, table)
+            except CollectedError as e:
+                # collect mode: the table can not be located, its values are not checked
+                active_report().add(e.message, sheet=sheet_name, table=table_name, rule="table")
+                continue
+
+            resolved_layout.add_table(code_sheet_name, resolved_table)
+
+            # entries are read lazily, see read_table_band
+            entry_values_ls, _ = read_table_band(
+                ws,
+                resolved_table.orientation,
+                resolved_table.head_row,
+                resolved_table.head_col,
+                [resolved_table.primary_key_pos] + list(resolved_table.field_positions),
+                resolved_table.offset,
+                # one more to detect a truncated table
+                resolved_table.max_entries + 1 if resolved_table.is_capped else resolved_table.max_entries,
+            )
 
-            upper_left = table["upper_left"]
+            # specialized per header layout, see table_extractor.py
+            extract = get_table_extractor(resolved_table)
 
-            if not isinstance(upper_left, list):
-                upper_left = [upper_left]
+            num_actual_entries = extract(entry_values_ls, raw_data_table)
 
-            # upper_left is a list now
+            if num_actual_entries == 0:
+                Log.warning(f"[load_customer_sheet] Empty table '{table_name}' in sheet '{sheet_name}'")
 
-            upper_left_index = None
+    return raw_data_dict
 
-            for i, ul in enumerate(upper_left):
-                if ul.startswith("auto:"):
-                    upper_left_index = xls.keyword_index(ws, ul[5:])
-                else:
-                    upper_left_index = xls.keyword_index(ws, ul)
 
-                if upper_left_index is None:
-                    Log.debug(
-                        f" (list) Could not determine upper left cell for table '{table_name}' in sheet '{sheet_name}' / (upper_left = {upper_left}, table['upper_left'] = {table['upper_left']})",
-                        key="load_customer_sheet",
-                    )
-                    continue
+def resolve_layout(input_file, file_layout):
+    """
+    Returns the ResolvedLayout (header positions) of all tables of file_layout in the customer file
+    """
+    wb = load_customer_workbook(input_file)
 
-                else:
-                    break
+    resolved_layout = ResolvedLayout()
 
-            if upper_left_index is None:
-                Log.error(
-                    f"Could not determine upper left cell for table '<blue>{table_name}</blue>' in sheet '<blue>{sheet_name}</blue>' / (upper_left = <blue>{upper_left}</blue>, table['upper_left'] = <blue>{table['upper_left']}</blue>)"
-                )
+    for sheet in file_layout["sheets"]:
+        ws, code_sheet_name, sheet_name = find_layout_sheet(wb, sheet)
 
-            upper_left_index, is_valid = val.process_and_validate("cell_index", upper_left_index)
+        if ws is None:
+            continue
 
-            if not is_valid:
-                Log.error(
-                    f"Invalid upper left index '<blue>{upper_left_index}</blue>' in sheet '{sheet_name}' : table '{table_name}'",
-                    title="Invalid upper left index",
-                )
+        for table in sheet["tables"]:
+            resolved_layout.add_table(code_sheet_name, resolve_table(ws, sheet_name, table))
 
-            primary_key = None
-            primary_key_candidate = None
-            head_row = "".join(filter(str.isdigit, upper_left_index))
-            head_col = "".join(filter(str.isalpha, upper_left_index))
+    return resolved_layout
 
-            ignore_fields = []
-            for field in table["fields"]:
-                # iterate through fields in tables to collect indices
 
-                if "code_field_name" not in field:
-                    Log.error(f"[load_customer_sheet] Missing 'code_field_name' in field '{field}' in table '{table_name}' in sheet '{sheet_name}'")
+def find_layout_sheet(wb, sheet):
+    """
+    Returns (worksheet or None, code_sheet_name, sheet name) of a sheet layout
+    """
+    if "code_sheet_name" in sheet:
+        sheet_name_ls = sheet["alias_sheet_name"]
+        code_sheet_name = sheet["code_sheet_name"]
+    else:
+        Log.error(f"[load_customer_sheet] Missing 'code_sheet_name' in sheet '{sheet}'")
 
-                code_field_name = field["code_field_name"]
+    if isinstance(sheet_name_ls, str):
+        sheet_name_ls = [sheet_name_ls]
 
-                if "alias_field_name" in field:
-                    alias_field_names = field["alias_field_name"]
-                else:
-                    alias_field_names = [code_field_name]
+    ws = None
+    for sheet_name in sheet_name_ls:
+        if sheet_name in wb.sheetnames:
+            # sheet name can also be a list
+            ws = wb[sheet_name]
+            break
 
-                if table["orientation"] == "vertical":
-                    # for vertical tables, head index is a column letter
-                    # note that alias_field_name can also be a list
+    return ws, code_sheet_name, sheet_name
 
-                    required = True if "required" not in field or field["required"] else False
 
-                    head_index_field = xls.keyword_index(ws, alias_field_names, fixed_row=head_row, required=required)
+def resolve_table(ws, sheet_name, table):
+    """
+    Finds the upper left cell, the field headers and the primary key of a table layout in the worksheet.
+    The table layout is not changed.
+    """
+    table_name = table["table_name"]
 
-                    if head_index_field is None and not required:
-                        ignore_fields.append(code_field_name)  # add to delete from table["fields"]
-                        continue
+    max_entries, is_capped, max_empty_entries = table_entry_limits(table)
 
-                    field["head_index"] = "".join(filter(str.isalpha, head_index_field))
+    upper_left = table["upper_left"]
 
-                elif table["orientation"] == "horizontal":
-                    # for horizontal tables, head index is a row number
-                    head_index_field = xls.keyword_index(ws, alias_field_names, fixed_column=head_col, required=True)
-                    field["head_index"] = "".join(filter(str.isdigit, head_index_field))
+    if isinstance(upper_left, str):
+        upper_left = [upper_left]
+    else:
+        upper_left = list(upper_left)
 
-                if "primary_key" in field and field["primary_key"]:
-                    # the primary key is the row or column that is used to identify the entry
-                    primary_key = str(field["head_index"])
+    # upper_left is a list now
 
-                if primary_key_candidate is None and field["type"].endswith("_m"):
-                    # primary_key_candidate is the first mandatory field and is used if no primary key is specified
-                    primary_key_candidate = str(field["head_index"])
+    upper_left_index = None
 
-            for field in ignore_fields:
-                table["fields"] = [f for f in table["fields"] if f["code_field_name"] != field]
+    for i, ul in enumerate(upper_left):
+        if ul.startswith("auto:"):
+            upper_left_index = xls.keyword_index(ws, ul[5:])
+        else:
+            upper_left_index = xls.keyword_index(ws, ul)
 
-            if primary_key is None:
-                if primary_key_candidate is not None:
-                    primary_key = primary_key_candidate
-                else:
-                    Log.error(f"[load_customer_sheet] Could not determine primary key for '{table_name}' in sheet '{sheet_name}'")
+        if upper_left_index is None:
+            Log.debug(
+                f" (list) Could not determine upper left cell for table '{table_name}' in sheet '{sheet_name}' / (upper_left = {upper_left}, table['upper_left'] = {table['upper_left']})",
+                key="load_customer_sheet",
+            )
+            continue
 
-            report_empty = False
-            num_actual_entries = 0
+        else:
+            break
+
+    if upper_left_index is None:
+        Log.error(
+            f"Could not determine upper left cell for table '<blue>{table_name}</blue>' in sheet '<blue>{sheet_name}</blue>' / (upper_left = <blue>{upper_left}</blue>, table['upper_left'] = <blue>{table['upper_left']}</blue>)"
+        )
+
+    upper_left_index, is_valid = val.process_and_validate("cell_index", upper_left_index)
+
+    if not is_valid:
+        Log.error(
+            f"Invalid upper left index '<blue>{upper_left_index}</blue>' in sheet '{sheet_name}' : table '{table_name}'",
+            title="Invalid upper left index",
+        )
+
+    primary_key = None
+    primary_key_candidate = None
+    head_row = "".join(filter(str.isdigit, upper_left_index))
+    head_col = "".join(filter(str.isalpha, upper_left_index))
+
+    fields = []
+    head_indices = []
+    dropped_fields = []
+
+    for field in table["fields"]:
+        # iterate through fields in tables to collect indices
+
+        if "code_field_name" not in field:
+            Log.error(f"[load_customer_sheet] Missing 'code_field_name' in field '{field}' in table '{table_name}' in sheet '{sheet_name}'")
+
+        code_field_name = field["code_field_name"]
+
+        if "alias_field_name" in field:
+            alias_field_names = field["alias_field_name"]
+        else:
+            alias_field_names = [code_field_name]
 
-            offset = 1
-            if "num_examples" in table and table["num_examples"] is not None:
-                offset = int(table["num_examples"]) + 1
+        try:
+            if table["orientation"] == "vertical":
+                # for vertical tables, head index is a column letter
+                # note that alias_field_name can also be a list
 
-            for i in range(offset, num_entries + offset):
-                # iterate through entries (rows or columns) in tables
+                required = True if "required" not in field or field["required"] else False
 
-                if table["orientation"] == "vertical":
-                    pk_field = primary_key + str(i + int(head_row))
-                    primary_key_val = ws[pk_field].value
-                elif table["orientation"] == "horizontal":
-                    pk_field = get_column_letter(i + column_index_from_string(head_col)) + primary_key
-                    primary_key_val = ws[pk_field].value
-                if primary_key_val is None or primary_key_val == "" or primary_key_val == "--":
-                    report_empty = True
+                head_index_field = xls.keyword_index(ws, alias_field_names, fixed_row=head_row, required=required)
+
+                if head_index_field is None and not required:
+                    # optional column missing in this file
+                    dropped_fields.append(code_field_name)
                     continue
-                else:
-                    num_actual_entries += 1
 
-                if report_empty:
-                    Log.warning(
-                        f"[load_customer_sheet] Empty row encountered in table '{table_name}' before row {i + int(head_row)} \n primary_key = {primary_key} ; primary_key_val = {primary_key_val}"
-                    )
-                    report_empty = False
+                head_index = "".join(filter(str.isalpha, head_index_field))
 
-                entry = {}
+            elif table["orientation"] == "horizontal":
+                # for horizontal tables, head index is a row number
+                head_index_field = xls.keyword_index(ws, alias_field_names, fixed_column=head_col, required=True)
+                head_index = "".join(filter(str.isdigit, head_index_field))
 
-                for field in table["fields"]:
-                    # iterate for fields for given row or column
+        except CollectedError as e:
+            # collect mode: missing header of a required field, the other fields of the table are still checked
+            active_report().add(e.message, sheet=sheet_name, table=table_name, field=code_field_name, rule="header")
+            dropped_fields.append(code_field_name)
+            continue
 
-                    if "code_field_name" in field and "alias_field_name" in field:
-                        alias_field_name = field["alias_field_name"]
-                        code_field_name = field["code_field_name"]
-                    else:
-                        alias_field_name = code_field_name = field["field_name"]
+        fields.append(field)
+        head_indices.append(head_index)
 
-                    if table["orientation"] == "vertical":
-                        index = field["head_index"] + str(i + int(head_row))
-                        value = ws[index].value
-                    elif table["orientation"] == "horizontal":
-                        index = get_column_letter(i + column_index_from_string(head_col)) + field["head_index"]
-                        value = ws[index].value
+        if "primary_key" in field and field["primary_key"]:
+            # the primary key is the row or column that is used to identify the entry
+            primary_key = str(head_index)
 
-                    value = "" if value is None else value
-                    valid = True
+        if primary_key_candidate is None and field["type"].endswith("_m"):
+            # primary_key_candidate is the first mandatory field and is used if no primary key is specified
+            primary_key_candidate = str(head_index)
 
-                    try:
-                        value, valid = val.process_and_validate(
-                            field["type"],
-                            value,
-                            entry_data=entry,
-                            condition=field.get("condition"),
-                        )
+    if primary_key is None:
+        if primary_key_candidate is not None:
+            primary_key = primary_key_candidate
+        else:
+            Log.error(f"[load_customer_sheet] Could not determine primary key for '{table_name}' in sheet '{sheet_name}'")
+
+    offset = 1
+    if "num_examples" in table and table["num_examples"] is not None:
+        offset = int(table["num_examples"]) + 1
+
+    return ResolvedTable(
+        sheet_name=sheet_name,
+        table_name=table_name,
+        orientation=table["orientation"],
+        head_row=head_row,
+        head_col=head_col,
+        primary_key=primary_key,
+        fields=fields,
+        head_indices=head_indices,
+        dropped_fields=dropped_fields,
+        offset=offset,
+        max_entries=max_entries,
+        is_capped=is_capped,
+        max_empty_entries=max_empty_entries,
+    )
+
+
+def table_entry_limits(table):
+    """
+    Returns (max_entries, is_capped, max_empty_entries) of a table layout.
 
-                    except Exception as e:
-                        Log.error(
-                            f"[Con.][load_customer_sheet] Error cleaning and validating value for type {field['type']} in sheet '{sheet_name}' : '{table_name}' : '{code_field_name + "/" + alias_field_name}' [{index}]\n error: {e}"
-                        )
-                        raise e
+    num_entries: "1" reads exactly one entry, "..250" reads up to 250 entries (hard cap, warns if exceeded),
+    "..." or no num_entries reads until the end of the table. The table ends at the last
+    used row/column of the sheet or after max_empty_entries consecutive entries without primary key.
+    """
+    max_entries = None
 
-                    if not valid:
-                        Log.error(
-                            f"""invalid value '<blue>{value}</r>' for val-type '<purple>{field["type"]}</purple>'.
+    num_entries = str(table.get("num_entries") or "...")
+    if num_entries.replace(".", "") != "":
+        max_entries = int(num_entries.replace(".", ""))
 
-Path: {{ '<blue>{sheet_name}</blue>' : '<blue>{table_name}</blue>' : '<blue>{code_field_name + "/" + alias_field_name}</blue>' [<blue>{field['head_index'] + str(i + int(head_row))}</blue>]
+    is_capped = max_entries is not None and num_entries.startswith("..")
 
-Head index {field['head_index']} ; i = {i} ; head_row = {head_row} }}
-                            """,
-                            title="Invalid Value",
-                        )
+    max_empty_entries = int(table.get("max_empty_entries") or DEFAULT_MAX_EMPTY_ENTRIES)
 
-                    entry[code_field_name] = value
+    return max_entries, is_capped, max_empty_entries
 
-                # edit  entry (row or column)
 
+def read_table_band(ws, orientation, head_row, head_col, positions, offset, max_entries=None):
+    """
+    Lazily reads the cells of the entries of a table with iter_rows (values only).
 
+    positions are column indices (vertical) or row numbers (horizontal) of the fields.
+    Returns a generator with one tuple of values per entry and the position of the first tuple element,
+    i.e. the value of position p for an entry is entry_values[p - min_pos].
 
-                entry["pk_index"] = pk_field
+    Entries are read up to the last used row (vertical) or column (horizontal) of the worksheet,
+    or up to max_entries. Stop consuming the generator to stop reading.
+    """
+    min_pos, max_pos = min(positions), max(positions)
+
+    if orientation == "vertical":
+        first_row = offset + int(head_row)
+        last_row = ws.max_row  # None for read-only worksheets (see load_customer_workbook): read to the end
+        if max_entries is not None:
+            last_row = first_row + max_entries - 1 if last_row is None else min(last_row, first_row + max_entries - 1)
+
+        entry_values_ls = ws.iter_rows(
+            min_row=first_row,
+            max_row=last_row,
+            min_col=min_pos,
+            max_col=max_pos,
+            values_only=True,
+        )
+    else:
+        first_col = offset + column_index_from_string(head_col)
+        if ws.max_column is None:
+            # read-only worksheet, its dimensions are determined from the cells
+            ws.calculate_dimension(force=True)
+        last_col = ws.max_column
+        if max_entries is not None:
+            last_col = min(last_col, first_col + max_entries - 1)
 
-                raw_data_table.append(entry)
+        entry_values_ls = read_columns_chunked(ws, min_pos, max_pos, first_col, last_col)
 
-            if num_actual_entries == 0:
-                Log.warning(f"[load_customer_sheet] Empty table '{table_name}' in sheet '{sheet_name}'")
+    return entry_values_ls, min_pos
 
-    return raw_data_dict
+
+def read_columns_chunked(ws, min_row, max_row, first_col, last_col):
+    """
+    Yields one tuple of values per column, reading HORIZONTAL_CHUNK_SIZE columns per iter_rows pass
+    """
+    for chunk_start in range(first_col, last_col + 1, HORIZONTAL_CHUNK_SIZE):
+        chunk_end = min(chunk_start + HORIZONTAL_CHUNK_SIZE - 1, last_col)
+
+        band_rows = ws.iter_rows(
+            min_row=min_row,
+            max_row=max_row,
+            min_col=chunk_start,
+            max_col=chunk_end,
+            values_only=True,
+        )
+        # transpose, so that every tuple holds the values of one entry (column)
+        yield from zip(*band_rows)
 
 
 def determine_version(input_file, version_layout_file):
-    wb = openpyxl.load_workbook(input_file)
+    """
+    Only the "Specification" sheet is read, or the "Angaben_zu_Warenmengen" sheet if no specification exists.
+    input_file can be a file path or a workbook handle from load_customer_workbook
+    """
+    wb = load_customer_workbook(input_file)
     spec_sheet_name = "Specification"
 
     if spec_sheet_name in wb.sheetnames:
@@ -342,6 +508,8 @@ def inheret_version(layout_dict, version):
     """
     Versionen können Arbeitsblattnamen überschreiben und gesamte sheets ändern
     legacy name muss dabei gleich bleiben
+
+    layout_dict is not changed, the returned layout is a new dict (sheets not overwritten are shared with base)
     """
 
     base_dict = layout_dict["base"]
@@ -351,19 +519,22 @@ def inheret_version(layout_dict, version):
         Log.warning(f"[inheret_version] No 'sheets' key found in specified version '{version}' layout")
         return base_dict
 
+    merged_dict = dict(base_dict)
+    merged_dict["sheets"] = list(base_dict["sheets"])
+
     for sheet in version_dict["sheets"]:
         version_code_name = sheet["code_sheet_name"]
 
-        for i, base_sheet in enumerate(base_dict["sheets"]):
+        for i, base_sheet in enumerate(merged_dict["sheets"]):
             if "code_sheet_name" not in base_sheet:
                 Log.error(f"[inheret_version] Sheet '{base_sheet['sheet_name']}' in base layout does not have a code_sheet_name")
 
-            # if the sheet is present in the version layout dictionary, overwrite the whole base sheet object
+            # if the sheet is present in the version layout dictionary, replace the whole base sheet object
             if base_sheet["code_sheet_name"] == version_code_name:
-                base_dict["sheets"][i] = sheet  # Hier wird das Original-Objekt in base_dict geändert
+                merged_dict["sheets"][i] = sheet
                 Log.debug(
-                    f"sheet {version_code_name} was changed within base layout: {base_sheet}\n\n\n {base_dict}",
+                    lambda: f"sheet {version_code_name} was changed within base layout: {base_sheet}\n\n\n {merged_dict}",
                     key="inherit_version",
                 )
 
-    return base_dict
+    return merged_dict
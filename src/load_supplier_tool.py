@@ -1,11 +1,45 @@
+# load_supplier_tool.py
+"""
+
+- emission data of an installation from its supplier tool (Supplier_*.xlsx in the installation folder of the supplier data)
+- reading the workbook is the expensive part: read_supplier_tool keeps only the values of the "Output" sheet (ValueSheet),
+  read_supplier_tools reads many supplier tools at once, larger batches in a process pool
+- parse_supplier_tool structures the values of the sheet into the emission data per CN code,
+  in the calling process (its warnings and errors are logged in order)
+- the structured data and the warnings of parsing are cached on disk by content (sha-256, see supplier_tool_digest),
+  the path index (path, size, modification time) avoids hashing unchanged files again;
+  cached supplier tools are neither read nor parsed, their warnings are replayed
+- python -m src.load_supplier_tool [-c config_file] [-w workers] parses all supplier tools of the supplier_data_dir
+  into the cache (warm-up, e.g. over night)
+
+"""
+
 import os
 import glob
+import hashlib
 import openpyxl
 import pprint
 
+from . import helper
 from .log import Log
 from .helper import exact_search, non_exact_search
-from .xlsx_access import load_table_to_dict
+from .diagnostics import DiagnosticsReport, CollectedError, collecting, error_message
+from .xlsx_access import ValueSheet, load_table_to_dict
+
+
+SUPPLIER_TOOL_SHEET = "Output"
+
+# smaller batches are read in process (see helper.process_map)
+MIN_PARALLEL_SUPPLIER_TOOLS = 4
+
+SUPPLIER_TOOL_CACHE = "supplier_tools"
+SUPPLIER_TOOL_INDEX_CACHE = "supplier_tool_paths"
+
+# bump if the result of parse_supplier_tool changes, invalidates the cache
+SUPPLIER_TOOL_CACHE_FORMAT = 1
+
+# absolute path -> (size, mtime, sha-256 of the content), per process
+_digests = {}
 
 
 def get_supplier_tool_path(installation_folder_path, installation_entry, prepared_data, config):
@@ -88,20 +122,127 @@ def get_installation_folder_path(installation_entry, prepared_data, config):
     return installation_folder_path
 
 
-def load_supplier_tool(installation_entry, prepared_data, config):
+def read_supplier_tool(supplier_tool_path):
+    """
+    Returns the values of the "Output" sheet of the supplier tool as ValueSheet, the workbook is read read-only and closed
+    """
+    wb = openpyxl.load_workbook(supplier_tool_path, read_only=True, data_only=True)  # type: ignore
+    try:
+        return ValueSheet.of(wb[SUPPLIER_TOOL_SHEET])
+    finally:
+        wb.close()
+
+
+def read_supplier_tool_result(supplier_tool_path):
+    # (ValueSheet or None, error message or None)
+    try:
+        return read_supplier_tool(supplier_tool_path), None
+    except Exception as e:
+        return None, error_message(e)
+
+
+def read_supplier_tools(supplier_tool_paths, max_workers=None):
+    """
+    Reads the supplier tools, in parallel processes for larger batches.
+    Returns supplier tool path -> (ValueSheet or None, error message or None) in order of the paths, each path is read once.
+    """
+    paths = list(dict.fromkeys(supplier_tool_paths))
+    return dict(zip(paths, helper.process_map(read_supplier_tool_result, paths, max_workers, min_parallel=MIN_PARALLEL_SUPPLIER_TOOLS)))
+
+
+def supplier_tool_digest(supplier_tool_path):
+    """
+    Returns the sha-256 of the supplier tool content, the file is hashed again only if its size or modification time changed
+    """
+    path = os.path.abspath(supplier_tool_path)
+    stat = os.stat(path)
+    stat_key = (stat.st_size, stat.st_mtime_ns)
+
+    indexed = _digests.get(path)
+    if indexed is None:
+        indexed = helper.load_pickle_cache(SUPPLIER_TOOL_INDEX_CACHE, path_key(path))
+    if indexed is not None and indexed[:2] == stat_key:
+        _digests[path] = indexed
+        return indexed[2]
+
+    indexed = _digests[path] = (*stat_key, helper.file_sha256(path))
+    helper.save_pickle_cache(SUPPLIER_TOOL_INDEX_CACHE, path_key(path), indexed)
+
+    return indexed[2]
+
+
+def path_key(path):
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()
+
+
+def supplier_tool_cache_key(supplier_tool_path):
+    return f"{supplier_tool_digest(supplier_tool_path)}_{SUPPLIER_TOOL_CACHE_FORMAT}"
+
+
+def is_supplier_tool_cached(supplier_tool_path):
+    return helper.cache_file_path(SUPPLIER_TOOL_CACHE, supplier_tool_cache_key(supplier_tool_path)).is_file()
+
+
+def load_cached_supplier_tool(supplier_tool_path):
+    """
+    Returns (supplier tool data, recorded warnings) of the supplier tool from the cache, None if not cached
+    """
+    cached = helper.load_pickle_cache(SUPPLIER_TOOL_CACHE, supplier_tool_cache_key(supplier_tool_path))
+    if cached is not None:
+        Log.debug(lambda: f"Loaded supplier tool '{supplier_tool_path}' from cache", key="supplier_tool")
+    return cached
+
+
+def save_cached_supplier_tool(supplier_tool_path, supplier_tool_data, recorded_warnings):
+    helper.save_pickle_cache(SUPPLIER_TOOL_CACHE, supplier_tool_cache_key(supplier_tool_path), (supplier_tool_data, recorded_warnings))
+
+
+def load_supplier_tool(installation_entry, prepared_data, config, supplier_tool_path=None, output_sheet=None):
+    """
+    Sets installation_entry["emission_data"] from the supplier tool of the installation, taken from the cache if possible
+    (option "supplier_tool_cache").
+    supplier_tool_path: looked up in the supplier data if not given
+    output_sheet: values of the "Output" sheet if already read (see read_supplier_tools), otherwise the supplier tool is read if not cached
+    """
+    if supplier_tool_path is None:
+        installation_folder_path = get_installation_folder_path(installation_entry, prepared_data, config)
+        supplier_tool_path = get_supplier_tool_path(installation_folder_path, installation_entry, prepared_data, config)
+
+        # * if present, get supporting docs
+
+        """     supporting_documents_folder_path = os.path.join(installation_folder_path, "supporting_documents")
+            if os.path.exists(supporting_documents_folder_path):
+                installation_entry["supporting_documents"] = os.listdir(supporting_documents_folder_path)
+                Log.info(
+                    f"Found supporting documents for installation '<yellow>{installation_entry['installation']} despite supplier tool in place!</r>'",
+                ) """
+
+    use_cache = config.get("options", {}).get("supplier_tool_cache", True)
 
-    installation_folder_path = get_installation_folder_path(installation_entry, prepared_data, config)
-    supplier_tool_path = get_supplier_tool_path(installation_folder_path, installation_entry, prepared_data, config)
+    cached = load_cached_supplier_tool(supplier_tool_path) if use_cache else None
 
+    if cached is not None:
+        supplier_tool_data, recorded_warnings = cached
+        Log.replay_warnings(recorded_warnings)
+    else:
+        if output_sheet is None:
+            output_sheet = read_supplier_tool(supplier_tool_path)
+
+        recorded_warnings = []
+        with Log.recording_warnings(recorded_warnings):
+            supplier_tool_data = parse_supplier_tool(output_sheet, installation_entry)
+
+        if use_cache:
+            save_cached_supplier_tool(supplier_tool_path, supplier_tool_data, recorded_warnings)
 
-    # * if present, get supporting docs
+    # adding at the end, because otherwise I get weird errors
+    installation_entry["emission_data"] = supplier_tool_data
 
-    """     supporting_documents_folder_path = os.path.join(installation_folder_path, "supporting_documents")
-        if os.path.exists(supporting_documents_folder_path):
-            installation_entry["supporting_documents"] = os.listdir(supporting_documents_folder_path)
-            Log.info(
-                f"Found supporting documents for installation '<yellow>{installation_entry['installation']} despite supplier tool in place!</r>'",
-            ) """
+
+def parse_supplier_tool(ws, installation_entry):
+    """
+    Returns the emission data of the supplier tool: "general_info" and one entry per CN code
+    """
 
     _ = """
         Data fields:
@@ -110,9 +251,6 @@ def load_supplier_tool(installation_entry, prepared_data, config):
         
     """
 
-    wb = openpyxl.load_workbook(supplier_tool_path, data_only=True) # type: ignore
-    ws = wb["Output"]
-
     general_info_rows = [
         "Reporting Period Start",
         "Reporting Period End",
@@ -280,7 +418,11 @@ def load_supplier_tool(installation_entry, prepared_data, config):
                     title="supplier_tool | additional info",
                 )
                 cn_code_entry["direct_emissions"]["additional_info"] = "-"
-        
+
+        except CollectedError:
+            # collect mode (see installation_data.real_data_approach), recorded by the caller
+            raise
+
         except Exception as e:
             print("raw_data_ls:")
             pprint.pprint(raw_data_ls)
@@ -292,6 +434,82 @@ def load_supplier_tool(installation_entry, prepared_data, config):
 
         supplier_tool_data[cn_code] = cn_code_entry
 
-    # adding at the end, because otherwise I get weird errors
+    return supplier_tool_data
 
-    installation_entry["emission_data"] = supplier_tool_data
+
+def find_supplier_tools(config):
+    """
+    Returns the paths of all supplier tools (supplier_tool_pattern) below the supplier_data_dir, sorted
+    """
+    supplier_data_dir = config["supplier_workflow"]["supplier_data_dir"]
+    pattern = config["supplier_workflow"]["supplier_tool_pattern"]
+    return sorted(glob.glob(os.path.join(supplier_data_dir, "**", pattern), recursive=True))
+
+
+def warm_supplier_tool(supplier_tool_path):
+    """
+    Parses the supplier tool into the cache if it is not cached yet, nothing is logged.
+    Returns (status, error message or None), status "cached", "parsed" or "failed"
+    """
+    muted = Log.muted
+    Log.mute()
+    try:
+        with collecting(DiagnosticsReport(supplier_tool_path)):
+            if is_supplier_tool_cached(supplier_tool_path):
+                return "cached", None
+
+            # the installation name is used in error messages only
+            installation_entry = {"installation": os.path.basename(os.path.dirname(supplier_tool_path))}
+
+            recorded_warnings = []
+            with Log.recording_warnings(recorded_warnings):
+                supplier_tool_data = parse_supplier_tool(read_supplier_tool(supplier_tool_path), installation_entry)
+
+            save_cached_supplier_tool(supplier_tool_path, supplier_tool_data, recorded_warnings)
+            return "parsed", None
+
+    except Exception as e:
+        return "failed", error_message(e)
+
+    finally:
+        Log.muted = muted
+
+
+def warm_supplier_tool_cache(config, max_workers=None):
+    """
+    Parses all supplier tools of the supplier data into the cache, in parallel processes.
+    Returns supplier tool path -> (status, error message or None), see warm_supplier_tool
+    """
+    supplier_tool_paths = find_supplier_tools(config)
+    return dict(zip(supplier_tool_paths, helper.process_map(warm_supplier_tool, supplier_tool_paths, max_workers, min_parallel=MIN_PARALLEL_SUPPLIER_TOOLS)))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parses all supplier tools of the supplier data into the supplier tool cache")
+    parser.add_argument("-c", "--config", type=str, default="config/config.yml", help="Config file")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of processes, default: number of cpus")
+    args = parser.parse_args()
+
+    config = helper.load_config(config_file=args.config)
+    Log.configure(config)
+
+    Log.procedure(f"Warming up supplier tool cache of '{config['supplier_workflow']['supplier_data_dir']}' ...")
+    results = warm_supplier_tool_cache(config, args.workers)
+
+    for supplier_tool_path, (status, error) in results.items():
+        if status == "failed":
+            Log.warning(f"Could not parse supplier tool '<yellow>{supplier_tool_path}</r>':\n{error}", title="supplier_tool | cache warm-up")
+
+    statuses = [status for status, _ in results.values()]
+    Log.info(
+        f"Supplier tool cache: {statuses.count('parsed')} parsed, {statuses.count('cached')} already cached, "
+        f"{statuses.count('failed')} failed ({len(results)} supplier tools)"
+    )
+    Log.end()
+    Log.flush()
+
+
+if __name__ == "__main__":
+    main()
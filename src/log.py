@@ -1,9 +1,12 @@
 import re
 import os
-import inspect
+import atexit
+import sys
 import datetime
 import pprint
+from contextlib import contextmanager
 from .shared import shared_data
+from .log_sink import LogRecord, LogPipeline, TerminalSink, create_sinks
 
 
 class Log:
@@ -33,8 +36,53 @@ class Log:
 
     delay_exit_set = False
 
+    # all output goes through the pipeline, see configure
+    pipeline = LogPipeline([TerminalSink()])
+
+    @staticmethod
+    def configure(config=None, sink=None, json_file=None, asynchronous=None, warning_limit=None):
+        """
+        Replaces the log pipeline. Settings are taken from the 'logging' section of the config,
+        arguments that are given (not None) take precedence (e.g. the settings of the api server):
+
+        logging:
+          sink: terminal          # terminal, plain (no colors/ frames), auto (plain if stdout is no TTY) or none
+          json_file: null         # additionally write json lines to this file
+          asynchronous: False     # render and write in a background thread
+          warning_limit: null     # print at most n warnings per source and title, the rest is summarized
+        """
+        settings = {"sink": "terminal", "json_file": None, "asynchronous": False, "warning_limit": None}
+        settings.update((config or {}).get("logging") or {})
+
+        arguments = {"sink": sink, "json_file": json_file, "asynchronous": asynchronous, "warning_limit": warning_limit}
+        settings.update((key, value) for key, value in arguments.items() if value is not None)
+
+        Log.close()
+        Log.pipeline = LogPipeline(
+            create_sinks(settings["sink"], settings["json_file"]),
+            asynchronous=settings["asynchronous"],
+            warning_limit=settings["warning_limit"],
+        )
+
+    @staticmethod
+    def flush():
+        # waits until all emitted records are written
+        Log.pipeline.flush()
+
+    @staticmethod
+    def close():
+        suppressed = Log.pipeline.aggregator.pop_suppressed()
+        if suppressed:
+            Log.fs(
+                "\n".join(f"{count:>4} x  '{title}'  ↤  f: {source}" for (source, title), count in suppressed.items()),
+                "warning",
+                title="Suppressed warnings",
+            )
+        Log.pipeline.close()
+
     @staticmethod
     def clear():
+        Log.flush()
         os.system("cls" if os.name == "nt" else "clear")
         Log.printed_title = False
 
@@ -46,21 +94,25 @@ class Log:
     @staticmethod
     def wait_for_input(out_str="<gray>Press Enter to continue...</r>", end="\n"):
         Log.fs(f"\n {out_str}", "wait", end=end)
-        # asd
+        Log.flush()
         input()
 
     @staticmethod
     def title():
+        Log.pipeline.emit(LogRecord("title", "CBAM XML Converter 2.0 - Dev", end=""))
+
+    @staticmethod
+    def title_str():
         terminal_width = Log.terminal_width()
 
-        print(f"\n {'┏' + Log.hline_c * (terminal_width - 4)}" + "┓", end="")
+        title_str = f"\n {'┏' + Log.hline_c * (terminal_width - 4)}" + "┓"
         out_str = """         ┃                                              ┃
         ┃         <green><b>CBAM XML Converter 2.0 - Dev</r>         ┃
         ┃      <green>▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔▔</r>      ┃
         ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
 """
 
-        Log.fs(out_str, end="")
+        return title_str + Log.parse_colored_string(Log.add_prefix(out_str, end=""))
 
     @staticmethod
     def end():
@@ -75,35 +127,74 @@ class Log:
         if not Log.muted:
             Log.fs(out_str, "info")
 
-    warning_id_count = {}
     sev_warning_count = 0
 
+    # list the warnings are recorded in, see recording_warnings
+    warning_recorder = None
+
     @staticmethod
-    def warning(out_str, title="", source=None, print_max=None, print_id=None, severe=True):
-        if print_max is not None and print_id is not None:
-            if print_id not in Log.warning_id_count:
-                Log.warning_id_count[print_id] = 0
-            Log.warning_id_count[print_id] += 1
+    def warning(out_str, title="", source=None, print_max=None, print_id=None, severe=True, **fmt_kwargs):
+        """
+        out_str can be a str, a callable returning the message or a str.format template rendered with fmt_kwargs,
+        callables and templates are only rendered if the warning is printed (or recorded)
+        """
+        if Log.warning_recorder is not None:
+            if source is None:
+                source = Log.caller_name()
+            Log.warning_recorder.append(
+                (Log.render(out_str, fmt_kwargs), {"title": title, "source": source, "print_max": print_max, "print_id": print_id, "severe": severe})
+            )
 
-            if Log.warning_id_count[print_id] > print_max:
+        aggregator = Log.pipeline.aggregator
+
+        # print_max warnings per print_id, other warnings are limited per source and title (see configure)
+        if print_max is not None and print_id is not None:
+            if not aggregator.admit(print_id, print_max, summarize=False):
+                return
+        elif aggregator.default_limit is not None:
+            if source is None:
+                source = Log.caller_name()
+            if not aggregator.admit((source, title)):
                 return
 
         if severe and not Log.muted:
             Log.sev_warning_count += 1
 
-        if source is None:
-            source = f"{inspect.stack()[1].function}"
-
         if not Log.printed_title:
             Log.title()
             Log.printed_title = True
 
+        if Log.muted:
+            return
+
+        if source is None:
+            source = Log.caller_name()
+
         cb_tag = "<b>" if severe else ""
         cn_tag = f"<yellow>[{Log.sev_warning_count:02d}]</r>  -  " if severe else ""
-        out_str = f"{cn_tag}{cb_tag}Warning</r>  |  {cb_tag}<yellow>{title}</r>    ↤  <i>f: <yellow>{source}</r>\n{out_str}"
+        message = Log.render(out_str, fmt_kwargs)
+        out_str = f"{cn_tag}{cb_tag}Warning</r>  |  {cb_tag}<yellow>{title}</r>    ↤  <i>f: <yellow>{source}</r>\n{message}"
 
-        if not Log.muted:
-            Log.fs(out_str, "warning")
+        Log.fs(out_str, "warning", title=title, source=source, message=message, fields={"severe": severe})
+
+    @staticmethod
+    @contextmanager
+    def recording_warnings(recorded):
+        """
+        Warnings issued in the block (also muted ones) are appended to the list recorded as (message, keyword arguments),
+        replay_warnings issues them again, e.g. for results restored from a cache
+        """
+        previous = Log.warning_recorder
+        Log.warning_recorder = recorded
+        try:
+            yield recorded
+        finally:
+            Log.warning_recorder = previous
+
+    @staticmethod
+    def replay_warnings(recorded):
+        for message, kwargs in recorded:
+            Log.warning(message, **kwargs)
 
     @staticmethod
     def dialog(question, title="Dialog", options=["yes", "no"]):
@@ -118,26 +209,40 @@ class Log:
         # Eingabeaufforderung erstellen
         show_str += "choice: "
         Log.fs(show_str, "question", end="")
+        Log.flush()
 
         # Benutzereingabe erfassen
         user_input = input().strip().lower()
         return user_input
 
     @staticmethod
-    def error(out_str, title="Error", source=None, delay_exit=False, raiseErrorDebug=False):
+    def error(out_str, title="Error", source=None, delay_exit=False, raiseErrorDebug=False, **fmt_kwargs):
+        # out_str as in warning
+        from .diagnostics import active_report, CollectedError
+
         if source is None:
-            source = f"{inspect.stack()[1].function}"
+            source = Log.caller_name()
+
+        message = Log.render(out_str, fmt_kwargs)
 
-        out_str = f"<b><red>{title}</r>    ↤  <i>f: <red>{source}</r>\n\n{out_str}"
+        # collect mode (see diagnostics.collecting): the caller records the error and continues
+        if not delay_exit and active_report() is not None:
+            raise CollectedError(message, title=title, source=source)
+        out_str = f"<b><red>{title}</r>    ↤  <i>f: <red>{source}</r>\n\n{message}"
 
         Log.fs(
             out_str + f"\n\n \033[91m {'- exit delayed -' if delay_exit else 'PROGRAM EXIT'}\033[0m",
             "error",
             end="",
+            title=title,
+            source=source,
+            message=message,
+            fields={"delay_exit": delay_exit},
         )
 
         if not delay_exit:
             Log.end()
+            Log.flush()
             if raiseErrorDebug:
                 raise Exception("log error")
             else:
@@ -150,30 +255,63 @@ class Log:
         if Log.delay_exit_set:
             Log.error("delayed exit", delay_exit=False)
 
+    debug_enabled = {
+        "all": False,
+        "general": True,
+        "load_customer_sheet": False,
+        "validator": False,
+        "load_default": False,
+        "load_files": False,
+        "determine_version": False,
+        "inherit_version": False,
+        "workflow": False,
+        "supplier_data": False,
+        "xlsx_access": False,
+        "installation_data": False,
+        "cache": False,
+        "layout_plan": False,
+        "prepare_data": False,
+        "report_model": False,
+        "pdf_rendering": False,
+        "supplier_tool": False,
+    }
+
     @staticmethod
-    def debug(out_str, key="general", title="Debug Log"):
-        enabled = {
-            "all": False,
-            "general": True,
-            "load_customer_sheet": False,
-            "validator": False,
-            "load_default": False,
-            "load_files": False,
-            "determine_version": False,
-            "inherit_version": False,
-            "workflow": False,
-            "supplier_data": False,
-            "xlsx_access": False,
-            "installation_data": False,
-        }
+    def debug_active(key="general"):
+        # unknown keys raise a KeyError
+        return Log.debug_enabled["all"] or Log.debug_enabled[key]
+
+    @staticmethod
+    def debug(out_str, key="general", title="Debug Log", **fmt_kwargs):
+        """
+        out_str can be a str, a callable returning the message or a str.format template rendered with fmt_kwargs,
+        e.g. Log.debug(lambda: pprint.pformat(data), key="validator") or Log.debug("row {row}", key="validator", row=row).
+        Callables and templates are only rendered if the key is enabled.
+        """
+        if not Log.debug_active(key):
+            return
+
+        message = Log.render(out_str, fmt_kwargs)
+        out_str = f"<b><purple>{title}</r>   -   [<i><purple>{key}</r>]\n{message}"
 
-        out_str = f"<b><purple>{title}</r>   -   [<i><purple>{key}</r>]\n{out_str}"
+        Log.fs(out_str, "debug", key=key, title=title, message=message)
 
-        if enabled["all"] or enabled[key]:
-            Log.fs(out_str, "debug")
+    @staticmethod
+    def render(out_str, fmt_kwargs=None):
+        if callable(out_str):
+            out_str = out_str()
+        if fmt_kwargs:
+            out_str = out_str.format(**fmt_kwargs)
+        return out_str
+
+    @staticmethod
+    def caller_name(depth=2):
+        # function name of the caller of the Log method (depth 2), without the source file access of inspect.stack()
+        return sys._getframe(depth).f_code.co_name
 
     @staticmethod
     def loading_indicater(stop=False):
+        Log.flush()
         if stop:
             print("\r", end="")
         else:
@@ -188,9 +326,9 @@ class Log:
             Log.fs(out_str, "procedure")
 
     @staticmethod
-    def fs(s, m_type=None, end="\n"):
-        interm = Log.add_prefix(s, m_type=m_type, end=end)
-        print(Log.parse_colored_string(interm), end="")
+    def fs(s, m_type=None, end="\n", **record_kwargs):
+        # record_kwargs: key, title, source, message (without header) and fields of the LogRecord
+        Log.pipeline.emit(LogRecord(m_type, s, end=end, **record_kwargs))
 
     @staticmethod
     def col_from_hex(hex_color):
@@ -501,6 +639,7 @@ class LoadingIndicator:
 
     def start(self):
         """Starts the loading indicator in a separate thread."""
+        Log.flush()
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._animate, daemon=True)
         self._thread.start()
@@ -519,3 +658,7 @@ class LoadingIndicator:
                 break
             print(f"  \r{symbol}", end="")
             time.sleep(0.4)  # Adjust the speed of the indicator
+
+
+# writes queued records and the summary of suppressed warnings
+atexit.register(Log.close)
@@ -0,0 +1,259 @@
+# log_sink.py
+"""
+
+- structured log records (level, key, title, source, message, fields) created by Log
+- a LogPipeline hands the records to sinks, either directly or through a queue written by a background thread
+- sinks: TerminalSink (the rich terminal output of Log), PlainSink (no colors/ frames, for non-TTY output),
+  JsonLinesSink (one json object per record)
+- repeated warnings are aggregated (limit per warning id, the suppressed ones are summarized on flush)
+
+"""
+
+import datetime
+import json
+import queue
+import re
+import sys
+import threading
+
+
+# color/ style tags of Log.parse_colored_string: named colors (Log.color_dict), styles, reset (</r>), frame color (<c>)
+# and hex colors; other <...> text such as caller names (<module>, <lambda>) is kept
+TAG_NAMES = ("red", "green", "blue", "orange", "yellow", "purple", "cyan", "gray", "pink", "b", "i", "u", "mark", "r", "c")
+TAG_PATTERN = re.compile(r"</?(?:#[0-9a-fA-F]+|" + "|".join(TAG_NAMES) + ")>")
+
+
+def strip_tags(s):
+    return TAG_PATTERN.sub("", s)
+
+
+class LogRecord:
+    """
+    text is the markup rendered by the terminal (incl. the header of warnings/ errors),
+    message the plain message without header
+    """
+
+    __slots__ = ("level", "text", "end", "key", "title", "source", "message", "fields", "time")
+
+    def __init__(self, level, text, end="\n", key=None, title=None, source=None, message=None, fields=None):
+        self.level = level
+        self.text = text
+        self.end = end
+        self.key = key
+        self.title = title
+        self.source = source
+        self.message = text if message is None else message
+        self.fields = fields or {}
+        self.time = datetime.datetime.now()
+
+    def as_dict(self):
+        return {
+            "time": self.time.isoformat(timespec="milliseconds"),
+            "level": self.level,
+            "key": self.key,
+            "title": strip_tags(self.title) if self.title else self.title,
+            "source": self.source,
+            "message": strip_tags(self.message),
+            "fields": self.fields,
+        }
+
+    def __repr__(self):
+        return f"LogRecord({self.level!r}, {self.title!r}, source={self.source!r})"
+
+
+class TerminalSink:
+    # output of Log before the pipeline: frames, prefixes and ANSI colors
+
+    def write(self, record):
+        from .log import Log
+
+        if record.level == "title":
+            print(Log.title_str(), end="")
+        else:
+            print(Log.parse_colored_string(Log.add_prefix(record.text, m_type=record.level, end=record.end)), end="")
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
+
+
+class PlainSink:
+    # one line header per record, no colors or frames
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, record):
+        if record.level in ("title", "divider"):
+            return
+
+        stream = self.stream or sys.stdout
+
+        header = f"{record.time:%H:%M:%S} {(record.level or 'log').upper():<9}"
+        if record.title:
+            header += f" {strip_tags(record.title)}"
+        if record.source:
+            header += f" ({record.source})"
+
+        message = strip_tags(record.message).strip("\n")
+        if record.title or record.source:
+            stream.write(f"{header}\n{message}\n" if message else f"{header}\n")
+        else:
+            stream.write(f"{header}{message}\n")
+
+    def flush(self):
+        (self.stream or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        if record.level in ("title", "divider"):
+            return
+        self.file.write(json.dumps(record.as_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class WarningAggregator:
+    """
+    Counts warnings per id. A warning is suppressed if its id was seen more than limit times,
+    limit is the print_max of the warning or the default_limit (None: no limit).
+    """
+
+    def __init__(self, default_limit=None):
+        self.default_limit = default_limit
+        self.counts = {}
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def admit(self, warning_id, limit=None, summarize=True):
+        if limit is None:
+            limit = self.default_limit
+        if limit is None:
+            return True
+
+        with self.lock:
+            count = self.counts[warning_id] = self.counts.get(warning_id, 0) + 1
+            if count <= limit:
+                return True
+            if summarize:
+                self.suppressed[warning_id] = self.suppressed.get(warning_id, 0) + 1
+            return False
+
+    def pop_suppressed(self):
+        with self.lock:
+            suppressed, self.suppressed = self.suppressed, {}
+        return suppressed
+
+
+# marks the end of the queue
+_STOP = object()
+
+
+class LogPipeline:
+    """
+    Hands records to the sinks in emit order. asynchronous: records are put on a queue and written by a
+    daemon thread, the caller does not wait for rendering/ output (flush waits for all queued records).
+    """
+
+    def __init__(self, sinks, asynchronous=False, warning_limit=None):
+        self.sinks = list(sinks)
+        self.asynchronous = asynchronous
+        self.aggregator = WarningAggregator(warning_limit)
+
+        self.lock = threading.Lock()
+        self.queue = None
+        self.thread = None
+        self.closed = False
+
+        if asynchronous:
+            self.queue = queue.SimpleQueue()
+            self.thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+            self.thread.start()
+
+    def emit(self, record):
+        # after close, records are written directly
+        if self.queue is not None and not self.closed:
+            self.queue.put(record)
+        else:
+            with self.lock:
+                self._write(record)
+
+    def flush(self):
+        if self.queue is not None and not self.closed:
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait()
+        else:
+            with self.lock:
+                self._flush_sinks()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.queue is not None and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self._flush_sinks()
+                return
+            elif isinstance(item, threading.Event):
+                self._flush_sinks()
+                item.set()
+            else:
+                self._write(item)
+
+    def _write(self, record):
+        for sink in self.sinks:
+            try:
+                sink.write(record)
+            except Exception as e:  # a failing sink must not stop the program or the other sinks
+                print(f"log sink {type(sink).__name__} failed: {e}", file=sys.stderr)
+
+    def _flush_sinks(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+def create_sinks(sink="terminal", json_file=None):
+    """
+    sink: 'terminal', 'plain' or 'auto' (terminal if stdout is a TTY, else plain)
+    """
+    if sink == "auto":
+        sink = "terminal" if sys.stdout.isatty() else "plain"
+
+    if sink == "terminal":
+        sinks = [TerminalSink()]
+    elif sink == "plain":
+        sinks = [PlainSink()]
+    elif sink in (None, "none"):
+        sinks = []
+    else:
+        raise ValueError(f"unknown log sink '{sink}' (terminal, plain, auto or none)")
+
+    if json_file:
+        sinks.append(JsonLinesSink(json_file))
+
+    return sinks
+
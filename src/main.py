@@ -16,6 +16,7 @@ Log.title()
 
 config_file = "config.yml"
 config = helper.load_config(config_file=config_file)
+Log.configure(config)
 Log.info(f"Loaded settings from {config_file}")
 
 input_file = workflow.input_files(config)
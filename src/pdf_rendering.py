@@ -0,0 +1,203 @@
+# pdf_rendering.py
+"""
+
+- rendering of the supporting documents filled from the pdf template (see prepare_data.create_doc_pdf)
+- a template is parsed once per file version (PdfTemplate): pages, page sizes and the rectangles of the form fields;
+  the text overlays are drawn from this geometry and merged onto copies of the template pages
+- documents are queued while the goods emissions are created (their file paths are known up front) and
+  rendered at once by render_queued_documents, larger batches in a process pool;
+  the file paths are returned in queue order
+
+"""
+
+import io
+import os
+import textwrap
+from pdfrw import PdfReader, PdfWriter, PdfDict, PageMerge
+from reportlab.pdfgen import canvas
+from . import helper
+from .log import Log
+from .diagnostics import error_message
+
+
+# text properties of the filled fields (alignment top-left)
+FONT_NAME = "Helvetica"
+FONT_SIZE = 7
+LINE_HEIGHT = FONT_SIZE * 1.2
+WRAP_AT_CHARS = 38
+TRUNCATE_AFTER_CHARS = 38 * 4
+
+# smaller batches are rendered in process (see helper.process_map)
+MIN_PARALLEL_DOCUMENTS = 8
+
+# (template path, mtime, size) -> PdfTemplate, per process
+_templates = {}
+
+# output path -> (template path, form data), in order of queueing
+_queued_documents = {}
+
+
+class PdfTemplate:
+    """
+    Parsed pdf template, pages holds per template page None (no form fields) or
+    (width, height, [(field name, (x1, y1, x2, y2)), ...])
+    """
+
+    __slots__ = ("path", "reader", "pages")
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = PdfReader(path)
+        self.pages = [page_geometry(page) for page in self.reader.pages]
+
+    def fill(self, output_path, data_dict):
+        # pages with form fields are copied, the parsed template stays unchanged
+        pages = []
+        for page, geometry in zip(self.reader.pages, self.pages):
+            if geometry is not None:
+                page = copy_page(page)
+
+                overlay = PdfReader(fdata=render_overlay(geometry, data_dict))
+                PageMerge(page).add(PageMerge(overlay.pages[0]).render()).render()
+
+                # remove form fields
+                page.Annots = []
+            pages.append(page)
+
+        writer = PdfWriter()
+        writer.addpages(pages)
+        writer.write(output_path)
+
+        return output_path
+
+    def __repr__(self):
+        return f"PdfTemplate({self.path!r}, pages={len(self.pages)}, fields={sum(len(geometry[2]) for geometry in self.pages if geometry is not None)})"
+
+
+def get_template(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = PdfTemplate(path)
+
+    return template
+
+
+def clear_templates():
+    _templates.clear()
+
+
+def page_geometry(page):
+    annotations = page.Annots
+    if not annotations:
+        return None
+
+    widgets = []
+    for annotation in annotations:
+        if annotation.Subtype == "/Widget" and annotation.T:
+            # remove parentheses
+            field_name = annotation.T[1:-1]
+            widgets.append((field_name, tuple(float(x) for x in annotation.Rect)))
+
+    return float(page.MediaBox[2]), float(page.MediaBox[3]), widgets
+
+
+def render_overlay(geometry, data_dict):
+    """
+    Returns the pdf bytes of a page with the values of data_dict drawn into the field rectangles
+    """
+    width, height, widgets = geometry
+
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=(width, height))
+
+    for field_name, (x1, y1, x2, y2) in widgets:
+        if field_name not in data_dict:
+            continue
+
+        value = data_dict[field_name]
+        if len(value) > TRUNCATE_AFTER_CHARS:
+            value = value[:TRUNCATE_AFTER_CHARS]
+
+        text_y = y2 - FONT_SIZE
+        can.setFont(FONT_NAME, FONT_SIZE)
+        for line in textwrap.wrap(value, width=WRAP_AT_CHARS):
+            can.drawString(x1, text_y, line)
+            text_y -= LINE_HEIGHT
+            # stop at the bottom of the field
+            if text_y < y1:
+                break
+
+    can.save()
+    return packet.getvalue()
+
+
+def copy_page(page):
+    # PageMerge.render replaces the contents and adds to the xobjects of the page resources
+    page_copy = PdfDict(page)
+    page_copy.indirect = True
+
+    resources = page.inheritable.Resources
+    if resources is not None:
+        resources = PdfDict(resources)
+        if resources.XObject is not None:
+            resources.XObject = PdfDict(resources.XObject)
+        page_copy.Resources = resources
+
+    return page_copy
+
+
+def fill_template(template_path, output_path, data_dict):
+    return get_template(template_path).fill(output_path, data_dict)
+
+
+def fill_template_job(job):
+    """
+    Renders a (template path, output path, form data) job, returns (output path, error message or None)
+    """
+    template_path, output_path, data_dict = job
+    try:
+        fill_template(template_path, output_path, data_dict)
+        return output_path, None
+    except Exception as e:
+        return output_path, error_message(e)
+
+
+def render_documents(jobs, max_workers=None):
+    """
+    Renders the jobs (template path, output path, form data), in parallel processes for larger batches.
+    Returns the output paths in order of the jobs.
+    """
+    results = helper.process_map(fill_template_job, jobs, max_workers, min_parallel=MIN_PARALLEL_DOCUMENTS, chunks_per_worker=4)
+
+    for output_path, error in results:
+        if error is not None:
+            Log.error(f"Could not create supporting document '{output_path}' from template: {error}", title="Supporting Document")
+
+    return [output_path for output_path, _ in results]
+
+
+def queue_document(template_path, output_path, data_dict):
+    """
+    Queues a document for render_queued_documents and returns its output path.
+    A document queued again under the same path replaces the earlier one (like overwriting the file).
+    """
+    _queued_documents[output_path] = (template_path, data_dict)
+    return output_path
+
+
+def render_queued_documents(max_workers=None):
+    jobs = [(template_path, output_path, data_dict) for output_path, (template_path, data_dict) in _queued_documents.items()]
+    _queued_documents.clear()
+
+    if not jobs:
+        return []
+
+    Log.debug(f"Rendering {len(jobs)} supporting documents", key="pdf_rendering")
+    return render_documents(jobs, max_workers)
+
+
+def clear_queued_documents():
+    _queued_documents.clear()
@@ -1,20 +1,20 @@
 import pprint
 import datetime
+import math
 import os
 
-from .helper import is_null_value, r_float
+from .helper import is_null_value
 from .log import Log
 from .default_data import DefaultData
 from .validator import Validator
 from .supplier_data import get_supplier_data
 from .installation_data import get_installation_data
 from .shared import shared_data
-
-import io
-from pdfrw import PdfReader, PdfWriter, PdfDict, PageMerge
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-import textwrap
+from .records import ImportedGoodKey, ImportedGood, GoodsLine, GoodsEmission
+from .aggregation import GoodsFrame
+from .fixed_point import to_fixed, SEE_DIGITS, ELECTRICITY_DIGITS
+from .report_model import load_report_model, save_report_model, report_context, installation_fingerprints
+from .pdf_rendering import queue_document, render_queued_documents, clear_queued_documents
 
 
 def prepare_data(customer_dict_ls, config):
@@ -38,13 +38,21 @@ def prepare_data(customer_dict_ls, config):
 
     create_imported_goods(customer_dict_ls, prepared_data_dict)
 
+    # columnar view of the goods lines, shared by the aggregations below
+    goods_frame = GoodsFrame(prepared_data_dict["imported_goods"])
+
     ## > imported goods/procedures
 
-    create_procedures(customer_dict, prepared_data_dict)
+    create_procedures(customer_dict, prepared_data_dict, goods_frame)
 
     ## > imported goods/GoodsEmissions
 
-    create_goods_emissions(customer_dict, prepared_data_dict, installation_data, config)
+    # goods emissions of unchanged installations/ operators are reused from the last run of the report
+    report_model = None
+    if config.get("options", {}).get("incremental_recomputation", True):
+        report_model = load_report_model(prepared_data_dict)
+
+    create_goods_emissions(customer_dict, prepared_data_dict, installation_data, config, goods_frame, report_model)
 
     return prepared_data_dict
 
@@ -68,169 +76,224 @@ def create_general_info_dict(customer_dict, prepared_data_dict):
     prepared_data_dict["general_info"] = general_info_dict
 
 
-def create_goods_emissions(customer_dict, prepared_data_dict, installation_data, config):
-    imported_goods = prepared_data_dict["imported_goods"]
-
-    report_year = prepared_data_dict["general_info"]["year"]
-    report_quarter = prepared_data_dict["general_info"]["quarter"]
-
-    # iterate over goods
-    for ig_key, imported_good in imported_goods.items():
-        cn_code = ig_key.split(";")[0]
-        country = ig_key.split(";")[1]
-
-        raw_entries = imported_good["raw_entries"]
-
-        goods_emission = {}
-
-        # iterate over all entries
-        for entry in raw_entries:
-            installation = entry["det_installation"]
-            operator = entry["det_operator"]
-
-            if installation is not None:
-                io_key = installation["installation_name"]
-            else:
-                io_key = operator["operator_name"]
-
-            if " - " not in entry["production_method"]:
-                production_method = entry["production_method"]
-                production_method_name = "-"
-            else:
-                production_method, production_method_name = entry["production_method"].split(" - ")
-
-            # check if the entry is already in goods_emission
-            if io_key not in goods_emission:
-                # iterates over all installations/ operator entries
-
-                installation_name = io_key
-
-                fix_determination_type = installation_data.get("fix_type_of_determination", None)  # todo : rename and restructure
+def create_goods_emissions(customer_dict, prepared_data_dict, installation_data, config, goods_frame=None, report_model=None):
+    """
+    Sets goods_emissions of the imported goods.
 
-                cn_code_emission_data = None
+    With a report_model (see report_model.py) only the goods fed by installations/ operators whose installation_data
+    entry changed since the last run are recomputed, the others are rebuilt from the cached emission values.
+    """
+    imported_goods = prepared_data_dict["imported_goods"]
 
-                # General determination: fix_type_of_determination
-                if fix_determination_type == "02":  # default value report
-                    inst_determination_type = "02"
+    if goods_frame is None:
+        goods_frame = GoodsFrame(imported_goods)
 
-                    cn_code_emission_data = default_emission_data(cn_code)
+    emission_groups_ls = goods_frame.goods_emission_groups()
 
-                elif fix_determination_type == "03":  # full zero report, without documentation
-                    installation_data_entry = installation_data["default"]
-                    cn_code_emission_data = installation_data_entry["emission_data"]["default"]
+    # fingerprints before the entries are completed below (fix_type_of_determination 03)
+    affected_goods = None
+    if report_model is not None:
+        suppliers = {line.io_key: (line.operator, line.installation) for emission_groups in emission_groups_ls for line, _, _ in emission_groups}
 
-                    if "default_supporting_documents" in installation_data:
-                        installation_data_entry["supporting_documents"] = installation_data["default_supporting_documents"]
+        context = report_context(installation_data, prepared_data_dict, config)
+        fingerprints = installation_fingerprints(installation_data, suppliers)
+        affected_goods = report_model.affected_goods(context, fingerprints)
 
-                # Detail determination: per installation
-                else:
-                    # find the supplier/ default data set for the given installation
-                    ## todo: this must support non exact matches as well
-                    installation_data_entry = installation_data[installation_name]
-                    inst_determination_type = installation_data_entry["type_of_determination"]
+    # default value report: see values of all cn codes resolved at once
+    default_see = None
+    if installation_data.get("fix_type_of_determination", None) == "02":
+        default_see = default_see_values([ig_key.cn_code for ig_key in imported_goods])
 
-                    emission_data = installation_data_entry["emission_data"]
+    num_reused = 0
 
-                    # select cn code specific data if det_type is 01
-                    if inst_determination_type == "03":  # zero report
-                        cn_code_emission_data = emission_data["default"]
-                    elif inst_determination_type == "01":  # real data
-                        if cn_code not in emission_data:
-                            pprint.pprint(emission_data)
-                            print(f"CN code: {cn_code}, cn code data type: {type(cn_code)}, emission data snd key: {list(emission_data.keys())[1]}, emission data first key type: {type(list(emission_data.keys())[0])}, emission data first key: {list(emission_data.keys())[0]}, emission data snd key type: {type(list(emission_data.keys())[1])}")
-                            Log.error(
-                                f"CN code <yellow>{cn_code}</r> from customer data not found in supplier data (using det_type {inst_determination_type})\n. Installation: {installation_name}",
-                                title="Missing CN Code in Supplier Data",
-                            )
-                        cn_code_emission_data = emission_data[cn_code]
+    # supporting documents of an earlier, aborted run
+    clear_queued_documents()
 
-                ## direct
+    # iterate over goods
+    for (ig_key, imported_good), emission_groups in zip(imported_goods.items(), emission_groups_ls):
+        goods_emission = None
+
+        if affected_goods is not None and ig_key not in affected_goods:
+            goods_emission = reuse_goods_emissions(report_model, ig_key, emission_groups)
+
+        if goods_emission is None:
+            goods_emission = {}
+            for line, net_mass, production_methods in emission_groups:
+                goods_emission[line.io_key] = create_goods_emission(
+                    ig_key.cn_code, line, net_mass, production_methods, installation_data, prepared_data_dict, config, default_see
+                )
+        else:
+            num_reused += 1
 
-                direct_emissions_data = cn_code_emission_data["direct_emissions"]
-                indirect_emissions_data = cn_code_emission_data["indirect_emissions"]
-                applicable_reporting_type_methodology = direct_emissions_data["reporting_methodology"]
-                see_direct = direct_emissions_data["see"]
-                see_indirect = indirect_emissions_data["see"]
+        num_goods_emission = len(goods_emission)
+        shared_summary = shared_data["current"].setdefault("summary", {})
+        shared_summary_num_goods_emission = shared_summary.setdefault("num_goods_emission", 0)
+        shared_summary["num_goods_emission"] = shared_summary_num_goods_emission + num_goods_emission
 
-                net_mass = entry["net_mass"]
+        imported_good.goods_emissions = goods_emission
 
-                direct_tod = direct_emissions_data["type_of_determination"]
-                indirect_tod = indirect_emissions_data["type_of_determination"]
+    render_queued_documents(config.get("options", {}).get("pdf_workers"))
 
-                # Todo : Take a look on production method; should be compared with supplier data
+    if report_model is not None:
+        Log.debug(f"Recomputed {len(imported_goods) - num_reused} of {len(imported_goods)} imported goods, {num_reused} reused from {report_model}", key="report_model")
 
-                # general
+        report_model.update(imported_goods, context, fingerprints)
+        save_report_model(report_model)
 
-                goods_emission[io_key] = {
-                    "operator": operator,
-                    "installation": installation,
-                    "net_mass": net_mass,
-                    "production_method": {production_method: None},
-                    "production_method_name": production_method_name,
-                    "applicable_reporting_type_methodology": applicable_reporting_type_methodology,
-                    "country_of_production": entry["country_of_production"],
-                }
 
-                # direct emissions
+def reuse_goods_emissions(report_model, ig_key, emission_groups):
+    """
+    Returns the goods emissions of the imported good rebuilt from the cached emission values,
+    None if they cannot be reused
+    """
+    values_ls = report_model.cached_values(ig_key, [line.io_key for line, _, _ in emission_groups])
+    if values_ls is None:
+        return None
+
+    goods_emission = {}
+    for (line, net_mass, production_methods), values in zip(emission_groups, values_ls):
+        emission = goods_emission[line.io_key] = GoodsEmission(
+            line.operator,
+            line.installation,
+            net_mass,
+            production_methods,
+            line.production_method_name,
+            values.applicable_reporting_type_methodology,
+            line.country_of_production,
+            dict(values.direct_emissions),
+            dict(values.indirect_emissions),
+        )
+        emission.supporting_documents = values.supporting_documents
+
+    return goods_emission
+
+
+def create_goods_emission(cn_code, line, net_mass, production_methods, installation_data, prepared_data_dict, config, default_see=None):
+    """
+    Returns the GoodsEmission of an installation/ operator, line is its first goods line
+    """
+    installation = line.installation
+    operator = line.operator
 
-                goods_emission[io_key]["direct_emissions"] = {
-                    "DeterminationType": direct_emissions_data["type_of_determination"],
-                    "ApplicableReportingTypeMethodology": direct_emissions_data["reporting_methodology"],
-                    "ApplicableReportingMethodology": direct_emissions_data["additional_info"],
-                    "SpecificEmbeddedEmissions": see_direct,
-                }
+    io_key = line.io_key
 
-                # indirect emissions
+    installation_name = io_key
 
-                goods_emission[io_key]["indirect_emissions"] = {
-                    "DeterminationType": indirect_emissions_data["type_of_determination"],
-                    "SpecificEmbeddedEmissions": see_indirect,  # not necessary here, is calculated later on
-                    "ElectricitySource": indirect_emissions_data["source_of_electricity"],
-                    "OtherSourceIndication": indirect_emissions_data["other_source_indication"],
-                    "EmissionFactorSource": indirect_emissions_data["source_of_emission_factor"],
-                    "ElectricityConsumed": indirect_emissions_data["electricity_consumed"],
-                    "EmissionFactor": indirect_emissions_data["emission_factor"],
-                    "EmissionFactorSourceValue": indirect_emissions_data["source_of_emission_factor_value"],
-                }
+    fix_determination_type = installation_data.get("fix_type_of_determination", None)  # todo : rename and restructure
 
-                # production_method
+    cn_code_emission_data = None
 
-                # todo : implement this
+    # General determination: fix_type_of_determination
+    if fix_determination_type == "02":  # default value report
+        inst_determination_type = "02"
 
-                ## SupportingDocuments
+        cn_code_emission_data = default_emission_data(cn_code, default_see)
 
-                if fix_determination_type != "02" and (indirect_tod == "03" or direct_tod == "03"):
-                    goods_emission[io_key]["supporting_documents"] = create_supporting_documents(
-                        installation_data_entry, cn_code, installation, operator, prepared_data_dict["general_info"], config
-                    )
+    elif fix_determination_type == "03":  # full zero report, without documentation
+        installation_data_entry = installation_data["default"]
+        cn_code_emission_data = installation_data_entry["emission_data"]["default"]
 
-                    # dirty quick fix, does not work with multiple documents
-                    additional_info = goods_emission[io_key]["direct_emissions"]["ApplicableReportingMethodology"]
-                    if additional_info is not None and "<template>" in additional_info:
-                        doc_name = goods_emission[io_key]["supporting_documents"][0]["Attachment"]["Filename"]
-                        additional_info = additional_info.replace("<template>", doc_name)
-                        goods_emission[io_key]["direct_emissions"]["ApplicableReportingMethodology"] = additional_info
+        if "default_supporting_documents" in installation_data:
+            installation_data_entry["supporting_documents"] = installation_data["default_supporting_documents"]
 
-                    Log.info(
-                        f"Supporting documents for {io_key}:\n{goods_emission[io_key]['supporting_documents']}",
-                    )
-                else:
-                    Log.info(
-                        f"determination type {inst_determination_type} for {io_key} does not require supporting documents"
-                    )
+    # Detail determination: per installation
+    else:
+        # find the supplier/ default data set for the given installation
+        ## todo: this must support non exact matches as well
+        installation_data_entry = installation_data[installation_name]
+        inst_determination_type = installation_data_entry["type_of_determination"]
+
+        emission_data = installation_data_entry["emission_data"]
+
+        # select cn code specific data if det_type is 01
+        if inst_determination_type == "03":  # zero report
+            cn_code_emission_data = emission_data["default"]
+        elif inst_determination_type == "01":  # real data
+            if cn_code not in emission_data:
+                pprint.pprint(emission_data)
+                print(f"CN code: {cn_code}, cn code data type: {type(cn_code)}, emission data snd key: {list(emission_data.keys())[1]}, emission data first key type: {type(list(emission_data.keys())[0])}, emission data first key: {list(emission_data.keys())[0]}, emission data snd key type: {type(list(emission_data.keys())[1])}")
+                Log.error(
+                    f"CN code <yellow>{cn_code}</r> from customer data not found in supplier data (using det_type {inst_determination_type})\n. Installation: {installation_name}",
+                    title="Missing CN Code in Supplier Data",
+                )
+            cn_code_emission_data = emission_data[cn_code]
+
+    ## direct
+
+    direct_emissions_data = cn_code_emission_data["direct_emissions"]
+    indirect_emissions_data = cn_code_emission_data["indirect_emissions"]
+    applicable_reporting_type_methodology = direct_emissions_data["reporting_methodology"]
+    see_direct = direct_emissions_data["see"]
+    see_indirect = indirect_emissions_data["see"]
+
+    direct_tod = direct_emissions_data["type_of_determination"]
+    indirect_tod = indirect_emissions_data["type_of_determination"]
+
+    # Todo : Take a look on production method; should be compared with supplier data
+
+    # general
+
+    # direct emissions (values in fixed point)
+
+    direct_emissions = {
+        "DeterminationType": direct_emissions_data["type_of_determination"],
+        "ApplicableReportingTypeMethodology": direct_emissions_data["reporting_methodology"],
+        "ApplicableReportingMethodology": direct_emissions_data["additional_info"],
+        "SpecificEmbeddedEmissions": to_fixed(see_direct, SEE_DIGITS),
+    }
 
-            else:
-                # aggregate masses
-                goods_emission[io_key]["net_mass"] += entry["net_mass"]
-                # add production method
-                goods_emission[io_key]["production_method"][production_method] = None
+    # indirect emissions
+
+    indirect_emissions = {
+        "DeterminationType": indirect_emissions_data["type_of_determination"],
+        "SpecificEmbeddedEmissions": to_fixed(see_indirect, SEE_DIGITS),  # not necessary here, is calculated later on
+        "ElectricitySource": indirect_emissions_data["source_of_electricity"],
+        "OtherSourceIndication": indirect_emissions_data["other_source_indication"],
+        "EmissionFactorSource": indirect_emissions_data["source_of_emission_factor"],
+        "ElectricityConsumed": to_fixed(indirect_emissions_data["electricity_consumed"], ELECTRICITY_DIGITS),
+        "EmissionFactor": to_fixed(indirect_emissions_data["emission_factor"], ELECTRICITY_DIGITS),
+        "EmissionFactorSourceValue": indirect_emissions_data["source_of_emission_factor_value"],
+    }
 
-        num_goods_emission = len(goods_emission)
-        shared_summary = shared_data["current"].setdefault("summary", {})
-        shared_summary_num_goods_emission = shared_summary.setdefault("num_goods_emission", 0)
-        shared_summary["num_goods_emission"] = shared_summary_num_goods_emission + num_goods_emission
+    emission = GoodsEmission(
+        operator,
+        installation,
+        net_mass,
+        production_methods,
+        line.production_method_name,
+        applicable_reporting_type_methodology,
+        line.country_of_production,
+        direct_emissions,
+        indirect_emissions,
+    )
+
+    # production_method
+
+    # todo : implement this
+
+    ## SupportingDocuments
+
+    if fix_determination_type != "02" and (indirect_tod == "03" or direct_tod == "03"):
+        emission.supporting_documents = create_supporting_documents(
+            installation_data_entry, cn_code, installation, operator, prepared_data_dict["general_info"], config
+        )
+
+        # dirty quick fix, does not work with multiple documents
+        additional_info = emission.direct_emissions["ApplicableReportingMethodology"]
+        if additional_info is not None and "<template>" in additional_info:
+            doc_name = emission.supporting_documents[0]["Attachment"]["Filename"]
+            additional_info = additional_info.replace("<template>", doc_name)
+            emission.direct_emissions["ApplicableReportingMethodology"] = additional_info
+
+        Log.info(
+            f"Supporting documents for {io_key}:\n{emission.supporting_documents}",
+        )
+    else:
+        Log.info(
+            f"determination type {inst_determination_type} for {io_key} does not require supporting documents"
+        )
 
-        imported_good["goods_emissions"] = goods_emission
+    return emission
 
 
 def create_supporting_documents(installation_data_entry, cn_code, installation, operator, general_info, config):
@@ -300,14 +363,9 @@ def create_supporting_documents(installation_data_entry, cn_code, installation,
 
 
 def create_doc_pdf(installation_data_entry, cn_code, installation, operator, general_info, config):
-    import datetime
-    import os
-    import io
-    from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName, PdfObject, PageMerge
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import mm
-    import textwrap
-
+    """
+    Queues the supporting document filled from the template (see pdf_rendering.py), returns its file path
+    """
     template_file_path = config["supplier_workflow"]["doc_template_file"]
     template_signature_name = config["supplier_workflow"]["doc_signature_name"]
 
@@ -383,95 +441,46 @@ def create_doc_pdf(installation_data_entry, cn_code, installation, operator, gen
         else:
             form_data[f"Anmerkungen{i}"] = ""
 
-    # Function to fill the PDF form
-    def fill_pdf(input_pdf_path, output_pdf_path, data_dict):
-
-        # === Text Properties (Adjust as Needed) ===
-        text_alignment = "top-left"  # Alignment: 'top-left' (currently only this option)
-        font_size = 7  # Smaller font size
-        wrap_at_chars = 38  # Wrap text after 50 characters
-        truncate_after_chars = 38 * 4  # Truncate text after 200 characters
-
-        # Load the PDF template
-        template_pdf = PdfReader(input_pdf_path)
-
-        # Create a list to hold pages with updated content
-        updated_pages = []
-
-        for page_num, page in enumerate(template_pdf.pages):
-            annotations = page.Annots
-            if annotations:
-                # Create a canvas to draw the text
-                packet = io.BytesIO()
-                can = canvas.Canvas(packet, pagesize=(float(page.MediaBox[2]), float(page.MediaBox[3])))
-
-                for annotation in annotations:
-                    if annotation.Subtype == "/Widget" and annotation.T:
-                        # Extract the field name
-                        field_name = annotation.T[1:-1]  # Remove parentheses
-                        if field_name in data_dict:
-                            value = data_dict[field_name]
-                            # Apply truncation
-                            if len(value) > truncate_after_chars:
-                                value = value[:truncate_after_chars]
-                            # Apply line wrapping
-                            lines = textwrap.wrap(value, width=wrap_at_chars)
-                            # Get the field rectangle
-                            rect = [float(x) for x in annotation.Rect]
-                            x1, y1, x2, y2 = rect
-                            # Calculate field width and height
-                            field_width = x2 - x1
-                            field_height = y2 - y1
-                            # Set the text position
-                            text_x = x1
-                            text_y = y2 - font_size  # Align to top-left
-                            # Draw the text onto the canvas
-                            can.setFont("Helvetica", font_size)
-                            line_height = font_size * 1.2  # Line spacing
-                            for line in lines:
-                                can.drawString(text_x, text_y, line)
-                                text_y -= line_height
-                                if text_y < y1:
-                                    break  # Stop if we reach the bottom of the field
-                # Finalize the canvas
-                can.save()
-                packet.seek(0)
-                # Merge the canvas onto the page
-                new_pdf = PdfReader(packet)
-                overlay = PageMerge(new_pdf.pages[0]).render()
-                PageMerge(page).add(overlay).render()
-                # Remove form fields
-                page.Annots = []
-            # Add the updated page to the list
-            updated_pages.append(page)
-
-        # Write the updated pages to the output PDF
-        writer = PdfWriter()
-        writer.addpages(updated_pages)
-        writer.write(output_pdf_path)
-
-    # Call the fill_pdf function with the template and output file paths
-    fill_pdf(template_file_path, file_path, form_data)
+    # rendered with the other queued documents at the end of create_goods_emissions
+    queue_document(template_file_path, file_path, form_data)
 
     return file_path
 
 
-def default_emission_data(cn_code):
-    # use of default values
+def default_see_values(cn_codes):
+    """
+    Returns {cn_code: (see_direct, see_indirect)} of the default data, cn codes not in the default data are left out
+    """
+    cn_codes = list(dict.fromkeys(cn_codes))
+    see_direct, see_indirect = DefaultData.get("cn_code_default_values").see(cn_codes)
+
+    return {
+        cn_code: (float(direct), float(indirect))
+        for cn_code, direct, indirect in zip(cn_codes, see_direct, see_indirect)
+        if not (math.isnan(direct) and math.isnan(indirect))
+    }
+
 
-    cn_code_def_vals = DefaultData.get("cn_code_default_values")
-    default_data = cn_code_def_vals[cn_code]
+def default_emission_data(cn_code, default_see=None):
+    # use of default values, default_see: see values resolved by default_see_values
+
+    if default_see is not None and cn_code in default_see:
+        see_direct, see_indirect = default_see[cn_code]
+    else:
+        # KeyError if the cn code is not in the default data
+        default_data = DefaultData.get("cn_code_default_values")[cn_code]
+        see_direct, see_indirect = default_data["see_direct"], default_data["see_indirect"]
 
     cn_code_emission_data = {
         "direct_emissions": {
             "type_of_determination": "02",
             "reporting_methodology": "TOM03",
             "additional_info": None,
-            "see": default_data["see_direct"],
+            "see": see_direct,
         },
         "indirect_emissions": {
             "type_of_determination": "02",
-            "see": default_data["see_indirect"],
+            "see": see_indirect,
             "source_of_electricity": "SOE03",
             "other_source_indication": "'Received from the grid' wurde ausgewählt weil Feld verpflichtend ist. Eigentlich ist die Information nicht verfügbar weil Defaultwerte genutzt werden.",
             "electricity_consumed": None,
@@ -573,9 +582,14 @@ def create_imported_goods(customer_dict_ls, prepared_data_dict):
         table_cn_codes = sheet_cn_codes["table_imported_goods"]
         importer_entry = customer_dict["Allgemeine_Informationen"]["general_information"][0]
         importer_name = importer_entry["importer_name"]
-        importer_eori = importer_entry["importer_eori"]
-        importer_country = importer_entry["importer_country"]
-        importer_city = importer_entry["importer_city"]
+
+        # shared by the imported goods of the file
+        importer = {
+            "name": importer_name,
+            "eori": importer_entry["importer_eori"],
+            "country": importer_entry["importer_country"],
+            "city": importer_entry["importer_city"],
+        }
 
         for entry in table_cn_codes:
             # determine importer in order to determine country code
@@ -602,41 +616,24 @@ def create_imported_goods(customer_dict_ls, prepared_data_dict):
                         title="operator/ installation mismatch in customer data",
                     )
 
-            if "country_of_origin" not in entry or entry["country_of_origin"] is None or entry["country_of_origin"] == "":
+            country_of_origin = entry.get("country_of_origin")
+            if country_of_origin is None or country_of_origin == "":
                 # installation is prefered as source for country of origin
                 if installation is not None:
-                    entry["country_of_origin"] = installation["installation_country"]
+                    country_of_origin = installation["installation_country"]
                 elif operator is not None:
-                    entry["country_of_origin"] = operator["operator_country"]
-            print(f"country_of_origin: {entry['country_of_origin']}")
-
-            country_code = entry["country_of_origin"] # country code?
-            imported_good_key = entry["cn_code"] + ";" + country_code + ";" + importer_name
+                    country_of_origin = operator["operator_country"]
+            Log.debug("country_of_origin: {country}", key="prepare_data", country=country_of_origin)
 
-            entry["det_operator"] = operator
-            entry["det_installation"] = installation
+            line = GoodsLine(entry, country_of_origin, operator, installation)
+            imported_good_key = ImportedGoodKey(line.cn_code, line.country_of_origin, importer_name)
 
-            if installation is not None:
-                entry["country_of_production"] = installation["installation_country"]
-            else:
-                entry["country_of_production"] = operator["operator_country"]
-
-            # creating a list of entries with same key, that will be processed by create_procedures
-            # (merging the entries here already would disregard different procedures)
-            if imported_good_key not in imported_goods:
-                imported_goods[imported_good_key] = {
-                    "raw_entries": [entry],
-                    "procedures": [],
-                    "importer": {
-                        "name": importer_name,
-                        "eori": importer_eori,
-                        "country": importer_country,
-                        "city": importer_city,
-                    },
-                    "country_of_origin": entry["country_of_origin"],
-                }
-            else:
-                imported_goods[imported_good_key]["raw_entries"].append(entry)
+            # creating a list of lines with same key, that will be processed by create_procedures
+            # (merging the lines here already would disregard different procedures)
+            imported_good = imported_goods.get(imported_good_key)
+            if imported_good is None:
+                imported_good = imported_goods[imported_good_key] = ImportedGood(imported_good_key, importer, line.country_of_origin)
+            imported_good.lines.append(line)
 
     shared_summary = shared_data["current"].setdefault("summary", {})
     num_imported_goods = len(imported_goods)
@@ -645,109 +642,16 @@ def create_imported_goods(customer_dict_ls, prepared_data_dict):
     prepared_data_dict["imported_goods"] = imported_goods
 
 
-def create_procedures(customer_dict, prepared_data_dict):
-    imported_goods = prepared_data_dict["imported_goods"]
-
-    # using the chance to create a total netmass entry here
-
-    for _, imported_good in imported_goods.items():
-        imported_good_total_netmass = 0
-
-        """
-        Every ImportedGoods entry contains a list of up to 9 procedures, together with their corresponding net mass.
-        Every procedure entry can have up to 9 entries with inward processing information 
-        """
-
-        procedures = {}
-
-        raw_entry_ls = imported_good["raw_entries"]
-
-        for entry in raw_entry_ls:
-            """
-            Group and aggregate procedures by requested procedure and previous procedure
-            """
-
-            imported_good_total_netmass += r_float(entry["net_mass"], round_to=9)
-
-            requested_procedure = entry["requested_procedure"]
-
-            previous_procedure = entry.get("previous_procedure", None)
-
-            current_entry_procedure = {
-                "net_mass": entry["net_mass"],
-                "requested_procedure": requested_procedure,
-                "previous_procedure": previous_procedure,
-                "inward_processing": entry["inward_processing"],
-                "inward_processing_information": None,
-            }
-
-            cond_a = current_entry_procedure["inward_processing"] == "1"
-            cond_b = previous_procedure == "51" or previous_procedure == "54"
-
-            if cond_a ^ cond_b:
-                Log.error(f"[prepare data] Contradicting entries w.r. to inward processing in {entry} : {cond_a} ^ {cond_b}")
-
-            inward_processing_active = cond_a and cond_b
-
-            if inward_processing_active:
-                inward_processing_values = [
-                    "already_processed",
-                    "not_processed",
-                    "member_state_of_authorization",
-                    "bill_of_discharge_waiver",
-                    "authorization",
-                    "start_date",
-                    "end_date",
-                    "deadline",
-                ]
-
-                inward_processing_info = {ent: entry[ent] for ent in inward_processing_values}
-
-                current_entry_procedure["inward_processing_information"] = inward_processing_info
-
-            procedure_key = f"{requested_procedure};" + f"{previous_procedure}"
-
-            if procedure_key not in procedures:
-                # creating entry for procedure key
-                procedures[procedure_key] = current_entry_procedure
-            else:
-                # if the procedure key already exists, aggregate the masses
-                procedures[procedure_key]["net_mass"] += r_float(current_entry_procedure["net_mass"], round_to=9) # will be used for calculation so round to 9 digits instead of 6
-
-            # * inward processing
-
-            inward_processing_info = current_entry_procedure["inward_processing_information"]
-
-            if inward_processing_info is not None:
-                # if inward processing information is not existing, create it
-                if procedures[procedure_key]["inward_processing_information"] is None:
-                    procedures[procedure_key]["inward_processing_information"] = {}
-
-                # exclude processed masses before building key
-                already_processed = inward_processing_info.pop("already_processed")
-                not_processed = inward_processing_info.pop("not_processed")
-
-                if inward_processing_info["bill_of_discharge_waiver"] is None:
-                    inward_processing_info["bill_of_discharge_waiver"] = "0"
-
-                # build key to aggregate equal entries of inward processing information
-                ip_key = "".join([inw_proc_val for inw_proc_val in inward_processing_info.values()])
-
-                inward_processing_entries = procedures[procedure_key]["inward_processing_information"]
-
-                if ip_key in inward_processing_entries:
-                    # equal entries are existing -> merge
-                    inward_processing_entries[ip_key]["already_processed"] += already_processed
-                    inward_processing_entries[ip_key]["not_processed"] += not_processed
-
-                else:
-                    # readd excluded masses:
-                    inward_processing_info["already_processed"] = already_processed
-                    inward_processing_info["not_processed"] = not_processed
-                    inward_processing_entries[ip_key] = inward_processing_info
+def create_procedures(customer_dict, prepared_data_dict, goods_frame=None):
+    """
+    Every ImportedGoods entry contains a list of up to 9 procedures, together with their corresponding net mass.
+    Every procedure entry can have up to 9 entries with inward processing information.
 
-            if len(procedures[procedure_key]) > 9:
-                Log.error(f"Too many custom procedures for key {procedure_key} (max: 9, actual: {len(procedures[procedure_key])})")
+    Procedures are grouped by requested procedure and previous procedure, inward processing information
+    by its values (processed masses excluded), masses are aggregated (see aggregation.GoodsFrame).
+    The total net mass of the imported goods is created here as well.
+    """
+    if goods_frame is None:
+        goods_frame = GoodsFrame(prepared_data_dict["imported_goods"])
 
-        imported_good["procedures"] = procedures
-        imported_good["total_net_mass"] = imported_good_total_netmass
+    goods_frame.aggregate_procedures()
@@ -0,0 +1,276 @@
+# records.py
+"""
+
+- records of prepare_data, read by create_xml: ImportedGoodKey, GoodsLine, InwardProcessingInfo,
+  Procedure, GoodsEmission and ImportedGood
+- slotted classes instead of nested dicts, repeated strings (cn codes, country codes, names) are interned
+- masses are integers in fixed point with fixed_point.MASS_DIGITS digits
+- prepared_data_dict["imported_goods"] maps ImportedGoodKey -> ImportedGood
+
+"""
+
+from .helper import intern_str
+from .fixed_point import to_fixed, format_fixed, MASS_DIGITS
+
+
+class ImportedGoodKey:
+    """
+    Imported goods are grouped by cn code, country of origin and importer name
+    """
+
+    __slots__ = ("cn_code", "country", "importer_name", "_hash")
+
+    def __init__(self, cn_code, country, importer_name):
+        self.cn_code = intern_str(cn_code)
+        self.country = intern_str(country)
+        self.importer_name = intern_str(importer_name)
+        self._hash = hash((self.cn_code, self.country, self.importer_name))
+
+    def __eq__(self, other):
+        if not isinstance(other, ImportedGoodKey):
+            return NotImplemented
+        return self.cn_code == other.cn_code and self.country == other.country and self.importer_name == other.importer_name
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # the hash is recomputed on unpickling (string hashes differ between processes)
+        return (ImportedGoodKey, (self.cn_code, self.country, self.importer_name))
+
+    def __str__(self):
+        # format of the former string keys
+        return f"{self.cn_code};{self.country};{self.importer_name}"
+
+    def __repr__(self):
+        return f"ImportedGoodKey({self.cn_code!r}, {self.country!r}, {self.importer_name!r})"
+
+
+class InwardProcessingInfo:
+    """
+    Inward processing information of a customs procedure, entries with equal key() are merged by adding their masses
+    """
+
+    __slots__ = (
+        "member_state_of_authorization",
+        "bill_of_discharge_waiver",
+        "authorization",
+        "start_date",
+        "end_date",
+        "deadline",
+        "already_processed",
+        "not_processed",
+    )
+
+    def __init__(
+        self,
+        member_state_of_authorization,
+        bill_of_discharge_waiver,
+        authorization,
+        start_date,
+        end_date,
+        deadline,
+        already_processed,
+        not_processed,
+    ):
+        self.member_state_of_authorization = intern_str(member_state_of_authorization)
+        self.bill_of_discharge_waiver = bill_of_discharge_waiver
+        self.authorization = intern_str(authorization)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.deadline = deadline
+        self.already_processed = already_processed
+        self.not_processed = not_processed
+
+    @classmethod
+    def from_entry(cls, entry):
+        return cls(
+            entry.get("member_state_of_authorization"),
+            entry.get("bill_of_discharge_waiver"),
+            entry.get("authorization"),
+            entry.get("start_date"),
+            entry.get("end_date"),
+            entry.get("deadline"),
+            to_fixed(entry.get("already_processed"), MASS_DIGITS),
+            to_fixed(entry.get("not_processed"), MASS_DIGITS),
+        )
+
+    def key(self):
+        return (
+            self.member_state_of_authorization,
+            self.bill_of_discharge_waiver,
+            self.authorization,
+            self.start_date,
+            self.end_date,
+            self.deadline,
+        )
+
+    def copy(self):
+        return InwardProcessingInfo(*(getattr(self, slot) for slot in self.__slots__))
+
+    def __repr__(self):
+        return f"InwardProcessingInfo({self.authorization!r}, {self.start_date!r}-{self.end_date!r}, already_processed={format_fixed(self.already_processed, MASS_DIGITS)}, not_processed={format_fixed(self.not_processed, MASS_DIGITS)})"
+
+
+class GoodsLine:
+    """
+    One entry of the imported goods table, with the operator/ installation it was assigned to
+    (operator and installation are the entries of the customer's operator/ installation lists)
+    """
+
+    __slots__ = (
+        "pk_index",
+        "cn_code",
+        "country_of_origin",
+        "country_of_production",
+        "operator",
+        "installation",
+        "net_mass",
+        "production_method",
+        "production_method_name",
+        "requested_procedure",
+        "previous_procedure",
+        "inward_processing",
+        "inward_processing_info",
+    )
+
+    def __init__(self, entry, country_of_origin, operator, installation):
+        self.pk_index = entry.get("pk_index")
+        self.cn_code = intern_str(entry["cn_code"])
+        self.country_of_origin = intern_str(country_of_origin)
+        self.operator = operator
+        self.installation = installation
+
+        if installation is not None:
+            self.country_of_production = intern_str(installation["installation_country"])
+        else:
+            self.country_of_production = intern_str(operator["operator_country"])
+
+        self.net_mass = to_fixed(entry["net_mass"], MASS_DIGITS)
+
+        if " - " not in entry["production_method"]:
+            self.production_method = intern_str(entry["production_method"])
+            self.production_method_name = "-"
+        else:
+            production_method, production_method_name = entry["production_method"].split(" - ")
+            self.production_method = intern_str(production_method)
+            self.production_method_name = intern_str(production_method_name)
+
+        self.requested_procedure = intern_str(entry["requested_procedure"])
+        self.previous_procedure = intern_str(entry.get("previous_procedure", None))
+        self.inward_processing = entry["inward_processing"]
+        self.inward_processing_info = InwardProcessingInfo.from_entry(entry) if self.inward_processing == "1" else None
+
+    @property
+    def io_key(self):
+        # goods emissions are grouped by installation, or by operator if no installation is given
+        if self.installation is not None:
+            return self.installation["installation_name"]
+        return self.operator["operator_name"]
+
+    def __repr__(self):
+        return f"GoodsLine({self.pk_index!r}, {self.cn_code!r}, {self.country_of_origin!r}, net_mass={format_fixed(self.net_mass, MASS_DIGITS)}, procedure={self.requested_procedure!r}/{self.previous_procedure!r}, inward_processing={self.inward_processing!r})"
+
+
+class Procedure:
+    """
+    Customs procedure of an imported good (requested and previous procedure) with the aggregated net mass,
+    inward_processing_infos maps InwardProcessingInfo.key() -> InwardProcessingInfo
+    """
+
+    __slots__ = ("requested_procedure", "previous_procedure", "net_mass", "inward_processing", "inward_processing_infos")
+
+    def __init__(self, requested_procedure, previous_procedure, net_mass, inward_processing):
+        self.requested_procedure = requested_procedure
+        self.previous_procedure = previous_procedure
+        self.net_mass = net_mass
+        self.inward_processing = inward_processing
+        self.inward_processing_infos = None
+
+    @property
+    def inward_processing_info(self):
+        # the report holds one InwardProcessingInfo per procedure
+        if not self.inward_processing_infos:
+            return None
+        return next(iter(self.inward_processing_infos.values()))
+
+    def __repr__(self):
+        return f"Procedure({self.requested_procedure!r}, {self.previous_procedure!r}, net_mass={format_fixed(self.net_mass, MASS_DIGITS)}, inward_processing_infos={len(self.inward_processing_infos or ())})"
+
+
+class GoodsEmission:
+    """
+    Emissions of an imported good per installation (or operator).
+    direct_emissions/ indirect_emissions hold the values of the DirectEmissions/ IndirectEmissions report elements
+    (specific embedded emissions, electricity consumed and emission factor in fixed point),
+    production_methods the method ids in order of appearance (dict used as ordered set).
+    """
+
+    __slots__ = (
+        "operator",
+        "installation",
+        "net_mass",
+        "production_methods",
+        "production_method_name",
+        "applicable_reporting_type_methodology",
+        "country_of_production",
+        "direct_emissions",
+        "indirect_emissions",
+        "supporting_documents",
+    )
+
+    def __init__(
+        self,
+        operator,
+        installation,
+        net_mass,
+        production_methods,
+        production_method_name,
+        applicable_reporting_type_methodology,
+        country_of_production,
+        direct_emissions,
+        indirect_emissions,
+    ):
+        self.operator = operator
+        self.installation = installation
+        self.net_mass = net_mass
+        self.production_methods = production_methods
+        self.production_method_name = production_method_name
+        self.applicable_reporting_type_methodology = applicable_reporting_type_methodology
+        self.country_of_production = country_of_production
+        self.direct_emissions = direct_emissions
+        self.indirect_emissions = indirect_emissions
+        self.supporting_documents = None
+
+    @property
+    def method_id(self):
+        return next(iter(self.production_methods))
+
+    def __repr__(self):
+        return f"GoodsEmission({self.country_of_production!r}, net_mass={format_fixed(self.net_mass, MASS_DIGITS)}, production_methods={list(self.production_methods)})"
+
+
+class ImportedGood:
+    """
+    Goods lines with the same ImportedGoodKey, aggregated by create_procedures/ create_goods_emissions
+    procedures: (requested_procedure, previous_procedure) -> Procedure
+    goods_emissions: installation or operator name -> GoodsEmission
+    """
+
+    __slots__ = ("key", "lines", "importer", "country_of_origin", "procedures", "total_net_mass", "goods_emissions")
+
+    def __init__(self, key, importer, country_of_origin):
+        self.key = key
+        self.lines = []
+        self.importer = importer
+        self.country_of_origin = country_of_origin
+        self.procedures = {}
+        self.total_net_mass = 0
+        self.goods_emissions = {}
+
+    @property
+    def cn_code(self):
+        return self.key.cn_code
+
+    def __repr__(self):
+        return f"ImportedGood({str(self.key)!r}, lines={len(self.lines)}, procedures={len(self.procedures)}, goods_emissions={len(self.goods_emissions)})"
@@ -0,0 +1,247 @@
+# report_model.py
+"""
+
+- incremental recomputation of the goods emissions of a report (see prepare_data.create_goods_emissions)
+- a ReportModel keeps the emission values of every imported good per installation/ operator, the fingerprints
+  of the inputs they were computed from (installation_data entry, operator/ installation of the customer data)
+  and the dependency graph installation/ operator -> imported goods
+- models are cached in process and on disk, keyed by the general info of the report and the default data file;
+  on the next run only the goods fed by installations/ operators whose inputs changed are recomputed,
+  the others reuse the cached values (no supplier data lookup, no pdf creation), masses are always taken from
+  the current goods lines
+- any change of the report context (determination approach, default entries, documents, output directory, ...)
+  recomputes all goods
+
+"""
+
+import datetime
+import hashlib
+import os
+import pickle
+from . import helper
+from .default_data import DefaultData
+from .log import Log
+from .shared import shared_data
+
+
+# bump if the cached structure changes, invalidates the disk cache
+REPORT_MODEL_FORMAT = 1
+
+REPORT_MODEL_CACHE = "report_models"
+
+# keys of installation_data that are not installation/ operator entries
+GLOBAL_INSTALLATION_KEYS = ("fix_type_of_determination", "default", "default_supporting_documents")
+
+# model key -> ReportModel
+_report_models = {}
+
+
+class EmissionValues:
+    """
+    Computed part of a GoodsEmission (the rest is taken from the goods lines)
+    """
+
+    __slots__ = ("applicable_reporting_type_methodology", "direct_emissions", "indirect_emissions", "supporting_documents")
+
+    def __init__(self, applicable_reporting_type_methodology, direct_emissions, indirect_emissions, supporting_documents):
+        self.applicable_reporting_type_methodology = applicable_reporting_type_methodology
+        self.direct_emissions = direct_emissions
+        self.indirect_emissions = indirect_emissions
+        self.supporting_documents = supporting_documents
+
+    @classmethod
+    def of(cls, goods_emission):
+        return cls(
+            goods_emission.applicable_reporting_type_methodology,
+            dict(goods_emission.direct_emissions),
+            dict(goods_emission.indirect_emissions),
+            goods_emission.supporting_documents,
+        )
+
+    def __repr__(self):
+        return f"EmissionValues({self.direct_emissions.get('DeterminationType')!r}, supporting_documents={len(self.supporting_documents or ())})"
+
+
+class ReportModel:
+    """
+    context: fingerprint of everything all goods depend on
+    installation_fingerprints: installation/ operator name -> fingerprint of its inputs
+    dependencies: installation/ operator name -> set of ImportedGoodKey
+    emission_values: ImportedGoodKey -> {installation/ operator name: EmissionValues}
+    """
+
+    __slots__ = ("key", "context", "installation_fingerprints", "dependencies", "emission_values")
+
+    def __init__(self, key):
+        self.key = key
+        self.context = None
+        self.installation_fingerprints = {}
+        self.dependencies = {}
+        self.emission_values = {}
+
+    def affected_goods(self, context, installation_fingerprints):
+        """
+        Returns the set of ImportedGoodKey to recompute, None if all goods have to be recomputed
+        """
+        if self.context is None or context != self.context:
+            return None
+
+        changed = {
+            io_key
+            for io_key in self.installation_fingerprints.keys() | installation_fingerprints.keys()
+            if self.installation_fingerprints.get(io_key) != installation_fingerprints.get(io_key)
+        }
+
+        affected = set()
+        for io_key in changed:
+            affected |= self.dependencies.get(io_key, set())
+
+        return affected
+
+    def cached_values(self, ig_key, io_keys):
+        """
+        Returns the cached EmissionValues of the good in order of io_keys,
+        None if they are missing or their supporting documents cannot be reused
+        """
+        values = self.emission_values.get(ig_key)
+        if values is None or list(values) != list(io_keys):
+            return None
+
+        values_ls = list(values.values())
+        if not replay_supporting_documents(values_ls):
+            return None
+
+        return values_ls
+
+    def update(self, imported_goods, context, installation_fingerprints):
+        # values and dependencies of the prepared goods, replaces the previous state
+        self.context = context
+        self.installation_fingerprints = dict(installation_fingerprints)
+        self.dependencies = {}
+        self.emission_values = {}
+
+        for ig_key, imported_good in imported_goods.items():
+            self.emission_values[ig_key] = {io_key: EmissionValues.of(goods_emission) for io_key, goods_emission in imported_good.goods_emissions.items()}
+            for io_key in imported_good.goods_emissions:
+                self.dependencies.setdefault(io_key, set()).add(ig_key)
+
+    def __repr__(self):
+        return f"ReportModel({self.key[:12]!r}, goods={len(self.emission_values)}, installations={len(self.dependencies)})"
+
+
+def load_report_model(prepared_data_dict):
+    """
+    Returns the ReportModel of the report (empty if none is cached)
+    """
+    key = f"{fingerprint(prepared_data_dict['general_info'])}_{DefaultData.loaded_hash}_{REPORT_MODEL_FORMAT}"
+
+    report_model = _report_models.get(key)
+    if report_model is None:
+        report_model = helper.load_pickle_cache(REPORT_MODEL_CACHE, key)
+
+    if report_model is None:
+        report_model = ReportModel(key)
+        Log.debug(f"No cached report model for the report ({key[:12]})", key="report_model")
+    else:
+        Log.debug(f"Loaded cached report model {report_model}", key="report_model")
+
+    _report_models[key] = report_model
+
+    return report_model
+
+
+def save_report_model(report_model):
+    helper.save_pickle_cache(REPORT_MODEL_CACHE, report_model.key, report_model)
+
+
+def clear_report_models():
+    _report_models.clear()
+
+
+def report_context(installation_data, prepared_data_dict, config):
+    """
+    Fingerprint of the inputs shared by all goods: determination approach, default entries and documents,
+    general info, supporting document template, default data and output directory
+    (and the date, the generated supporting documents are dated)
+    """
+    global_entries = {key: installation_data.get(key) for key in GLOBAL_INSTALLATION_KEYS}
+    documents = list(installation_data.get("default_supporting_documents") or [])
+    if isinstance(installation_data.get("default"), dict):
+        documents += installation_data["default"].get("supporting_documents") or []
+
+    return fingerprint(
+        (
+            global_entries,
+            document_stats(documents),
+            prepared_data_dict["general_info"],
+            config.get("supplier_workflow"),
+            DefaultData.loaded_hash,
+            shared_data["current"].get("output_dir"),
+            datetime.date.today(),
+        )
+    )
+
+
+def installation_fingerprints(installation_data, suppliers):
+    """
+    installation/ operator name -> fingerprint of its installation_data entry, the entry's supporting documents and
+    the operator/ installation of the customer data (suppliers: name -> (operator, installation), used in the generated documents)
+    """
+    io_keys = [io_key for io_key in installation_data if io_key not in GLOBAL_INSTALLATION_KEYS]
+    io_keys += [io_key for io_key in suppliers if io_key not in installation_data]
+
+    fingerprints = {}
+    for io_key in io_keys:
+        entry = installation_data.get(io_key)
+        documents = document_stats(entry.get("supporting_documents") or []) if isinstance(entry, dict) else None
+        fingerprints[io_key] = fingerprint((entry, documents, suppliers.get(io_key)))
+
+    return fingerprints
+
+
+def document_stats(documents):
+    # documents can change under the same path
+    stats = []
+    for doc in documents:
+        try:
+            stat = os.stat(doc)
+            stats.append((doc, stat.st_size, stat.st_mtime_ns))
+        except (OSError, TypeError):
+            stats.append((doc, None, None))
+    return stats
+
+
+def fingerprint(obj):
+    try:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        data = repr(obj).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def replay_supporting_documents(values_ls):
+    """
+    Counts the attachments of reused goods emissions like create_supporting_documents does,
+    returns False (nothing counted) if a file is missing or its name would differ in a full run
+    """
+    shared_sup_docs = shared_data["current"].setdefault("supporting_documents", {})
+    counts = {}
+
+    for values in values_ls:
+        for document in values.supporting_documents or []:
+            attachment = document["Attachment"]
+            doc = attachment["Binary"][len("binary_") :]
+
+            basename = os.path.basename(doc)
+            data_type = basename.split(".")[-1]
+
+            document_index = counts.get(basename, shared_sup_docs.get(basename, 0)) + 1
+            counts[basename] = document_index
+
+            if attachment["Filename"] != f"{basename[:-len(data_type) - 1]}_{document_index}.{data_type}":
+                return False
+            if not os.path.exists(os.path.join(shared_data["current"]["output_dir"], "temp", doc)):
+                return False
+
+    shared_sup_docs.update(counts)
+    return True
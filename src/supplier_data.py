@@ -1,8 +1,8 @@
 import pprint
 from .log import Log
-import openpyxl
 from openpyxl.utils import get_column_letter
 from .xlsx_access import keyword_index, row_index_from_string, column_letter_from_string
+from .consultation_overview import get_consultation_overview
 
 
 def get_supplier_data(cn_code, general_info, operator_data, installation_data, config):
@@ -32,23 +32,16 @@ def get_supplier_data(cn_code, general_info, operator_data, installation_data, c
 
     cons_ow_path = config["supplier_workflow"]["consultation_overview_file"]
 
-    # find importer worksheet within the excel file
+    # read once per file version, see consultation_overview.py
 
-    try:
-        wb = openpyxl.load_workbook(cons_ow_path, data_only=True)
-    except FileNotFoundError:
-        Log.error(
-            f"Error: Consultation overview file not found at {cons_ow_path}",
-            title="ConsultationOverview file not found",
-        )
+    overview = get_consultation_overview(cons_ow_path)
+    if overview is None:
         return
 
-    importer_sheet = None
+    # find importer worksheet within the excel file
 
-    for sheet in wb.sheetnames:
-        if sheet.lower() == target_importer.lower():
-            importer_sheet = wb[sheet]
-            break
+    found = overview.importer_sheet(target_importer)
+    importer_sheet = found[0] if found is not None else None
 
     if importer_sheet is None:
         Log.error(
@@ -107,7 +100,7 @@ def get_supplier_data(cn_code, general_info, operator_data, installation_data, c
         )
 
         if installation_index is not None:
-            cell_value = importer_sheet[installation_index].value
+            cell_value = importer_sheet.value(installation_index)
             Log.warning(
                 f"\nWarning! Settled with non-exact match in supplier data. Matched:\n\n'<orange>{target_name}</r>'\n\n'<orange>{cell_value}</r>'\n",
                 title=f"Supplier Data / Non-exact match | {cn_code} | {target_name}",
@@ -121,7 +114,7 @@ def get_supplier_data(cn_code, general_info, operator_data, installation_data, c
         )
         return None
 
-    cell_value = importer_sheet[installation_index].value
+    cell_value = importer_sheet.value(installation_index)
     Log.debug(
         f"Supplier Data / Found row for {target_name} / {target_operator} at index {installation_index} with value '{cell_value}'",
         title=f"{cn_code} | {target_name}",
@@ -138,7 +131,7 @@ def get_supplier_data(cn_code, general_info, operator_data, installation_data, c
             installation_info[field_name] = None
         else:
             field_col = column_letter_from_string(field_index)
-            installation_info[field_name] = importer_sheet[field_col + field_row].value
+            installation_info[field_name] = importer_sheet.value(field_col + field_row)
 
     installation_name = installation_info["installation"]
     communication_status = installation_info["communication status"]
@@ -0,0 +1,265 @@
+# table_extractor.py
+"""
+
+- generate a specialized extraction function per table of a customer file
+  (field positions, validator calls and orientation resolved at generation time,
+  values are validated column by column with validator.process_and_validate_column)
+- generated functions are cached per header fingerprint, i.e. per layout version and header positions
+
+"""
+
+from .log import Log
+from . import validator as val
+from .diagnostics import active_report, error_message
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+
+# header fingerprint -> generated extraction function
+_table_extractors = {}
+
+
+def get_table_extractor(resolved_table):
+    """
+    Returns extract(entry_values_ls, raw_data_table) -> num_actual_entries for a ResolvedTable of load_customer_sheet.
+
+    entry_values_ls are the value tuples of read_table_band, the processed entries are appended to raw_data_table.
+    """
+    rt = resolved_table
+
+    fingerprint = (
+        rt.sheet_name,
+        rt.table_name,
+        rt.orientation,
+        rt.head_row,
+        rt.head_col,
+        rt.primary_key,
+        tuple(
+            (
+                field["code_field_name"],
+                repr(field.get("alias_field_name", field["code_field_name"])),
+                field["type"],
+                repr(field.get("condition")),
+            )
+            for field in rt.fields
+        ),
+        rt.head_indices,
+        rt.offset,
+        rt.max_entries,
+        rt.is_capped,
+        rt.max_empty_entries,
+    )
+
+    extractor = _table_extractors.get(fingerprint)
+
+    if extractor is None:
+        extractor = compile_table_extractor(rt)
+        _table_extractors[fingerprint] = extractor
+        Log.debug(f"Generated extractor for table '{rt.table_name}' in sheet '{rt.sheet_name}'", key="load_customer_sheet")
+
+    return extractor
+
+
+def clear_table_extractors():
+    _table_extractors.clear()
+
+
+def field_path(field):
+    # "code_field_name/alias" for messages, the alias is optional (see load_customer_sheet) and can be a list
+    alias_field_names = field.get("alias_field_name", field["code_field_name"])
+    if isinstance(alias_field_names, list):
+        alias_field_names = " | ".join(map(str, alias_field_names))
+    return f"{field['code_field_name']}/{alias_field_names}"
+
+
+def compile_table_extractor(resolved_table):
+    source = table_extractor_source(resolved_table)
+
+    namespace = {
+        "process_and_validate_column": val.process_and_validate_column,
+        "get_column_letter": get_column_letter,
+        "context": TableContext(resolved_table),
+        "conditions": [field.get("condition") for field in resolved_table.fields],
+    }
+
+    exec(compile(source, f"<table_extractor {resolved_table.sheet_name}:{resolved_table.table_name}>", "exec"), namespace)
+
+    extract = namespace["extract"]
+    extract.source = source
+
+    return extract
+
+
+def table_extractor_source(resolved_table):
+    """
+    Returns the python source of the extract function: entries are collected by their primary key
+    (empty entries, end of table), then their values are validated column by column
+    """
+    rt = resolved_table
+
+    if rt.orientation == "vertical":
+        pk_field_expr = f"{rt.primary_key!r} + str(i + {int(rt.head_row)})"
+    elif rt.orientation == "horizontal":
+        pk_field_expr = f"get_column_letter(i + {column_index_from_string(rt.head_col)}) + {rt.primary_key!r}"
+
+    min_pos = min((rt.primary_key_pos,) + rt.field_positions)
+    offset = rt.offset
+
+    lines = [
+        "def extract(entry_values_ls, raw_data_table):",
+        "    report_empty = False",
+        "    num_empty_entries = 0",
+        "    rows = []",
+        "    indices = []",
+        f"    for i, entry_values in enumerate(entry_values_ls, start={offset}):",
+        f"        primary_key_val = entry_values[{rt.primary_key_pos - min_pos}]",
+        '        if primary_key_val is None or primary_key_val == "" or primary_key_val == "--":',
+        "            report_empty = True",
+        "            num_empty_entries += 1",
+        f"            if num_empty_entries >= {rt.max_empty_entries}:",
+        "                break",
+        "            continue",
+    ]
+
+    if rt.is_capped:
+        lines += [
+            f"        if i - {offset} >= {rt.max_entries}:",
+            "            context.truncated()",
+            "            break",
+        ]
+
+    lines += [
+        "        num_empty_entries = 0",
+        "        if report_empty:",
+        "            context.empty_entry(i, primary_key_val)",
+        "            report_empty = False",
+        "        rows.append(entry_values)",
+        "        indices.append(i)",
+        "    entries = [{} for _ in rows]",
+    ]
+
+    # validation column by column in field order, entries hold the fields validated before (e.g. net_mass_unit)
+    for field_idx, (field, field_pos) in enumerate(zip(rt.fields, rt.field_positions)):
+        condition = f"conditions[{field_idx}]" if field.get("condition") is not None else "None"
+        pos = field_pos - min_pos
+
+        lines += [
+            f'    column = ["" if row[{pos}] is None else row[{pos}] for row in rows]',
+            "    values, valid_ls = process_and_validate_column(",
+            f'        {field["type"]!r},',
+            "        column,",
+            "        entry_data_ls=entries,",
+            f"        condition={condition},",
+            f"        on_exception=lambda idx, e: context.validation_exception({field_idx}, indices[idx], column[idx], e),",
+            "    )",
+            "    if not all(valid_ls):",
+            f"        context.invalid_values({field_idx}, indices, values, valid_ls)",
+            "    for entry, value in zip(entries, values):",
+            f"        entry[{field['code_field_name']!r}] = value",
+        ]
+
+    lines += [
+        "    for entry, i in zip(entries, indices):",
+        f"        entry['pk_index'] = {pk_field_expr}",
+        "        raw_data_table.append(entry)",
+        "    return len(entries)",
+    ]
+
+    return "\n".join(lines) + "\n"
+
+
+class TableContext:
+    """
+    Cold paths of the generated extractors (log messages of load_customer_sheet)
+    """
+
+    # logged as the source of the messages, as before the extractors were generated
+    source = "load_customer_sheet"
+
+    def __init__(self, resolved_table):
+        self.resolved_table = resolved_table
+
+    def empty_entry(self, i, primary_key_val):
+        rt = self.resolved_table
+        Log.warning(
+            f"[load_customer_sheet] Empty row encountered in table '{rt.table_name}' before row {i + int(rt.head_row)} \n primary_key = {rt.primary_key} ; primary_key_val = {primary_key_val}",
+            source=self.source,
+        )
+
+    def truncated(self):
+        rt = self.resolved_table
+        Log.warning(
+            f"[load_customer_sheet] Table '{rt.table_name}' in sheet '{rt.sheet_name}' has more than {rt.max_entries} entries (num_entries), further entries are ignored",
+            source=self.source,
+        )
+
+    def validation_exception(self, field_idx, i, value, e):
+        """
+        Returns True if the exception is recorded in the diagnostics report (collect mode), exits otherwise
+        """
+        rt = self.resolved_table
+        field = rt.fields[field_idx]
+        code_field_name = field["code_field_name"]
+
+        index = self.cell_index(field_idx, i)
+
+        report = active_report()
+        if report is not None:
+            report.add(
+                error_message(e),
+                sheet=rt.sheet_name,
+                table=rt.table_name,
+                field=code_field_name,
+                cell=index,
+                rule=field["type"],
+                value=value,
+            )
+            return True
+
+        Log.error(
+            f"[Con.][load_customer_sheet] Error cleaning and validating value for type {field['type']} in sheet '{rt.sheet_name}' : '{rt.table_name}' : '{field_path(field)}' [{index}]\n error: {e}",
+            source=self.source,
+        )
+
+    def cell_index(self, field_idx, i):
+        rt = self.resolved_table
+        head_index = rt.head_indices[field_idx]
+
+        if rt.orientation == "vertical":
+            return head_index + str(i + int(rt.head_row))
+        return get_column_letter(i + column_index_from_string(rt.head_col)) + head_index
+
+    def invalid_values(self, field_idx, indices, values, valid_ls):
+        # None: exception already handled by validation_exception
+        for i, value, valid in zip(indices, values, valid_ls):
+            if valid is False:
+                self.invalid_value(field_idx, i, value)
+
+    def invalid_value(self, field_idx, i, value):
+        rt = self.resolved_table
+        field, head_index = rt.fields[field_idx], rt.head_indices[field_idx]
+        code_field_name = field["code_field_name"]
+        sheet_name, table_name, head_row = rt.sheet_name, rt.table_name, rt.head_row
+
+        report = active_report()
+        if report is not None:
+            report.add(
+                f"invalid value '{value}' for val-type '{field['type']}', expected {val.v.schema.get(val.base_type(field['type']))}",
+                sheet=sheet_name,
+                table=table_name,
+                field=code_field_name,
+                cell=self.cell_index(field_idx, i),
+                rule=field["type"],
+                value=value,
+            )
+            return
+
+        Log.error(
+            f"""invalid value '<blue>{value}</r>' for val-type '<purple>{field["type"]}</purple>'.
+
+Path: {{ '<blue>{sheet_name}</blue>' : '<blue>{table_name}</blue>' : '<blue>{field_path(field)}</blue>' [<blue>{head_index + str(i + int(head_row))}</blue>]
+
+Head index {head_index} ; i = {i} ; head_row = {head_row} }}
+                            """,
+            title="Invalid Value",
+            source=self.source,
+        )
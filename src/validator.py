@@ -17,6 +17,7 @@ from cerberus import Validator
 from .log import Log
 from datetime import datetime
 import re
+import threading
 from .helper import r_float
 
 v = Validator()
@@ -50,6 +51,15 @@ v.schema = {
     "customs_procedure_code": {"type": "string", "regex": r"^\d{2}$"},
 }
 
+_thread_validators = threading.local()
+
+
+def thread_validator():
+    # cerberus validators keep the validated document as state, files loaded in parallel threads need their own instance
+    if not hasattr(_thread_validators, "v"):
+        _thread_validators.v = Validator(v.schema)
+    return _thread_validators.v
+
 
 def process_and_validate(val_type: str, input, entry_data=None, condition=None, raise_errors=True, mute=False):
     """
@@ -72,7 +82,7 @@ def process_and_validate(val_type: str, input, entry_data=None, condition=None,
     if val_type not in v.schema:
         Log.warning(f"[validate] Invalid type '{val_type}' for validation")
 
-    validate = v.validate({val_type: input})
+    validate = thread_validator().validate({val_type: input})
 
     if not validate:
         schema_rule = v.schema.get(val_type, {})
@@ -126,6 +136,11 @@ def process_suffix(val_type, input, entry_data, condition, raise_errors, mute):
         # No specific suffix, default action
         pass  # Fügen Sie hier ggf. eine Standardaktion hinzu
 
+    return base_type(val_type)
+
+
+def base_type(val_type):
+    # type without suffix _m / _c / _o
     return val_type[:-2] if val_type.endswith(("_m", "_c", "_o")) else val_type
 
 
@@ -228,7 +243,7 @@ def pre_process(val_type, input_value):
 def process(val_type, input_value, entry_data=None):
     def log_change(original, new, description):
         if original != new:
-            Log.debug(f"{description}: '{original}' -> '{new}'", key="validator")
+            Log.debug("{description}: '{original}' -> '{new}'", key="validator", description=description, original=original, new=new)
 
     ## * General processing
 
@@ -274,7 +289,7 @@ def process(val_type, input_value, entry_data=None):
 
     #### date strings
 
-    if val_type == "date_str8" and v.validate({"date_str_xlsx": input_value}):
+    if val_type == "date_str8" and thread_validator().validate({"date_str_xlsx": input_value}):
         # Umwandeln des Strings in ein datetime-Objekt
         date_obj = datetime.strptime(input_value, "%Y-%m-%d %H:%M:%S")
 
@@ -321,3 +336,259 @@ def process(val_type, input_value, entry_data=None):
         input_value = r_float(input_value) # added new 25
 
     return input_value
+
+
+# * Column-batched validation
+#
+# process_and_validate_column validates a whole column of one type with rules compiled once per type
+# (converters and compiled regexes instead of the cerberus validator). Values outside the regular path
+# (empty mandatory values, invalid values, conversion errors, conditional types) are passed to
+# process_and_validate, so results, warnings and errors are the same as for single values.
+
+
+class _Fallback(Exception):
+    # value needs the full process_and_validate path
+    pass
+
+
+def compile_schema_rule(rule):
+    """
+    Returns check(value) -> bool with the semantics of the cerberus rule ('type' string/float and 'regex')
+    """
+    if rule["type"] == "string":
+        python_types = (str,)
+    elif rule["type"] == "float":
+        # cerberus accepts ints (and bools) as floats
+        python_types = (float, int)
+
+    regex = None
+    if "regex" in rule:
+        pattern = rule["regex"] if rule["regex"].endswith("$") else rule["regex"] + "$"
+        regex = re.compile(pattern)
+
+    if regex is None:
+        return lambda value: isinstance(value, python_types)
+
+    match = regex.match
+    return lambda value: isinstance(value, python_types) and (not isinstance(value, str) or match(value) is not None)
+
+
+compiled_schema = {val_type: compile_schema_rule(rule) for val_type, rule in v.schema.items()}
+
+is_date_str_xlsx = compiled_schema["date_str_xlsx"]
+
+
+## pre processing (see pre_process), keyed by val_type[:-2]
+
+
+def _pre_boolean(value):
+    if type(value) is not str:
+        raise _Fallback
+    value = value.lower()
+    if value == "ja" or value == "yes":
+        return "1"
+    elif value == "nein" or value == "no":
+        return "0"
+    return None
+
+
+def _pre_inward_processing(value):
+    if value == "":
+        # defaults to "no" with a warning
+        raise _Fallback
+    return _pre_boolean(value)
+
+
+def _pre_eori(value):
+    if type(value) is not str:
+        raise _Fallback
+    return value.replace(" ", "").replace("\u00a0", "")
+
+
+column_pre_processors = {
+    "cn_code": str,
+    "date_str8": str,
+    "quarter": str,
+    "string": str,
+    "year": str,
+    "boolean": _pre_boolean,
+    "inward_processing": _pre_inward_processing,
+    "eori": _pre_eori,
+}
+
+
+## type-specific processing (see process), keyed by the type without suffix
+
+
+def _convert_country(value, entry_data):
+    from .default_data import DefaultData
+
+    if type(value) is not str:
+        raise _Fallback
+
+    country_info = DefaultData.get("country_data").find_country(value)
+    if not country_info:
+        raise _Fallback
+    return country_info["un_code"]
+
+
+def _convert_date_str8(value, entry_data):
+    if is_date_str_xlsx(value):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").strftime("%Y%m%d")
+    return value
+
+
+def _convert_float(value, entry_data):
+    if type(value) is str:
+        value = value.replace(" ", "").replace(",", ".")
+    try:
+        return float(value)
+    except Exception:
+        raise _Fallback
+
+
+def _convert_net_mass(value, entry_data):
+    if entry_data is None or "net_mass_unit" not in entry_data or type(entry_data["net_mass_unit"]) is not str:
+        raise _Fallback
+
+    unit = entry_data["net_mass_unit"].lower()
+
+    try:
+        if unit == "kg":
+            value = value / 1000
+        elif unit not in ("t", "tonnes", "tonnen", "tons"):
+            raise _Fallback
+        return r_float(value)
+    except _Fallback:
+        raise
+    except Exception:
+        raise _Fallback
+
+
+column_converters = {
+    "country": _convert_country,
+    "date_str8": _convert_date_str8,
+    "float": _convert_float,
+    "netmass": _convert_float,
+    "net_mass": _convert_net_mass,
+}
+
+
+_column_validators = {}
+
+
+def column_validator(val_type):
+    """
+    Returns validate(value, entry_data) -> cleaned value for values on the regular path of val_type
+    (raises _Fallback otherwise), or None if the type always needs process_and_validate
+    """
+    if val_type in _column_validators:
+        return _column_validators[val_type]
+
+    validator = None
+
+    suffix = val_type[-2:] if val_type.endswith(("_m", "_c", "_o")) else ""
+    base_type = val_type[: -len(suffix)] if suffix else val_type
+    pre_key = val_type[:-2]
+
+    if suffix != "_c" and pre_key != "customs_procedure_desc" and base_type in compiled_schema:
+        validator = _compile_column_validator(
+            column_pre_processors.get(pre_key), suffix == "_m", column_converters.get(base_type), compiled_schema[base_type]
+        )
+    elif pre_key == "customs_procedure_desc" and suffix != "_c":
+        validator = _compile_customs_procedure_validator(suffix == "_m", compiled_schema["customs_procedure_code"])
+
+    _column_validators[val_type] = validator
+    return validator
+
+
+def _compile_column_validator(pre, mandatory, convert, check):
+    def validate(value, entry_data):
+        if pre is not None:
+            value = pre(value)
+
+        if value is None or value == "":
+            if mandatory:
+                raise _Fallback
+            return value
+
+        if type(value) is str:
+            value = value.strip().replace("\u00a0", "")
+
+        if convert is not None:
+            value = convert(value, entry_data)
+
+        if not check(value):
+            raise _Fallback
+        return value
+
+    return validate
+
+
+def _compile_customs_procedure_validator(mandatory, check):
+    def validate(value, entry_data):
+        if str(value) == "0" or str(value) == "-":
+            if mandatory:
+                raise _Fallback
+            return None
+
+        if type(value) is not str:
+            raise _Fallback
+
+        value = value[:2]
+
+        if value == "":
+            if mandatory:
+                raise _Fallback
+            return value
+
+        value = value.strip().replace("\u00a0", "")
+
+        if not check(value):
+            raise _Fallback
+        return value
+
+    return validate
+
+
+def process_and_validate_column(
+    val_type: str, values, entry_data_ls=None, condition=None, raise_errors=True, mute=False, on_exception=None
+):
+    """
+    Cleans and validates a column of values of one type, same results as process_and_validate per value.
+
+    entry_data_ls: one entry dict per value (e.g. for the unit of net_mass or conditional types), or None
+    on_exception(idx, e): called before an exception of the value at idx is raised,
+        if it returns True the exception is handled (collect mode) and the validity of the value is None
+
+    Returns (cleaned values, validity per value)
+    """
+    validate = column_validator(val_type)
+
+    cleaned_values = []
+    valid_ls = []
+
+    for idx, value in enumerate(values):
+        entry_data = entry_data_ls[idx] if entry_data_ls is not None else None
+
+        if validate is not None:
+            try:
+                cleaned_values.append(validate(value, entry_data))
+                valid_ls.append(True)
+                continue
+            except _Fallback:
+                pass
+
+        try:
+            value, valid = process_and_validate(val_type, value, entry_data=entry_data, condition=condition, raise_errors=raise_errors, mute=mute)
+        except Exception as e:
+            if on_exception is not None and on_exception(idx, e):
+                cleaned_values.append(value)
+                valid_ls.append(None)
+                continue
+            raise e
+
+        cleaned_values.append(value)
+        valid_ls.append(valid)
+
+    return cleaned_values, valid_ls
@@ -9,11 +9,12 @@ import shutil
 from xml.dom.minidom import parseString
 import xml.etree.ElementTree as ET
 from .default_data import DefaultData
-from .load_customer import process_input_file
+from .load_customer import process_input_file, validate_input_file
 from .prepare_data import prepare_data
 from .create_xml import create_report
 import pprint  # noqa
 from .shared import shared_data
+from .document_store import document_store
 import openpyxl
 from .helper import exact_search, non_exact_search
 
@@ -38,6 +39,7 @@ def start(config_file="config/config_JY.yml", no_clear=False):
     
     # Step 2: Load configuration
     config = helper.load_config(config_file=config_file)
+    Log.configure(config)
 
     # Step 3: Load input files and any indirect representative files
     input_files, indirect_r_files = load_input_files(config)
@@ -101,9 +103,24 @@ def start(config_file="config/config_JY.yml", no_clear=False):
 
             # Step 9: Parse and collect data from all input files
             customer_data = []
+            invalid_input = False
             for input_file in input_data:
                 config["input_file"] = input_file
-                customer_data.append(process_input_file(input_file, config["version_layouts_file"]))
+
+                if config["options"].get("collect_validation", False):
+                    # all problems of the file in one report, next to the input file
+                    raw_data, report = validate_input_file(input_file, config["version_layouts_file"])
+                    report.print_table()
+                    report.save_json(os.path.splitext(input_file)[0] + "_diagnostics.json")
+
+                    invalid_input = invalid_input or report.has_errors
+                    customer_data.append(raw_data)
+                else:
+                    customer_data.append(process_input_file(input_file, config["version_layouts_file"]))
+
+            if invalid_input:
+                Log.warning(f"Invalid customer data, skipping report creation for file {index} ({input_file_name})", title="Validation")
+                continue
 
             # Step 10: Extract general customer info
             # Add the output dir to shared data, to access it for pdf creation # todo: move that to load customer
@@ -246,6 +263,9 @@ def save_files(xml_tree, xml_tree_test, config, prepared_data):
 
     shared_data_docs = shared_data["current"].setdefault("supporting_documents", {})
 
+    # documents are read once for all copies in both zip files
+    store = document_store()
+
     with zipfile.ZipFile(os.path.join(output_dir, report_folder_name, zip_file), "w", compresslevel=9) as zipf:
         zipf.write(xml_path, xml_file)
         for sup_doc_file_name, amount in shared_data_docs.items():
@@ -254,7 +274,7 @@ def save_files(xml_tree, xml_tree_test, config, prepared_data):
                 basename = os.path.basename(sup_doc_file_name)
                 suffix = basename.split(".")[-1]
                 basename = basename[: -len(suffix) - 1]
-                zipf.write(os.path.join(output_dir, "temp", sup_doc_file_name), basename + f"_{i}" + "." + suffix)
+                store.write_to_zip(zipf, os.path.join(output_dir, "temp", sup_doc_file_name), basename + f"_{i}" + "." + suffix)
 
     with zipfile.ZipFile(os.path.join(output_dir, test_folder_name, zip_test_file), "w", compresslevel=9) as zipf:
         zipf.write(xml_test_path, xml_test_file)
@@ -264,7 +284,7 @@ def save_files(xml_tree, xml_tree_test, config, prepared_data):
                 basename = os.path.basename(sup_doc_file_name)
                 suffix = basename.split(".")[-1]
                 basename = basename[: -len(suffix) - 1]
-                zipf.write(os.path.join(output_dir, "temp", sup_doc_file_name), basename + f"_{i}" + "." + suffix)
+                store.write_to_zip(zipf, os.path.join(output_dir, "temp", sup_doc_file_name), basename + f"_{i}" + "." + suffix)
 
     num_supporting_docs = 0
     for sup_doc_file_name, amount in shared_data_docs.items():
@@ -33,6 +33,8 @@ def start(report_type: str, customer_file_url: str, supporting_doc_url: str, con
     # Step 1: Load configuration and default data
     try:    
         config = helper.load_config(config_file=config_file)
+        # server runs: no terminal formatting for non-TTY output, rendering off the request thread
+        Log.configure(config, sink="auto", asynchronous=True, warning_limit=20)
         Log.procedure("Loading default data ...")
         loader = LoadingIndicator()
         loader.start()
@@ -1,9 +1,234 @@
 # xlsx_access.py
 
+import weakref
+from bisect import bisect_left
 from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.utils.cell import coordinate_to_tuple
 from .log import Log
 
 
+class HeaderIndex:
+    """
+    Inverted index over the string cells of one worksheet, built row band by row band as lookups need them.
+
+    Cell texts are normalized like in keyword_index (stripped, lowercased unless case_sensitive,
+    cleaned with clean_str_for_supplier if non_exact_supplier_search) and mapped to their coordinates.
+    A lookup scans further rows only until it can be answered: up to fixed_row, or until a match is found
+    (rows scanned later can only hold later matches); only lookups without any match read the whole sheet.
+    Keyword lookups within the scanned rows, also restricted to a fixed row or column, are dictionary hits;
+    "..." prefix keywords are resolved over the sorted list of texts.
+    The worksheet is only weakly referenced, row iterators are opened per lookup (see scan_bands),
+    so the cached index does not keep the worksheet and its workbook alive.
+    """
+
+    # rows scanned per step
+    BAND_ROWS = 64
+
+    def __init__(self, worksheet, case_sensitive=False, non_exact_supplier_search=False, strip=True):
+        self.positions = {}  # text -> [(row, column), ...] in row-major order
+        self.row_positions = {}  # (row, text) -> first column
+        self.column_positions = {}  # (column, text) -> first row
+
+        self.normalization = (case_sensitive, non_exact_supplier_search, strip)
+        self.worksheet = weakref.ref(worksheet)
+        self.scanned_rows = 0
+        self.complete = False
+        self._sorted_texts = None
+
+    def scan_bands(self):
+        """
+        Indexes the next band of rows per iteration until the sheet is scanned completely.
+        The row iterator lives as long as the generator and continues after the rows scanned so far.
+        """
+        rows = None
+        while not self.complete:
+            # (re)opened if another lookup scanned on in between
+            if rows is None or rows_start != self.scanned_rows:
+                # no min_row at the start, iter_rows(min_row=1) creates a cell on empty writable sheets
+                rows = self.worksheet().iter_rows(min_row=self.scanned_rows + 1 if self.scanned_rows else None, values_only=True)
+            self.scan_band(rows)
+            rows_start = self.scanned_rows
+            yield True
+
+    def scan_band(self, rows):
+        """
+        Indexes the next band of rows read from rows
+        """
+        for _ in range(self.BAND_ROWS):
+            row = next(rows, None)
+            if row is None:
+                self.complete = True
+                break
+
+            self.scanned_rows += 1
+            row_idx = self.scanned_rows
+            for col_idx, value in enumerate(row, start=1):
+                if type(value) is not str:
+                    continue
+
+                text = normalize_cell_text(value, *self.normalization)
+
+                if text not in self.positions:
+                    self.positions[text] = []
+                    self._sorted_texts = None
+                self.positions[text].append((row_idx, col_idx))
+                self.row_positions.setdefault((row_idx, text), col_idx)
+                self.column_positions.setdefault((col_idx, text), row_idx)
+
+    @property
+    def sorted_texts(self):
+        if self._sorted_texts is None:
+            self._sorted_texts = sorted(self.positions)
+        return self._sorted_texts
+
+    def matching_texts(self, keyword):
+        if not keyword.endswith("..."):
+            return [keyword] if keyword in self.positions else []
+
+        prefix = keyword[:-3]
+        texts = []
+        for text in self.sorted_texts[bisect_left(self.sorted_texts, prefix) :]:
+            if not text.startswith(prefix):
+                break
+            texts.append(text)
+        return texts
+
+    def find(self, keyword, fixed_row=None, fixed_column=None):
+        """
+        Returns (row, column) of the first cell matching the keyword or None.
+        First means: lowest column within fixed_row, lowest row within fixed_column, row-major otherwise.
+        """
+        bands = self.scan_bands()
+
+        if fixed_row is not None:
+            while self.scanned_rows < fixed_row and next(bands, False):
+                pass
+
+        while True:
+            position = self.find_scanned(keyword, fixed_row, fixed_column)
+            if position is not None or fixed_row is not None or not next(bands, False):
+                return position
+
+    def find_scanned(self, keyword, fixed_row=None, fixed_column=None):
+        texts = self.matching_texts(keyword)
+
+        if fixed_row is not None:
+            columns = [self.row_positions[(fixed_row, t)] for t in texts if (fixed_row, t) in self.row_positions]
+            return (fixed_row, min(columns)) if columns else None
+
+        if fixed_column is not None:
+            rows = [self.column_positions[(fixed_column, t)] for t in texts if (fixed_column, t) in self.column_positions]
+            return (min(rows), fixed_column) if rows else None
+
+        found = [self.positions[t][0] for t in texts]
+        return min(found) if found else None
+
+    def iter_positions(self, texts):
+        """
+        Yields ((row, column), text) of the cells matching one of the texts in row-major order, scanning rows as they are consumed
+        """
+        texts = list(dict.fromkeys(texts))
+        offsets = dict.fromkeys(texts, 0)
+        bands = self.scan_bands()
+
+        while True:
+            band = []
+            for text in texts:
+                positions = self.positions.get(text, [])
+                band += [(position, text) for position in positions[offsets[text] :]]
+                offsets[text] = len(positions)
+
+            # positions found later lie in later rows
+            yield from sorted(band)
+
+            if not next(bands, False):
+                return
+
+
+class ValueSheet:
+    """
+    Cell values of a worksheet, rows padded to the same length; can be pickled and outlives its workbook.
+    Provides the worksheet interface used by keyword_index and load_table_to_dict
+    (title, max_row, max_column, iter_rows and iter_cols with values_only).
+    """
+
+    def __init__(self, title, rows):
+        self.title = title
+        width = max((len(row) for row in rows), default=0)
+        self.rows = [tuple(row) + (None,) * (width - len(row)) for row in rows]
+        self.max_row = len(self.rows)
+        self.max_column = width
+
+    @classmethod
+    def of(cls, worksheet):
+        # read-only worksheets may state wrong dimensions, all rows are read
+        if hasattr(worksheet, "reset_dimensions"):
+            worksheet.reset_dimensions()
+        return cls(worksheet.title, list(worksheet.iter_rows(values_only=True)))
+
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=False):
+        if not values_only:
+            raise TypeError(f"{type(self).__name__} '{self.title}' holds values only (values_only=True)")
+
+        rows = self.rows[(min_row or 1) - 1 : max_row]
+        if min_col is None and max_col is None:
+            return iter(rows)
+        return (row[(min_col or 1) - 1 : max_col] for row in rows)
+
+    def iter_cols(self, min_col=None, max_col=None, min_row=None, max_row=None, values_only=False):
+        if not values_only:
+            raise TypeError(f"{type(self).__name__} '{self.title}' holds values only (values_only=True)")
+
+        rows = self.rows[(min_row or 1) - 1 : max_row]
+        return (tuple(row[col] for row in rows) for col in range((min_col or 1) - 1, max_col or self.max_column))
+
+    def row_values(self, row):
+        return self.rows[row - 1] if 0 < row <= self.max_row else ()
+
+    def value(self, coordinate):
+        # value of a cell given as "B12", None outside of the sheet
+        row, column = coordinate_to_tuple(coordinate)
+        if row > self.max_row or column > self.max_column:
+            return None
+        return self.rows[row - 1][column - 1]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.title!r}, rows={self.max_row}, columns={self.max_column})"
+
+
+_header_indices = weakref.WeakKeyDictionary()
+
+
+def header_index(worksheet, case_sensitive=False, non_exact_supplier_search=False, strip=True):
+    """
+    Returns the HeaderIndex of the worksheet, built once per worksheet and normalization mode
+    """
+    worksheet_indices = _header_indices.setdefault(worksheet, {})
+    mode = (case_sensitive, non_exact_supplier_search, strip)
+
+    if mode not in worksheet_indices:
+        worksheet_indices[mode] = HeaderIndex(worksheet, case_sensitive, non_exact_supplier_search, strip)
+
+    return worksheet_indices[mode]
+
+
+def clear_header_index(worksheet):
+    """
+    Drops the cached header index, necessary only if the worksheet was changed after the first lookup
+    """
+    _header_indices.pop(worksheet, None)
+
+
+def normalize_cell_text(value, case_sensitive=False, non_exact_supplier_search=False, strip=True):
+    if strip:
+        value = value.strip()
+    if not case_sensitive:
+        value = value.lower()
+    if non_exact_supplier_search:
+        value = clean_str_for_supplier(value)
+    return value
+
+
 def cell_adjacent_to_keyword(
     worksheet, keywords, orientation="right", case_sensitive=False
 ):
@@ -24,6 +249,7 @@ def cell_adjacent_to_keyword(
     Note:
     - Logs an error if none of the keywords are found in the worksheet.
     - Keeps all log, debug, and error messages consistent with the original function.
+    - Keywords are looked up in the worksheet's header index (see HeaderIndex).
     """
 
     if orientation not in ["right", "left", "up", "down"]:
@@ -41,29 +267,31 @@ def cell_adjacent_to_keyword(
     return_val = None
     matched_keyword = None
 
-    for row in worksheet.iter_rows():
-        for cell in row:
-            if isinstance(cell.value, str):
-                c_value = cell.value.lower() if not case_sensitive else cell.value
-            else:
-                c_value = cell.value
-            if c_value in keywords:
-                matched_keyword = cell.value if case_sensitive else c_value
-                if orientation == "right":
-                    return_val = cell.offset(row=0, column=1).value
-                elif orientation == "left":
-                    if cell.column == 1:
-                        raise ValueError(
-                            "Cannot get cell to the left of the first cell in a row"
-                        )
-                    return_val = cell.offset(row=0, column=-1).value
-                elif orientation == "up":
-                    if cell.row == 1:
-                        raise ValueError("Cannot get cell above the first row")
-                    return_val = cell.offset(row=-1, column=0).value
-                elif orientation == "down":
-                    return_val = cell.offset(row=1, column=0).value
-                break  # Stop searching after finding the first match
+    # cell values are compared unstripped here
+    sheet_index = header_index(worksheet, case_sensitive=case_sensitive, strip=False)
+
+    # only the first match within a row is considered, rows are scanned until an adjacent value is found
+    checked_row = None
+    for (row, column), matched_keyword in sheet_index.iter_positions(keywords):
+        if row == checked_row:
+            continue
+        checked_row = row
+
+        # worksheet.cell instead of cell.offset, read-only cells have no offset
+        if orientation == "right":
+            return_val = worksheet.cell(row=row, column=column + 1).value
+        elif orientation == "left":
+            if column == 1:
+                raise ValueError(
+                    "Cannot get cell to the left of the first cell in a row"
+                )
+            return_val = worksheet.cell(row=row, column=column - 1).value
+        elif orientation == "up":
+            if row == 1:
+                raise ValueError("Cannot get cell above the first row")
+            return_val = worksheet.cell(row=row - 1, column=column).value
+        elif orientation == "down":
+            return_val = worksheet.cell(row=row + 1, column=column).value
         if return_val is not None:
             break
 
@@ -75,7 +303,7 @@ def cell_adjacent_to_keyword(
         return ""
     else:
         Log.debug(
-            f"Found cell adjacent to keyword '{matched_keyword}' in worksheet {worksheet.title}: '<yellow>{return_val}</r>'",
+            lambda: f"Found cell adjacent to keyword '{matched_keyword}' in worksheet {worksheet.title}: '<yellow>{return_val}</r>'",
             key="xlsx_access",
         )
         return return_val
@@ -98,6 +326,8 @@ def keyword_index(
     Multiple keywords possible, will return the first found keyword information.
     Returns None if the keyword is not found in the worksheet or throws error if no keyword found and
     query marked as keyword required.
+
+    Lookups go through the worksheet's header index (see HeaderIndex), which is built on the first call.
     """
 
     if type(keywords) is str:
@@ -109,76 +339,30 @@ def keyword_index(
             title="Invalid keyword_index arguments",
         )
 
+    if fixed_row is not None and type(fixed_row) is str:
+        fixed_row = int(fixed_row)
+
+    if fixed_column is not None and type(fixed_column) is str:
+        fixed_column = column_index_from_string(fixed_column)
+
+    # the search without fixed row or column compares the cleaned keyword with uncleaned cell values
+    sheet_index = header_index(
+        worksheet,
+        case_sensitive=case_sensitive,
+        non_exact_supplier_search=non_exact_supplier_search and (fixed_row is not None or fixed_column is not None),
+    )
+
     for index, keyword in enumerate(keywords):
         if not case_sensitive:
             keyword = keyword.lower()
         if non_exact_supplier_search:
             keyword = clean_str_for_supplier(keyword)
 
-        keyword_ends_with_dots = keyword.endswith("...")
+        position = sheet_index.find(keyword, fixed_row=fixed_row, fixed_column=fixed_column)
 
-        if fixed_row is not None:
-            if type(fixed_row) is str:
-                fixed_row = int(fixed_row)
-            for cell in worksheet[fixed_row]:
-                value = cell.value.strip() if type(cell.value) is str else cell.value
-                if value is None:
-                    continue
-
-                value = (
-                    value.lower()
-                    if type(value) is str and not case_sensitive
-                    else value
-                )
-
-                if non_exact_supplier_search:
-                    value = clean_str_for_supplier(value)
-
-                if (
-                    keyword_ends_with_dots
-                    and isinstance(value, str)
-                    and value.startswith(keyword[:-3])
-                ) or value == keyword:
-                    return get_column_letter(cell.column) + str(cell.row)
-        elif fixed_column is not None:
-            for cell in worksheet[fixed_column]:
-                value = cell.value.strip() if type(cell.value) is str else cell.value
-                if value is None:
-                    continue
-
-                value = (
-                    value.lower()
-                    if type(value) is str and not case_sensitive
-                    else value
-                )
-
-                if non_exact_supplier_search:
-                    value = clean_str_for_supplier(value)
-
-                if (
-                    keyword_ends_with_dots
-                    and isinstance(value, str)
-                    and value.startswith(keyword[:-3])
-                ) or value == keyword:
-                    return get_column_letter(cell.column) + str(cell.row)
-
-        else:
-            for row in worksheet.iter_rows():
-                for cell in row:
-                    value = (
-                        cell.value.strip() if type(cell.value) is str else cell.value
-                    )
-                    value = (
-                        value.lower()
-                        if type(value) is str and not case_sensitive
-                        else value
-                    )
-                    if (
-                        keyword_ends_with_dots
-                        and isinstance(value, str)
-                        and value.startswith(keyword[:-3])
-                    ) or value == keyword:
-                        return get_column_letter(cell.column) + str(cell.row)
+        if position is not None:
+            row, column = position
+            return get_column_letter(column) + str(row)
 
         if required and index == len(keywords) - 1:
             Log.error(
@@ -187,12 +371,30 @@ def keyword_index(
             )
 
         Log.debug(
-            f"[keyword_index] Keywordlist '{keywords}' not found in worksheet {worksheet.title} (required=False)",
+            lambda: f"[keyword_index] Keywordlist '{keywords}' not found in worksheet {worksheet.title} (required=False)",
             key="load_default",
         )
     return None
 
 
+def keyword_index_scan(worksheet, keyword, case_sensitive=False):
+    """
+    keyword_index for a single keyword without fixed row or column, that reads the rows only up to the first match
+    instead of indexing the whole sheet (large read-only sheets with the header at the top).
+    Prefix keywords ("...") and keywords not found are passed to keyword_index.
+    """
+    if not case_sensitive:
+        keyword = keyword.lower()
+
+    if not keyword.endswith("..."):
+        for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            for col_idx, value in enumerate(row, start=1):
+                if type(value) is str and normalize_cell_text(value, case_sensitive) == keyword:
+                    return get_column_letter(col_idx) + str(row_idx)
+
+    return keyword_index(worksheet, keyword, case_sensitive=case_sensitive)
+
+
 def load_table_to_dict(worksheet, head_column, columns, orientation="vertical"):
     """
     Given a head column and columns, loads a table into a list of dictionaries (rows).
@@ -245,11 +447,11 @@ def load_table_to_dict(worksheet, head_column, columns, orientation="vertical"):
 
         empty_row_count = 0
 
-        for row in worksheet.iter_rows(min_row=head_index_row + 1):
+        for row in worksheet.iter_rows(min_row=head_index_row + 1, values_only=True):
             entry = {}
             for column_name, column_index in column_indices.items():
                 col_index_int = column_index_from_string(column_index) - 1
-                value = row[col_index_int].value
+                value = row[col_index_int] if col_index_int < len(row) else None
                 if column_name == head_column and (value is None or str(value).strip() == ""):
                     entry = {}
                     break
@@ -279,14 +481,14 @@ def load_table_to_dict(worksheet, head_column, columns, orientation="vertical"):
                 )
 
         for col in worksheet.iter_cols(
-            min_col=column_index_from_string(head_index_col) + 1
+            min_col=column_index_from_string(head_index_col) + 1, values_only=True
         ):
             entry = {}
-            head_cell = col[head_index_row - 1]
-            if head_cell.value is None:
+            head_value = col[head_index_row - 1]
+            if head_value is None:
                 continue  # Skip columns with empty head cell
             for row_name, row_number in row_indices.items():
-                value = col[row_number - 1].value
+                value = col[row_number - 1]
                 if row_name == head_column and value is None:
                     entry = {}
                     break
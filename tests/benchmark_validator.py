@@ -0,0 +1,54 @@
+"""
+Benchmark: per-value process_and_validate vs. process_and_validate_column on 10k-row columns
+
+run with: python -m tests.benchmark_validator
+"""
+
+import random
+import time
+
+from src.validator import process_and_validate, process_and_validate_column
+
+NUM_ROWS = 10_000
+
+
+def make_columns():
+    random.seed(0)
+
+    units = [random.choice(["kg", "t", "Tonnen"]) for _ in range(NUM_ROWS)]
+
+    columns = {
+        "cn_code_m": [random.choice(["72081000", 72082500, " 73181500 "]) for _ in range(NUM_ROWS)],
+        "net_mass_m": [random.choice([12.5, 1000, 3.75]) for _ in range(NUM_ROWS)],
+        "float": [random.choice(["1 250,5", "3.75", 12.5]) for _ in range(NUM_ROWS)],
+        "eori_m": [random.choice(["DE1234567", "DE 123 4567", "DE123456789012345"]) for _ in range(NUM_ROWS)],
+        "date_str8_o": [random.choice(["20240101", "2024-03-31 00:00:00", ""]) for _ in range(NUM_ROWS)],
+        "boolean_o": [random.choice(["ja", "Nein", "yes", ""]) for _ in range(NUM_ROWS)],
+    }
+
+    return columns, units
+
+
+def run_benchmark():
+    columns, units = make_columns()
+
+    print(f"{'type':<14} {'per value':>12} {'column':>12} {'speedup':>9}")
+
+    for val_type, values in columns.items():
+        entries = [{"net_mass_unit": unit} for unit in units]
+
+        start = time.perf_counter()
+        expected = [process_and_validate(val_type, value, entry_data=entry) for value, entry in zip(values, entries)]
+        per_value_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cleaned_values, valid_ls = process_and_validate_column(val_type, values, entry_data_ls=entries)
+        column_time = time.perf_counter() - start
+
+        assert list(zip(cleaned_values, valid_ls)) == expected
+
+        print(f"{val_type:<14} {per_value_time:>11.3f}s {column_time:>11.3f}s {per_value_time / column_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
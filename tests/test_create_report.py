@@ -50,3 +50,29 @@ def pretty_format_xml(element_tree):
     # Entfernen der automatisch hinzugefügten Deklaration
     declaration_removed = "\n".join(pretty_xml.split("\n")[1:])
     return declaration_removed
+
+
+def test_document_store(tmp_path):
+    import base64
+    import zipfile
+    from src.document_store import DocumentStore
+
+    data = b"%PDF-1.4 supporting document" * 1000
+    (tmp_path / "doc.pdf").write_bytes(data)
+    (tmp_path / "copy.pdf").write_bytes(data)
+
+    store = DocumentStore()
+    assert store.base64(tmp_path / "doc.pdf") == base64.b64encode(data).decode("utf-8")
+    assert store.base64(tmp_path / "copy.pdf") is store.base64(tmp_path / "doc.pdf")
+    assert len(store) == 1
+
+    # zip entries are the same as written by zipfile
+    for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with zipfile.ZipFile(tmp_path / "a.zip", "w", compression=compression, compresslevel=9) as zipf:
+            for i in range(3):
+                zipf.write(tmp_path / "doc.pdf", f"doc_{i}.pdf")
+        with zipfile.ZipFile(tmp_path / "b.zip", "w", compression=compression, compresslevel=9) as zipf:
+            for i in range(3):
+                store.write_to_zip(zipf, tmp_path / "doc.pdf", f"doc_{i}.pdf")
+
+        assert (tmp_path / "a.zip").read_bytes() == (tmp_path / "b.zip").read_bytes()
@@ -0,0 +1,33 @@
+from src.fixed_point import to_fixed, round_div, rescale, mul_fixed, div_fixed, format_fixed
+
+
+def test_to_fixed():
+    assert to_fixed(0.0205, 9) == 20_500_000
+    assert to_fixed(2.951, 7) == 29_510_000
+    assert to_fixed(None, 6) is None
+    # half even, like round()
+    assert to_fixed(0.5, 0) == 0 and to_fixed(1.5, 0) == 2
+    assert to_fixed(0.1 + 0.2, 6) == 300_000
+
+
+def test_fixed_arithmetic():
+    assert round_div(25, 10) == 2 and round_div(35, 10) == 4 and round_div(-26, 10) == -3
+    assert rescale(1_234_567_891, 9, 6) == 1_234_568
+    assert rescale(12, 2, 4) == 1200
+
+    # 10.5 t * 2.951 tCO2e/t
+    assert mul_fixed(10_500_000, 6, 29_510_000, 7, 6) == 30_985_500
+    # 30.9855 tCO2e / 10.5 t
+    assert div_fixed(30_985_500, 6, 10_500_000_000, 9, 6) == 2_951_000
+
+    # sums of fixed point values are exact
+    assert sum([to_fixed(0.1, 9)] * 10) == to_fixed(1.0, 9)
+
+
+def test_format_fixed():
+    assert format_fixed(30_985_500, 6) == "30.985500"
+    assert format_fixed(20_500_000, 9, 6) == "0.020500"
+    assert format_fixed(29_510_000, 7, trim=True) == "2.951"
+    assert format_fixed(0, 7, trim=True) == "0.0"
+    assert format_fixed(-1_500, 3) == "-1.500"
+    assert format_fixed(None, 6) is None
@@ -47,3 +47,189 @@ def test_installation_data(monkeypatch):
 
     # pprint(installation_data)
     # print(f":::{installation_data}")
+
+
+def test_consultation_overview(tmp_path):
+    import os
+    import zipfile
+    import openpyxl
+    from src.consultation_overview import get_consultation_overview
+    from src.installation_data import get_overview_data
+
+    path = str(tmp_path / "consultation_overview.xlsx")
+
+    def save(status):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "1 - Customer List"
+        ws.append([])
+        ws.append([])
+        ws.append(["Nr", "Alias", "Real Name"])
+        ws.append([1, "ACME", "Acme Steel GmbH"])
+        sheet = wb.create_sheet("ACME")
+        sheet.append(["Installation", "Operator", "Communication Status - Q2 - 2025", "Date of last update"])
+        sheet.append(["Plant A", "Op One", status, None])
+        sheet.append(["Plant B", "Op Two", "S2", None])
+        wb.save(path)
+
+        # stale stored dimension of the importer sheet, the rows below are read anyway
+        with zipfile.ZipFile(path) as zf:
+            members = {name: zf.read(name) for name in zf.namelist()}
+        assert b'<dimension ref="A1:D3"' in members["xl/worksheets/sheet2.xml"]
+        members["xl/worksheets/sheet2.xml"] = members["xl/worksheets/sheet2.xml"].replace(b'<dimension ref="A1:D3"', b'<dimension ref="A1:B1"')
+        with zipfile.ZipFile(path, "w") as zf:
+            for name, data in members.items():
+                zf.writestr(name, data)
+
+    save("S1")
+    overview = get_consultation_overview(path)
+    assert get_consultation_overview(path) is overview
+    assert overview.resolve_alias("acme steel") == "ACME"
+    assert overview.importer_sheet("acme")[0].title == "ACME"
+
+    config = {"supplier_workflow": {"consultation_overview_file": path}}
+    prepared_data = {"general_info": {"importer_name": "Acme Steel GmbH", "year": 2025, "quarter": 2}}
+
+    data = get_overview_data(config, prepared_data)
+    assert [(row["installation"], row["communication status"]) for row in data] == [("Plant A", "S1"), ("Plant B", "S2")]
+
+    # rows are copies, the file is read again after it changed
+    data[0]["communication status"] = "changed"
+    assert get_overview_data(config, prepared_data)[0]["communication status"] == "S1"
+
+    save("S3")
+    os.utime(path, ns=(0, 10**18))
+    assert get_overview_data(config, prepared_data)[0]["communication status"] == "S3"
+
+
+def save_supplier_tool(path, operator, cn_code, emission_factor, indirect_type_of_determination="01"):
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Output"
+    ws.append(["Reporting Period Start", "2024-01-01"])
+    ws.append(["Operator name", operator])
+    ws.append([])
+    ws.append(
+        [
+            "ProPro Name",
+            "CN-Code",
+            "Direct Emissions: Type of Determination",
+            "Direct Emissions: Additional Information",
+            "Direct Emissions: Specific Direct Embedded Emissions",
+            "Indirect Emissions: Type of determination",
+            "Indirect Emissions: Source of emission factor",
+            "Indirect Emissions: Electricity consumed [MWh/t]",
+            "Indirect Emissions: Emission factor",
+            "Indirect Emissions: Source of emissions factor value",
+        ]
+    )
+    ws.append(["Rolling", cn_code, "01", "info", 1.5, indirect_type_of_determination, "02", 0.5, emission_factor, "grid"])
+    wb.save(path)
+
+
+def test_supplier_tools(tmp_path, monkeypatch):
+    import os
+    from src.diagnostics import DiagnosticsReport
+    from src.load_supplier_tool import read_supplier_tools, load_supplier_tool
+    from src.installation_data import read_installation_supplier_tools
+
+    monkeypatch.setattr(helper, "CACHE_DIR", tmp_path / ".cache")
+
+    supplier_data_dir = tmp_path / "supplier_data"
+    installations = []
+    for i in range(5):
+        installation_folder = supplier_data_dir / "Acme Steel GmbH" / f"Plant {i}"
+        os.makedirs(installation_folder)
+        # Plant 4 has no supplier tool
+        if i < 4:
+            save_supplier_tool(str(installation_folder / f"Supplier_{i}.xlsx"), f"Op {i}", f"7208{i}000", 0.25 * i)
+        installations.append((f"Plant {i} (Op {i})", {"installation": f"Plant {i}"}))
+
+    config = {"supplier_workflow": {"supplier_data_dir": str(supplier_data_dir), "supplier_tool_pattern": "Supplier_*.xlsx"}}
+    prepared_data = {"general_info": {"importer_name": "Acme Steel GmbH"}}
+
+    report = DiagnosticsReport("supplier tools")
+    supplier_tools = read_installation_supplier_tools(installations, prepared_data, config, report)
+
+    # the missing supplier tool is recorded, the others are read
+    assert list(supplier_tools) == [f"Plant {i} (Op {i})" for i in range(4)]
+    assert [(d.table, d.rule) for d in report.errors] == [("Plant 4 (Op 4)", "supplier tool file")]
+
+    # the same values in process and in the process pool
+    paths = [str(supplier_data_dir / "Acme Steel GmbH" / f"Plant {i}" / f"Supplier_{i}.xlsx") for i in range(4)]
+    in_process = read_supplier_tools(paths, max_workers=1)
+    in_pool = read_supplier_tools(paths + [str(tmp_path / "missing.xlsx")], max_workers=2)
+    assert [in_pool[path][0].rows for path in paths] == [in_process[path][0].rows for path in paths]
+    assert in_pool[str(tmp_path / "missing.xlsx")][0] is None
+
+    for i, (installation_operator, installation_entry) in enumerate(installations[:4]):
+        supplier_tool_path, output_sheet = supplier_tools[installation_operator]
+        load_supplier_tool(installation_entry, prepared_data, config, supplier_tool_path=supplier_tool_path, output_sheet=output_sheet)
+        emission_data = installation_entry["emission_data"]
+        assert emission_data["general_info"][0]["Operator name"] == f"Op {i}"
+        assert emission_data[f"7208{i}000"]["indirect_emissions"]["see"] == 0.125 * i
+        assert emission_data[f"7208{i}000"]["direct_emissions"]["see"] == 1.5
+
+
+    # parsed supplier tools are cached, they are not read again
+    report = DiagnosticsReport("supplier tools")
+    supplier_tools = read_installation_supplier_tools(installations[:4], prepared_data, config, report)
+    assert [output_sheet for _, output_sheet in supplier_tools.values()] == [None] * 4
+
+
+def test_supplier_tool_cache(tmp_path, monkeypatch):
+    import os
+    import shutil
+    import src.load_supplier_tool as load_supplier_tool_module
+    from src.load_supplier_tool import load_supplier_tool, warm_supplier_tool_cache
+
+    monkeypatch.setattr(helper, "CACHE_DIR", tmp_path / ".cache")
+
+    supplier_data_dir = tmp_path / "supplier_data"
+    for importer in ["Acme Steel GmbH", "Beta Metals AG"]:
+        os.makedirs(supplier_data_dir / importer / "Plant A")
+    # type of determination 02 is overwritten with a warning
+    save_supplier_tool(str(supplier_data_dir / "Acme Steel GmbH" / "Plant A" / "Supplier_A.xlsx"), "Op A", "72081000", 0.5, "02")
+    shutil.copyfile(supplier_data_dir / "Acme Steel GmbH" / "Plant A" / "Supplier_A.xlsx", supplier_data_dir / "Beta Metals AG" / "Plant A" / "Supplier_A.xlsx")
+    os.makedirs(supplier_data_dir / "Acme Steel GmbH" / "Plant B")
+    with open(supplier_data_dir / "Acme Steel GmbH" / "Plant B" / "Supplier_B.xlsx", "w") as f:
+        f.write("no workbook")
+
+    config = {"supplier_workflow": {"supplier_data_dir": str(supplier_data_dir), "supplier_tool_pattern": "Supplier_*.xlsx"}}
+    prepared_data = {"general_info": {"importer_name": "Acme Steel GmbH"}}
+
+    results = warm_supplier_tool_cache(config, max_workers=1)
+    assert [(os.path.relpath(path, supplier_data_dir), status) for path, (status, _) in results.items()] == [
+        (os.path.join("Acme Steel GmbH", "Plant A", "Supplier_A.xlsx"), "parsed"),
+        (os.path.join("Acme Steel GmbH", "Plant B", "Supplier_B.xlsx"), "failed"),
+        # same content as the first supplier tool
+        (os.path.join("Beta Metals AG", "Plant A", "Supplier_A.xlsx"), "cached"),
+    ]
+
+    # cached supplier tools are not read, the warnings of parsing are replayed
+    def read_supplier_tool(supplier_tool_path):
+        raise AssertionError("cached supplier tool read")
+
+    monkeypatch.setattr(load_supplier_tool_module, "read_supplier_tool", read_supplier_tool)
+
+    installation_entry = {"installation": "Plant A"}
+    recorded_warnings = []
+    with Log.recording_warnings(recorded_warnings):
+        load_supplier_tool(installation_entry, prepared_data, config)
+
+    assert installation_entry["emission_data"]["72081000"]["indirect_emissions"]["type_of_determination"] == "01"
+    assert [kwargs["title"] for _, kwargs in recorded_warnings if kwargs["title"].startswith("supplier_tool")] == ["supplier_tool | type of determination 02"]
+
+    # a changed supplier tool is parsed again
+    monkeypatch.undo()
+    monkeypatch.setattr(helper, "CACHE_DIR", tmp_path / ".cache")
+    supplier_tool_path = str(supplier_data_dir / "Acme Steel GmbH" / "Plant A" / "Supplier_A.xlsx")
+    save_supplier_tool(supplier_tool_path, "Op A", "72081000", 0.5, "01")
+    os.utime(supplier_tool_path, ns=(0, 10**18))
+
+    installation_entry = {"installation": "Plant A"}
+    load_supplier_tool(installation_entry, prepared_data, config, supplier_tool_path=supplier_tool_path)
+    assert installation_entry["emission_data"]["72081000"]["indirect_emissions"]["type_of_determination"] == "01"
+    assert warm_supplier_tool_cache(config, max_workers=1)[supplier_tool_path] == ("cached", None)
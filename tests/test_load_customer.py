@@ -1,7 +1,11 @@
-from src.load_customer import process_input_file
+from src.load_customer import process_input_file, validate_input_file, load_version_layouts, inheret_version
+from src.layout_plan import load_layout_plans, clear_layout_plans, ResolvedTable
+from src.table_extractor import get_table_extractor
+from src.diagnostics import DiagnosticsReport, collecting
 import src.helper as helper
 from src.default_data import DefaultData
 from src.workflow import load_input_files
+from concurrent.futures import ThreadPoolExecutor
 import pprint
 
 
@@ -20,3 +24,224 @@ def test_load_customer():
     raw_data = process_input_file(config["input_file"], config["version_layouts_file"])
 
     pprint.pprint(raw_data)
+
+
+def test_load_customer_streaming():
+    config_file = "config/config.yml"
+    config = helper.load_config(config_file=config_file)
+
+    DefaultData.initialize(config)
+
+    input_files, _ = load_input_files(config)
+
+    raw_data = process_input_file(input_files[0], config["version_layouts_file"])
+    raw_data_streaming = process_input_file(input_files[0], config["version_layouts_file"], streaming=True)
+
+    assert raw_data_streaming == raw_data
+
+
+def test_layout_plans():
+    config_file = "config/config.yml"
+    config = helper.load_config(config_file=config_file)
+
+    layout_plans = load_layout_plans(config["version_layouts_file"])
+    assert load_layout_plans(config["version_layouts_file"]) is layout_plans
+
+    # compiled from the disk cache
+    clear_layout_plans()
+    layout_plans_cached = load_layout_plans(config["version_layouts_file"])
+
+    for version in ["version_1_7", "version_1_7_2", "version_1_8"]:
+        layout_dict = inheret_version(load_version_layouts(config["version_layouts_file"]), version)
+
+        assert layout_plans[version].as_dict() == layout_dict
+        assert layout_plans_cached[version].as_dict() == layout_dict
+
+
+def test_header_index_scans_rows_as_needed():
+    from src.xlsx_access import ValueSheet, HeaderIndex, keyword_index, header_index
+
+    rows = [("Name", "Land", None), (None, "Masse", "Menge...")] + [(f"Op {i}", "DE", i) for i in range(1000)] + [("Summe", None, None)]
+    ws = ValueSheet("Ihre_Hersteller_Liste", rows)
+
+    assert keyword_index(ws, "land") == "B1"
+    assert keyword_index(ws, "masse", fixed_row=2) == "B2"
+    assert keyword_index(ws, "menge...", fixed_column="C") == "C2"
+    assert header_index(ws).scanned_rows == HeaderIndex.BAND_ROWS
+
+    # keywords further down or missing scan on
+    assert keyword_index(ws, "summe") == "A1003"
+    assert keyword_index(ws, "gewicht") is None
+    assert header_index(ws).complete
+
+
+def test_header_index_releases_worksheet(tmp_path):
+    import gc
+    import weakref
+    import openpyxl
+    from src.xlsx_access import keyword_index, header_index, _header_indices
+
+    path = str(tmp_path / "operators.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Name", "Land"])
+    for i in range(1000):
+        ws.append([f"Op {i}", "DE"])
+    wb.save(path)
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    ws = wb.active
+    num_indices = len(_header_indices)
+    assert keyword_index(ws, "land") == "B1"
+    assert not header_index(ws).complete
+    assert ws in _header_indices
+
+    # a partly scanned worksheet is not kept alive by its cached index
+    worksheet_ref = weakref.ref(ws)
+    wb.close()
+    del wb, ws
+    gc.collect()
+
+    assert worksheet_ref() is None
+    assert len(_header_indices) == num_indices
+
+
+def test_read_only_stale_dimension(tmp_path):
+    import zipfile
+    import openpyxl
+    from src.load_customer import load_customer_workbook, read_table_band
+
+    path = str(tmp_path / "stale.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Name", "Masse"])
+    for i in range(20):
+        ws.append([f"Op {i}", i])
+    wb.save(path)
+
+    # the stored dimension covers only the first rows
+    with zipfile.ZipFile(path) as zf:
+        members = {name: zf.read(name) for name in zf.namelist()}
+    assert b'<dimension ref="A1:B21"' in members["xl/worksheets/sheet1.xml"]
+    members["xl/worksheets/sheet1.xml"] = members["xl/worksheets/sheet1.xml"].replace(b'<dimension ref="A1:B21"', b'<dimension ref="A1:B5"')
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+    ws = load_customer_workbook(path, read_only=True).active
+    entry_values_ls, _ = read_table_band(ws, "vertical", "1", "A", [1, 2], 1)
+    assert [values[0] for values in entry_values_ls] == [f"Op {i}" for i in range(20)]
+
+
+def test_table_extractor():
+    fields = [
+        {"code_field_name": "operator_name", "alias_field_name": "name", "type": "string_m"},
+        {"code_field_name": "remarks", "alias_field_name": "anmerkungen", "type": "string_o"},
+    ]
+    resolved_table = ResolvedTable("Ihre_Hersteller_Liste", "operator_list", "vertical", "3", "A", "B", fields, ["B", "D"], [], 1, None, False, 50)
+
+    extract = get_table_extractor(resolved_table)
+    assert get_table_extractor(resolved_table) is extract
+
+    raw_data_table = []
+    num_entries = extract([("Op One", None, "remark"), (None, None, None), ("Op Two", None, None)], raw_data_table)
+
+    assert num_entries == 2
+    assert raw_data_table == [
+        {"operator_name": "Op One", "remarks": "remark", "pk_index": "B4"},
+        {"operator_name": "Op Two", "remarks": "", "pk_index": "B6"},
+    ]
+
+
+def test_table_extractor_collect():
+    fields = [
+        {"code_field_name": "operator_name", "alias_field_name": "name", "type": "string_m"},
+        {"code_field_name": "cn_code", "alias_field_name": "cn-code", "type": "cn_code_m"},
+    ]
+    resolved_table = ResolvedTable("Ihre_CN_Code_Liste", "cn_codes", "vertical", "3", "A", "B", fields, ["B", "C"], [], 1, None, False, 50)
+
+    extract = get_table_extractor(resolved_table)
+
+    # all problems are collected instead of exiting at the first one
+    report = DiagnosticsReport()
+    with collecting(report):
+        extract([("Op One", "1234"), ("Op Two", None), ("Op Three", "72081000")], [])
+
+    assert sorted((d.field, d.cell, d.rule, d.value) for d in report.diagnostics) == [
+        ("cn_code", "C4", "cn_code_m", "1234"),
+        ("cn_code", "C5", "cn_code_m", ""),
+    ]
+    assert report.has_errors
+
+
+def test_table_extractor_optional_alias():
+    from src.table_extractor import field_path
+
+    fields = [
+        {"code_field_name": "operator_name", "type": "string_m"},
+        {"code_field_name": "cn_code", "alias_field_name": ["cn-code", "kn-code"], "type": "cn_code_m"},
+    ]
+    resolved_table = ResolvedTable("Ihre_CN_Code_Liste", "cn_codes", "vertical", "3", "A", "B", fields, ["B", "C"], [], 1, None, False, 50)
+
+    # fields without alias_field_name are looked up by their code_field_name (see load_customer_sheet)
+    extract = get_table_extractor(resolved_table)
+
+    report = DiagnosticsReport()
+    with collecting(report):
+        extract([("Op One", "1234")], [])
+
+    assert [(d.field, d.cell) for d in report.diagnostics] == [("cn_code", "C4")]
+    assert field_path(fields[0]) == "operator_name/operator_name"
+    assert field_path(fields[1]) == "cn_code/cn-code | kn-code"
+
+
+def test_validate_input_file():
+    config_file = "config/config.yml"
+    config = helper.load_config(config_file=config_file)
+
+    DefaultData.initialize(config)
+
+    input_files, _ = load_input_files(config)
+
+    raw_data, report = validate_input_file(input_files[0], config["version_layouts_file"])
+    report.print_table()
+
+    if not report.has_errors:
+        assert raw_data == process_input_file(input_files[0], config["version_layouts_file"])
+
+
+def test_validate_invalid_version(tmp_path):
+    import openpyxl
+
+    path = str(tmp_path / "invalid_version.xlsx")
+    wb = openpyxl.Workbook()
+    wb.active.title = "Specification"
+    wb.active.append(["Version", "1.x"])
+    wb.save(path)
+
+    # recorded as file level problem instead of raised
+    raw_data, report = validate_input_file(path, "resources/version_layouts.yml")
+
+    assert raw_data is None
+    assert [(d.rule, d.message) for d in report.errors] == [("file", "ValueError: Invalid version '1.x' in sheet 'Specification'")]
+
+
+def test_load_customer_shared_layout():
+    config_file = "config/config.yml"
+    config = helper.load_config(config_file=config_file)
+
+    DefaultData.initialize(config)
+
+    input_files, _ = load_input_files(config)
+
+    layout_plans = load_layout_plans(config["version_layouts_file"])
+    layouts_before = {version: plan.as_dict() for version, plan in layout_plans.items()}
+
+    raw_data_ls = [process_input_file(input_file, config["version_layouts_file"]) for input_file in input_files]
+
+    # one shared layout plan, several files in parallel threads
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        raw_data_parallel_ls = list(executor.map(lambda f: process_input_file(f, config["version_layouts_file"]), input_files))
+
+    assert raw_data_parallel_ls == raw_data_ls
+    assert {version: plan.as_dict() for version, plan in layout_plans.items()} == layouts_before
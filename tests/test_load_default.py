@@ -1,5 +1,7 @@
 from src.default_data import DefaultData
 from pprint import pprint
+import numpy as np
+import pytest
 from src.helper import load_config
 
 
@@ -8,8 +10,128 @@ def test_load_default():
     config = load_config(config_file=config_file)
 
     DefaultData.initialize(config)
-    default_data = DefaultData.data_dict
+    default_data = DefaultData.load_all()
 
     pprint(default_data)
 
     pprint(DefaultData.get("report_default_values"))
+
+
+def test_country_db():
+    from src.default_data import CountryDB
+
+    country_db = CountryDB()
+    country_db.add_country("Turkey", "Türkei", ["Türkiye"], "TR")
+    country_db.add_country("Cote d'Ivoire", "Elfenbeinküste", [None], "CI")
+
+    assert country_db.find_country("turkey")["un_code"] == "TR"
+    assert country_db.find_country("TR")["un_code"] == "TR"
+    assert country_db.find_country(" Turkiye ")["un_code"] == "TR"
+    assert country_db.find_country("Côte d'Ivoire")["un_code"] == "CI"
+    assert country_db.find_country("Atlantis") is None
+
+    assert [info and info["un_code"] for info in country_db.find_countries(["TÜRKEI", "ci", "Atlantis"])] == ["TR", "CI", None]
+
+
+def test_cn_default_table():
+    from src.default_data import CnDefaultTable
+
+    def entry(cn_code, see_direct, see_indirect):
+        return {
+            "cn_code": cn_code,
+            "see_direct": see_direct,
+            "see_indirect": see_indirect,
+            "description_of_goods": "Iron or non-alloy steel",
+            "PM1": "BF/BOF",
+            "PM2": None,
+            "PM3": None,
+        }
+
+    cn_code_data = {cn_code: entry(cn_code, direct, indirect) for cn_code, direct, indirect in [("72081000", 1.5, 0.25), ("72071111", 2.0, 0.5), ("76011000", 8.25, 0.0)]}
+    table = CnDefaultTable(cn_code_data)
+
+    assert table["72081000"] == cn_code_data["72081000"]
+    assert table.as_dict() == cn_code_data
+    assert "72089000" not in table
+    assert table.value("76011000", "see_direct") == 8.25
+    assert table["72081000"] is table["72081000"]
+
+    # longer keys are not cut down to a cn code of the table
+    assert "7208100099" not in table
+    assert list(table.lookup(["7208100099"])) == [-1]
+    with pytest.raises(KeyError):
+        table["7208100099"]
+
+    assert list(table.lookup(["76011000", "72089000", "72081000"])) == [2, -1, 1]
+    # hs fallback: first cn code of the same 6 digit heading, then 4 digit heading
+    assert list(table.lookup(["72081090", "72079999", "28000000"], hs_fallback=True)) == [1, 0, -1]
+
+    see_direct, see_indirect = table.see(["72081000", "72089000"])
+    assert see_direct[0] == 1.5 and see_indirect[0] == 0.25
+    assert np.isnan(see_direct[1]) and np.isnan(see_indirect[1])
+
+
+def test_default_data_stale_dimension(tmp_path, monkeypatch):
+    import re
+    import zipfile
+    import openpyxl
+    import src.helper as helper
+
+    monkeypatch.setattr(helper, "CACHE_DIR", tmp_path / ".cache")
+
+    path = str(tmp_path / "default_data.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "country_default_values"
+    ws.append(["country_code", "english_name", "german_name", "alias1", "alias2"])
+    for code, english_name, german_name in [("DE", "Germany", "Deutschland"), ("FR", "France", "Frankreich"), ("TR", "Turkey", "Türkei")]:
+        ws.append([code, english_name, german_name, None, None])
+    wb.save(path)
+
+    # stored dimension covering only the first two columns and rows
+    with zipfile.ZipFile(path) as zf:
+        members = {name: zf.read(name) for name in zf.namelist()}
+    members["xl/worksheets/sheet1.xml"] = re.sub(rb'<dimension ref="[^"]*"', b'<dimension ref="A1:B2"', members["xl/worksheets/sheet1.xml"])
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+    monkeypatch.setattr(DefaultData, "default_data_file", path)
+    monkeypatch.setattr(DefaultData, "loaded_hash", helper.file_sha256(path))
+
+    country_db = DefaultData._load_section("country_data")
+    assert [country_db.find_country(query)["un_code"] for query in ["Türkei", "France", "DE"]] == ["TR", "FR", "DE"]
+
+
+def test_default_data_snapshot():
+    config_file = "config/config.yml"
+    config = load_config(config_file=config_file)
+
+    DefaultData.initialize(config)
+    default_data = dict(DefaultData.load_all())
+
+    # loaded from the snapshots of the same file
+    DefaultData.loaded_hash = None
+    DefaultData.initialize(config)
+
+    assert DefaultData.get("cn_code_default_values").as_dict() == default_data["cn_code_default_values"].as_dict()
+    assert DefaultData.get("report_default_values") == default_data["report_default_values"]
+    assert DefaultData.get("options") is config["options"]
+
+
+def test_default_data_sections():
+    config_file = "config/config.yml"
+    config = load_config(config_file=config_file)
+
+    DefaultData.loaded_hash = None
+    DefaultData.initialize(config)
+
+    # sections are loaded on first use only
+    assert list(DefaultData.data_dict) == ["options"]
+
+    country_data = DefaultData.get("country_data")
+    assert list(DefaultData.data_dict) == ["options", "country_data"]
+
+    # kept for the next report with the same file
+    DefaultData.initialize(config)
+    assert DefaultData.get("country_data") is country_data
@@ -0,0 +1,197 @@
+import json
+
+
+class RecordingSink:
+    # keeps the records written by a LogPipeline
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_configure_arguments_take_precedence(monkeypatch):
+    from src.log import Log
+    from src.log_sink import LogPipeline
+
+    # the pipeline of the test session is kept, the replaced one is closed by configure
+    monkeypatch.setattr(Log, "pipeline", LogPipeline([]))
+
+    config = {"logging": {"sink": "terminal", "json_file": None, "asynchronous": False, "warning_limit": None}}
+    Log.configure(config, sink="none", asynchronous=True, warning_limit=20)
+    assert Log.pipeline.sinks == []
+    assert Log.pipeline.asynchronous
+    assert Log.pipeline.aggregator.default_limit == 20
+
+    # settings not given as arguments come from the config
+    Log.configure({"logging": {"sink": "none", "warning_limit": 3}})
+    assert not Log.pipeline.asynchronous
+    assert Log.pipeline.aggregator.default_limit == 3
+
+    Log.close()
+
+
+def test_strip_tags_keeps_caller_names(monkeypatch, tmp_path):
+    from src.log import Log
+    from src.log_sink import LogPipeline, TAG_NAMES, strip_tags
+
+    assert set(Log.color_dict) <= set(TAG_NAMES)
+    assert strip_tags("<b><red>Title</r>  ↤  <i>f: <#6b6b6b><module></r> <lambda>") == "Title  ↤  f: <module> <lambda>"
+
+    monkeypatch.setattr(Log, "pipeline", LogPipeline([]))
+    monkeypatch.setattr(Log, "printed_title", True)
+    monkeypatch.setattr(Log, "sev_warning_count", 0)
+
+    json_file = tmp_path / "log.jsonl"
+    Log.configure(sink="none", json_file=str(json_file), asynchronous=True, warning_limit=1)
+
+    # warnings issued at module level have the caller name <module>
+    for _ in range(3):
+        exec("Log.warning('repeated', title='<b>Repeated</r>')", {"Log": Log})
+    Log.close()
+
+    records = [json.loads(line) for line in json_file.read_text(encoding="utf-8").splitlines()]
+    assert [(record["title"], record["source"]) for record in records] == [("Repeated", "<module>"), ("Suppressed warnings", None)]
+    assert records[1]["message"] == "   2 x  'Repeated'  ↤  f: <module>"
+
+
+def test_debug_rendered_only_if_enabled(monkeypatch):
+    from src.log import Log
+    from src.log_sink import LogPipeline
+
+    sink = RecordingSink()
+    monkeypatch.setattr(Log, "pipeline", LogPipeline([sink]))
+    monkeypatch.setitem(Log.debug_enabled, "all", False)
+    monkeypatch.setitem(Log.debug_enabled, "validator", False)
+
+    class Unformattable:
+        def __format__(self, spec):
+            raise AssertionError("template rendered")
+
+    rendered = []
+    Log.debug(lambda: rendered.append("callable") or "data", key="validator")
+    Log.debug("row {row}", key="validator", row=Unformattable())
+    assert rendered == []
+    assert sink.records == []
+
+    monkeypatch.setitem(Log.debug_enabled, "validator", True)
+    Log.debug(lambda: rendered.append("callable") or "data", key="validator")
+    Log.debug("row {row}", key="validator", row=3)
+    assert rendered == ["callable"]
+    assert [(record.key, record.message) for record in sink.records] == [("validator", "data"), ("validator", "row 3")]
+
+
+def test_warning_rendered_only_if_printed(monkeypatch):
+    from src.log import Log
+    from src.log_sink import LogPipeline
+
+    sink = RecordingSink()
+    monkeypatch.setattr(Log, "pipeline", LogPipeline([sink]))
+    monkeypatch.setattr(Log, "printed_title", True)
+    monkeypatch.setattr(Log, "sev_warning_count", 0)
+
+    rendered = []
+
+    def message():
+        rendered.append("message")
+        return "invalid {field}"
+
+    # muted and suppressed warnings are not rendered
+    monkeypatch.setattr(Log, "muted", True)
+    Log.warning(message, title="Invalid", field="cn_code")
+    monkeypatch.setattr(Log, "muted", False)
+    for _ in range(3):
+        Log.warning(message, title="Invalid", print_max=1, print_id="invalid", field="cn_code")
+    assert rendered == ["message"]
+
+    # the caller is the source of the warning
+    assert [(record.title, record.source, record.message) for record in sink.records] == [("Invalid", "test_warning_rendered_only_if_printed", "invalid cn_code")]
+
+    # recorded warnings are rendered also if muted
+    monkeypatch.setattr(Log, "muted", True)
+    with Log.recording_warnings([]) as recorded:
+        Log.warning(message, title="Invalid", field="country")
+    assert recorded[0][0] == "invalid country"
+    assert recorded[0][1]["source"] == "test_warning_rendered_only_if_printed"
+
+
+def test_warning_limits(monkeypatch):
+    from src.log import Log
+    from src.log_sink import LogPipeline
+
+    sink = RecordingSink()
+    monkeypatch.setattr(Log, "pipeline", LogPipeline([sink], warning_limit=2))
+    monkeypatch.setattr(Log, "printed_title", True)
+    monkeypatch.setattr(Log, "sev_warning_count", 0)
+
+    # print_max per print_id, not summarized
+    for i in range(4):
+        Log.warning(f"row {i}", title="Empty row", print_max=1, print_id="empty_row")
+    # warning_limit per source and title, the rest is summarized on close
+    for i in range(5):
+        Log.warning(f"value {i}", title="Invalid")
+    Log.warning("other", title="Other")
+
+    assert [(record.title, record.message) for record in sink.records] == [
+        ("Empty row", "row 0"),
+        ("Invalid", "value 0"),
+        ("Invalid", "value 1"),
+        ("Other", "other"),
+    ]
+    assert Log.sev_warning_count == 4
+
+    Log.close()
+    assert sink.records[-1].title == "Suppressed warnings"
+    assert sink.records[-1].message == "   3 x  'Invalid'  ↤  f: test_warning_limits"
+
+
+def test_asynchronous_flush():
+    import time
+    import threading
+    from src.log_sink import LogPipeline, LogRecord
+
+    class SlowSink(RecordingSink):
+        def write(self, record):
+            time.sleep(0.001)
+            self.records.append((record.message, threading.current_thread().name))
+
+    sink = SlowSink()
+    pipeline = LogPipeline([sink], asynchronous=True)
+
+    for i in range(50):
+        pipeline.emit(LogRecord("info", f"record {i}"))
+    pipeline.flush()
+
+    # written in emit order by the pipeline thread, all of them when flush returns
+    assert sink.records == [(f"record {i}", "log-pipeline") for i in range(50)]
+
+    # after close, records are written directly
+    pipeline.close()
+    pipeline.emit(LogRecord("info", "after close"))
+    assert sink.records[-1] == ("after close", threading.current_thread().name)
+
+
+def test_json_lines_sink(tmp_path):
+    from src.log_sink import LogPipeline, LogRecord, JsonLinesSink
+
+    json_file = tmp_path / "log.jsonl"
+    pipeline = LogPipeline([JsonLinesSink(json_file)])
+
+    pipeline.emit(LogRecord("title", "CBAM XML Converter"))
+    pipeline.emit(LogRecord("warning", "<b>Warning</r> header\nInvalid <blue>7208</r>", title="<b>CN Code</r>", source="validate", message="Invalid <blue>7208</r>", fields={"severe": True}))
+    pipeline.emit(LogRecord("debug", "<purple>rows</r>", key="validator"))
+    pipeline.close()
+
+    records = [json.loads(line) for line in json_file.read_text(encoding="utf-8").splitlines()]
+    assert [{key: value for key, value in record.items() if key != "time"} for record in records] == [
+        {"level": "warning", "key": None, "title": "CN Code", "source": "validate", "message": "Invalid 7208", "fields": {"severe": True}},
+        {"level": "debug", "key": "validator", "title": None, "source": None, "message": "rows", "fields": {}},
+    ]
+    assert all(len(record["time"]) == len("2026-01-01T12:00:00.000") for record in records)
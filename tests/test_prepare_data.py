@@ -33,3 +33,161 @@ def test_prepare_data(monkeypatch):
     prepared_data = prepare_data(raw_data, config)
 
     # pprint(prepared_data["imported_goods"])
+
+
+def test_create_procedures():
+    from src.prepare_data import create_procedures
+    from src.records import ImportedGoodKey, ImportedGood, GoodsLine
+
+    operator = {"operator_name": "Op One", "operator_country": "TR"}
+    inward_processing = {
+        "inward_processing": "1",
+        "previous_procedure": "51",
+        "member_state_of_authorization": "DE",
+        "bill_of_discharge_waiver": None,
+        "authorization": "AUTH1",
+        "start_date": "20240101",
+        "end_date": "20241231",
+        "deadline": "20250101",
+    }
+    entries = [
+        {"cn_code": "72081000", "net_mass": 10.0, "production_method": "P23", "requested_procedure": "40", "inward_processing": "0"},
+        {"cn_code": "72081000", "net_mass": 2.5, "production_method": "P22 - Other", "requested_procedure": "40", "inward_processing": "0"},
+        {"cn_code": "72081000", "net_mass": 4.0, "production_method": "P23", "requested_procedure": "40", **inward_processing, "already_processed": 1.0, "not_processed": 3.0},
+        {"cn_code": "72081000", "net_mass": 2.0, "production_method": "P23", "requested_procedure": "40", **inward_processing, "already_processed": 2.0, "not_processed": 0.0},
+    ]
+
+    key = ImportedGoodKey("72081000", "TR", "Importer")
+    imported_good = ImportedGood(key, {"name": "Importer"}, "TR")
+    imported_good.lines = [GoodsLine(entry, "TR", operator, None) for entry in entries]
+
+    assert imported_good.lines[1].production_method == "P22"
+    assert imported_good.lines[1].production_method_name == "Other"
+    assert key == ImportedGoodKey("72081000", "TR", "Importer") and str(key) == "72081000;TR;Importer"
+
+    create_procedures(None, {"imported_goods": {key: imported_good}})
+
+    # masses in fixed point (nano tonnes)
+    assert imported_good.total_net_mass == 18_500_000_000
+    assert list(imported_good.procedures) == [("40", None), ("40", "51")]
+
+    procedure = imported_good.procedures[("40", "51")]
+    assert procedure.net_mass == 6_000_000_000
+    assert procedure.inward_processing_info.bill_of_discharge_waiver == "0"
+    assert (procedure.inward_processing_info.already_processed, procedure.inward_processing_info.not_processed) == (3_000_000_000, 3_000_000_000)
+    # the lines keep their own masses
+    assert imported_good.lines[2].inward_processing_info.already_processed == 1_000_000_000
+
+
+def test_goods_frame_emission_groups():
+    from src.aggregation import GoodsFrame
+    from src.records import ImportedGoodKey, ImportedGood, GoodsLine
+
+    operator = {"operator_name": "Op One", "operator_country": "TR"}
+    installation = {"installation_name": "Plant A", "installation_country": "CN"}
+
+    def line(net_mass, production_method, installation=None):
+        entry = {"cn_code": "72081000", "net_mass": net_mass, "production_method": production_method, "requested_procedure": "40", "inward_processing": "0"}
+        return GoodsLine(entry, "TR", operator, installation)
+
+    key = ImportedGoodKey("72081000", "TR", "Importer")
+    imported_good = ImportedGood(key, {"name": "Importer"}, "TR")
+    imported_good.lines = [line(0.1, "P23"), line(1.0, "P22", installation), line(0.2, "P22"), line(0.3, "P23")]
+
+    (groups,) = GoodsFrame({key: imported_good}).goods_emission_groups()
+
+    assert [(first_line.io_key, net_mass, list(production_methods)) for first_line, net_mass, production_methods in groups] == [
+        ("Op One", 600_000_000, ["P23", "P22"]),
+        ("Plant A", 1_000_000_000, ["P22"]),
+    ]
+
+
+def test_incremental_goods_emissions(monkeypatch, tmp_path):
+    import copy
+    import src.prepare_data as prepare_data_module
+    from src.prepare_data import create_goods_emissions
+    from src.records import ImportedGoodKey, ImportedGood, GoodsLine
+    from src.report_model import ReportModel
+    from src.shared import shared_data
+
+    monkeypatch.setattr(prepare_data_module, "save_report_model", lambda report_model: None)
+    shared_data["current"] = {"summary": {}, "output_dir": str(tmp_path)}
+
+    operator = {"operator_name": "Op One", "operator_country": "TR"}
+    plant_a = {"installation_name": "Plant A", "installation_country": "CN"}
+    plant_b = {"installation_name": "Plant B", "installation_country": "IN"}
+
+    def emission_data(see_direct):
+        direct = {"type_of_determination": "01", "reporting_methodology": "TRM01", "additional_info": None, "see": see_direct}
+        indirect = {
+            "type_of_determination": "01",
+            "see": 0.1,
+            "source_of_electricity": "SOE01",
+            "other_source_indication": None,
+            "source_of_emission_factor": "D",
+            "electricity_consumed": 1.0,
+            "emission_factor": 0.5,
+            "source_of_emission_factor_value": None,
+        }
+        return {"direct_emissions": direct, "indirect_emissions": indirect}
+
+    def installation_entry(see_direct):
+        return {"type_of_determination": "01", "emission_data": {cn_code: emission_data(see_direct) for cn_code in ("72081000", "72082000")}}
+
+    imported_goods = {}
+    for cn_code, installation in (("72081000", plant_a), ("72082000", plant_b)):
+        key = ImportedGoodKey(cn_code, "TR", "Importer")
+        imported_good = imported_goods[key] = ImportedGood(key, {"name": "Importer"}, "TR")
+        entry = {"cn_code": cn_code, "net_mass": 1.0, "production_method": "P23", "requested_procedure": "40", "inward_processing": "0"}
+        imported_good.lines = [GoodsLine(entry, "TR", operator, installation)]
+
+    prepared_data_dict = {"general_info": {"year": 2025, "quarter": 2}, "imported_goods": imported_goods}
+    installation_data = {"Plant A": installation_entry(1.5), "Plant B": installation_entry(2.0)}
+    config = {}
+    report_model = ReportModel("test")
+
+    create_goods_emissions(None, prepared_data_dict, installation_data, config, report_model=report_model)
+    assert report_model.dependencies == {"Plant A": {list(imported_goods)[0]}, "Plant B": {list(imported_goods)[1]}}
+
+    # only the good of Plant B is recomputed
+    installation_data = copy.deepcopy(installation_data)
+    installation_data["Plant B"]["emission_data"]["72082000"]["direct_emissions"]["see"] = 3.0
+    computed = []
+    create_goods_emission = prepare_data_module.create_goods_emission
+    monkeypatch.setattr(prepare_data_module, "create_goods_emission", lambda cn_code, *args: computed.append(cn_code) or create_goods_emission(cn_code, *args))
+
+    create_goods_emissions(None, prepared_data_dict, installation_data, config, report_model=report_model)
+
+    assert computed == ["72082000"]
+    see_direct = [good.goods_emissions[io_key].direct_emissions["SpecificEmbeddedEmissions"] for good, io_key in zip(imported_goods.values(), ("Plant A", "Plant B"))]
+    assert see_direct == [15_000_000, 30_000_000]
+
+
+def test_render_documents(tmp_path):
+    from pdfrw import PdfReader
+    from reportlab.pdfgen import canvas
+    from src.pdf_rendering import get_template, render_documents
+
+    template_path = str(tmp_path / "template.pdf")
+    can = canvas.Canvas(template_path, pagesize=(595, 842))
+    can.acroForm.textfield(name="hersteller_name", x=250, y=700, width=300, height=30)
+    can.acroForm.textfield(name="cn_codes", x=250, y=600, width=300, height=30)
+    can.showPage()
+    can.drawString(30, 800, "no form fields")
+    can.showPage()
+    can.save()
+
+    template = get_template(template_path)
+    assert [geometry and [field_name for field_name, _ in geometry[2]] for geometry in template.pages] == [["hersteller_name", "cn_codes"], None]
+
+    jobs = [(template_path, str(tmp_path / f"doc_{i}.pdf"), {"hersteller_name": f"Supplier {i}", "cn_codes": "72081000"}) for i in range(3)]
+    assert render_documents(jobs, max_workers=1) == [output_path for _, output_path, _ in jobs]
+
+    for _, output_path, _ in jobs:
+        pages = PdfReader(output_path).pages
+        assert len(pages) == 2
+        assert not pages[0].Annots
+
+    # the cached template is not changed by filling
+    assert len(PdfReader(template_path).pages[0].Annots) == 2
+    assert len(template.reader.pages[0].Annots) == 2
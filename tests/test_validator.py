@@ -1,4 +1,4 @@
-from src.validator import process_and_validate
+from src.validator import process_and_validate, process_and_validate_column
 
 
 def test_validator():
@@ -9,3 +9,25 @@ def test_validator():
     input, validate = process_and_validate("production_method", "P45")
 
     print(f"2 - Input: {input}, Validate: {validate}")
+
+
+def test_validator_column():
+    values = ["72081000", 72082500, " 73181500 ", "7208"]
+
+    cleaned_values, valid_ls = process_and_validate_column("cn_code_m", values)
+
+    assert list(zip(cleaned_values, valid_ls)) == [process_and_validate("cn_code_m", value) for value in values]
+    assert valid_ls == [True, True, True, False]
+
+    # kg -> t
+    entries = [{"net_mass_unit": "kg"}, {"net_mass_unit": "t"}]
+    cleaned_values, valid_ls = process_and_validate_column("net_mass_m", [1500, 2.5], entry_data_ls=entries)
+    assert cleaned_values == [1.5, 2.5]
+
+    # comma decimals
+    cleaned_values, valid_ls = process_and_validate_column("float", ["1 250,5", "3.75"])
+    assert cleaned_values == [1250.5, 3.75]
+
+    cleaned_values, valid_ls = process_and_validate_column("boolean_o", ["ja", "Nein", ""])
+    assert cleaned_values == ["1", "0", None]
+    assert valid_ls == [True, True, True]